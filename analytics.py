@@ -0,0 +1,213 @@
+import sys
+import time
+import logging
+import argparse
+import pyodbc
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from config import ANALYTICS_CONFIG
+from database import central_connection, bump_generations, ROLLUPS
+from instrumentation import observe
+
+log = logging.getLogger("analytics")
+
+# Per-job baselines of successful runs, computed with grouped pandas
+# operations over every job at once (no Python loop per job). A rolling
+# median or MAD can't be updated from a running total, so each publish
+# recomputes only the jobs it touched, from their window of JobLogs rows.
+#
+#   reference window: [now - baseline_days - recent_days, now - recent_days)
+#   recent window:    [now - recent_days, now]
+#
+# A run is an anomaly when its robust z-score against the reference is above
+# anomaly_z; a job is regressed when its recent median has moved up by
+# regression_ratio, and its slow recent runs are flagged as regressions.
+KEYS = ['ServerName', 'JobName']
+METRICS = {'DurationSeconds': ('Duration', 'duration', 1), 'CPUTimeMS': ('CPU', 'cpu', 1000)}
+MAD_SCALE = 1.4826  # MAD x this estimates the standard deviation of normally distributed data
+
+BASELINE_COLUMNS = ['ServerName', 'JobName', 'SampleCount', 'DurationMedian', 'DurationP95', 'DurationMAD',
+                    'CPUMedian', 'CPUP95', 'CPUMAD', 'RecentCount', 'RecentDurationMedian',
+                    'RecentCPUMedian', 'IsRegression']
+ANOMALY_COLUMNS = ['ServerName', 'SourceInstanceID', 'JobName', 'LastRun', 'Flag', 'Metric',
+                   'Value', 'BaselineMedian', 'Score']
+HISTORY_COLUMNS = ['ServerName', 'JobName', 'LastRun', 'DurationSeconds', 'CPUTimeMS']
+RUN_COLUMNS = ['ServerName', 'JobName', 'SourceInstanceID', 'LastRun', 'DurationSeconds', 'CPUTimeMS']
+
+_NAME = (pyodbc.SQL_WVARCHAR, 128, 0)
+_FLOAT = (pyodbc.SQL_DOUBLE, 0, 0)
+_INT = (pyodbc.SQL_INTEGER, 0, 0)
+BASELINE_INPUT_SIZES = [_NAME, _NAME, _INT, _FLOAT, _FLOAT, _FLOAT, _FLOAT, _FLOAT, _FLOAT,
+                        _INT, _FLOAT, _FLOAT, (pyodbc.SQL_BIT, 0, 0)]
+ANOMALY_INPUT_SIZES = [_NAME, _INT, _NAME, (pyodbc.SQL_TYPE_TIMESTAMP, 23, 3), (pyodbc.SQL_WVARCHAR, 20, 0),
+                       (pyodbc.SQL_WVARCHAR, 20, 0), _FLOAT, _FLOAT, _FLOAT]
+
+def windows(now=None):
+    """(reference start, recent start)"""
+    now = now or datetime.now()
+    recent_start = now - timedelta(days=ANALYTICS_CONFIG['recent_days'])
+    return recent_start - timedelta(days=ANALYTICS_CONFIG['baseline_days']), recent_start
+
+def compute_baselines(history, recent_start):
+    """One row per job from its successful runs (ServerName, JobName, LastRun, DurationSeconds, CPUTimeMS)"""
+    if history.empty:
+        return pd.DataFrame(columns=BASELINE_COLUMNS)
+    in_reference = history['LastRun'] < recent_start
+    reference = history[in_reference]
+    recent = history[~in_reference]
+    ref_groups = reference.groupby(KEYS, sort=False)
+    recent_groups = recent.groupby(KEYS, sort=False)
+
+    parts = [ref_groups.size().rename('SampleCount'), recent_groups.size().rename('RecentCount')]
+    for metric, (prefix, _, _) in METRICS.items():
+        median = ref_groups[metric].median()
+        # MAD: median absolute distance from each job's own median
+        deviation = (reference[metric] - ref_groups[metric].transform('median')).abs()
+        parts += [median.rename(f'{prefix}Median'),
+                  ref_groups[metric].quantile(0.95).rename(f'{prefix}P95'),
+                  deviation.groupby([reference[key] for key in KEYS], sort=False).median().rename(f'{prefix}MAD'),
+                  recent_groups[metric].median().rename(f'Recent{prefix}Median')]
+    baselines = pd.concat(parts, axis=1)
+    baselines[['SampleCount', 'RecentCount']] = baselines[['SampleCount', 'RecentCount']].fillna(0).astype(int)
+
+    regressed = np.zeros(len(baselines), dtype=bool)
+    for metric, (prefix, _, unit) in METRICS.items():
+        recent_median, median = baselines[f'Recent{prefix}Median'], baselines[f'{prefix}Median']
+        regressed |= ((recent_median >= median * ANALYTICS_CONFIG['regression_ratio'])
+                      & (recent_median - median >= ANALYTICS_CONFIG['min_delta_seconds'] * unit)).to_numpy()
+    baselines['IsRegression'] = (regressed
+                                 & (baselines['SampleCount'] >= ANALYTICS_CONFIG['min_samples']).to_numpy()
+                                 & (baselines['RecentCount'] >= ANALYTICS_CONFIG['min_recent_samples']).to_numpy())
+    return baselines.reset_index()[BASELINE_COLUMNS]
+
+def flag_runs(runs, baselines):
+    """Anomalous and regressed runs among runs (ServerName, JobName, SourceInstanceID, LastRun, metrics)"""
+    joined = runs.merge(baselines[baselines['SampleCount'] >= ANALYTICS_CONFIG['min_samples']], on=KEYS)
+    if joined.empty:
+        return pd.DataFrame(columns=ANOMALY_COLUMNS)
+
+    scores, anomalous, slow = [], [], []
+    for metric, (prefix, _, unit) in METRICS.items():
+        value, median = joined[metric].astype(float), joined[f'{prefix}Median']
+        delta = value - median
+        # A job that always takes the same time has MAD 0; floor the spread so one slow run isn't infinitely deviant
+        spread = np.maximum(MAD_SCALE * joined[f'{prefix}MAD'], ANALYTICS_CONFIG['min_delta_seconds'] * unit / 10)
+        score = (delta / spread).fillna(0)
+        big_enough = delta >= ANALYTICS_CONFIG['min_delta_seconds'] * unit
+        scores.append(score.to_numpy())
+        anomalous.append(((score > ANALYTICS_CONFIG['anomaly_z']) & big_enough).to_numpy())
+        slow.append((joined['IsRegression'].astype(bool)
+                     & (value >= median * ANALYTICS_CONFIG['regression_ratio']) & big_enough).to_numpy())
+
+    scores, anomalous, slow = np.vstack(scores), np.vstack(anomalous), np.vstack(slow)
+    flagged = anomalous.any(axis=0) | slow.any(axis=0)
+    # Report each run against its most deviant flagged metric
+    worst = np.where(anomalous | slow, scores, -np.inf).argmax(axis=0)
+    rows = np.arange(len(joined))
+    prefixes = np.array([prefix for prefix, _, _ in METRICS.values()])
+    labels = np.array([label for _, label, _ in METRICS.values()])
+    values = joined[list(METRICS)].to_numpy(dtype=float)
+    medians = joined[[f'{prefix}Median' for prefix in prefixes]].to_numpy(dtype=float)
+
+    result = pd.DataFrame({
+        'ServerName': joined['ServerName'], 'SourceInstanceID': joined['SourceInstanceID'],
+        'JobName': joined['JobName'], 'LastRun': joined['LastRun'],
+        'Flag': np.where(anomalous.any(axis=0), 'anomaly', 'regression'),
+        'Metric': labels[worst], 'Value': values[rows, worst],
+        'BaselineMedian': medians[rows, worst], 'Score': scores[worst, rows].round(2),
+    })
+    return result[flagged].reset_index(drop=True)
+
+# ---- central database ---------------------------------------------------
+
+def _read_frame(cursor, columns):
+    frame = pd.DataFrame.from_records([tuple(row) for row in cursor.fetchall()], columns=columns)
+    frame['LastRun'] = pd.to_datetime(frame['LastRun'])
+    return frame
+
+def _records(frame):
+    """Rows as plain Python values (NaN -> None) for executemany"""
+    return list(frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None))
+
+def _insert(cursor, baselines, flagged):
+    if not baselines.empty:
+        cursor.setinputsizes(BASELINE_INPUT_SIZES)
+        cursor.executemany(f"""
+            INSERT INTO JobBaselines ({', '.join(BASELINE_COLUMNS)})
+            VALUES ({', '.join('?' for _ in BASELINE_COLUMNS)})
+        """, _records(baselines))
+    if not flagged.empty:
+        # The primary key ignores runs a previous publish (or resync) already flagged
+        cursor.setinputsizes(ANOMALY_INPUT_SIZES)
+        cursor.executemany(f"""
+            INSERT INTO JobAnomalies ({', '.join(ANOMALY_COLUMNS)})
+            VALUES ({', '.join('?' for _ in ANOMALY_COLUMNS)})
+        """, _records(flagged))
+
+def refresh_for_run(cursor, run_id):
+    """Recompute baselines of the jobs a run touched and flag its new runs; returns runs flagged
+
+    Runs inside the publish transaction, after the run's rows reached JobLogs
+    and before its staging rows are discarded (caller commits).
+    """
+    reference_start, recent_start = windows()
+    cursor.execute("""
+        SELECT jl.ServerName, jl.JobName, jl.LastRun, jl.DurationSeconds, jl.CPUTimeMS
+        FROM JobLogs jl
+        INNER JOIN (SELECT DISTINCT ServerName, JobName FROM JobLogs_Staging
+                    WHERE RunID = ? AND Status = 'Succeeded') s
+            ON s.ServerName = jl.ServerName AND s.JobName = jl.JobName
+        WHERE jl.Status = 'Succeeded'
+          AND jl.LastRun >= ? AND jl.RunDateOnly >= CAST(? AS date)
+    """, (run_id, reference_start, reference_start))
+    history = _read_frame(cursor, HISTORY_COLUMNS)
+    if history.empty:
+        return 0
+    cursor.execute("""
+        SELECT ServerName, JobName, SourceInstanceID, LastRun, DurationSeconds, CPUTimeMS
+        FROM JobLogs_Staging
+        WHERE RunID = ? AND Status = 'Succeeded' AND LastRun >= ?
+    """, (run_id, recent_start))
+    runs = _read_frame(cursor, RUN_COLUMNS)
+
+    baselines = compute_baselines(history, recent_start)
+    flagged = flag_runs(runs, baselines)
+    cursor.execute("""
+        DELETE b FROM JobBaselines b
+        WHERE EXISTS (SELECT 1 FROM JobLogs_Staging s
+                      WHERE s.RunID = ? AND s.Status = 'Succeeded'
+                        AND s.ServerName = b.ServerName AND s.JobName = b.JobName)
+    """, run_id)
+    _insert(cursor, baselines, flagged)
+    return len(flagged)
+
+def rebuild_baselines():
+    """Recompute every job's baseline from JobLogs (no runs are flagged); returns the baselines"""
+    started = time.perf_counter()
+    reference_start, recent_start = windows()
+    with central_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT ServerName, JobName, LastRun, DurationSeconds, CPUTimeMS
+            FROM JobLogs
+            WHERE Status = 'Succeeded' AND LastRun >= ? AND RunDateOnly >= CAST(? AS date)
+        """, (reference_start, reference_start))
+        baselines = compute_baselines(_read_frame(cursor, HISTORY_COLUMNS), recent_start)
+        cursor.execute("DELETE FROM JobBaselines")
+        cursor.fast_executemany = True
+        _insert(cursor, baselines, pd.DataFrame(columns=ANOMALY_COLUMNS))
+        bump_generations(cursor, ROLLUPS)
+        conn.commit()
+    observe('analytics_rebuild_seconds', time.perf_counter() - started)
+    return baselines
+
+def main(argv=None):
+    argparse.ArgumentParser(description="Rebuild every job's duration/CPU baseline from JobLogs").parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    baselines = rebuild_baselines()
+    log.info("Rebuilt baselines for %s job(s); %s regressed", len(baselines), int(baselines['IsRegression'].sum()))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,16 @@
 # ============================================
 # app.py - CLEAN VERSION
 # ============================================
+import time
+import importlib
 import streamlit as st
-from worker import run_collection, get_collection_status
-from database import get_central_conn
-from tabs import overview, failures, performance, management
+from worker import queue_collection
+from database import (central_connection, invalidate, ensure_schema, read_committed_snapshot_on, bootstrap,
+                      record_pool_gauges, INSTANCES)
+from migrations import RCSI_OFF_MESSAGE
+from instrumentation import timer, observe, export
+
+rerun_started = time.perf_counter()
 
 st.set_page_config(
     page_title="SQL Server Agent Jobs Monitoring Dashboard",
@@ -12,29 +18,44 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+try:
+    ensure_schema()
+    if not read_committed_snapshot_on():
+        st.warning(f"⚠️ {RCSI_OFF_MESSAGE}")
+except Exception as e:
+    st.error(f"❌ Schema migration failed: {str(e)}")
+
 if 'active_tab' not in st.session_state:
     st.session_state.active_tab = 0
 
+# (title, module under tabs/) - modules are imported only when their tab is shown
+TABS = [
+    ("📊 Overview Dashboard", "overview"),
+    ("⚠️ 24-Hour Failures", "failures"),
+    ("⚡ Performance Analytics", "performance"),
+    ("📈 Job History", "history"),
+    ("⚙️ Instance Management", "management"),
+    ("🩺 Diagnostics", "diagnostics")
+]
+active_module = TABS[st.session_state.active_tab][1]
+
+# One round trip: sync status plus the active tab's datasets (re-used by the tab below)
+status = bootstrap(active_module)
+
 st.sidebar.header("🕹️ Control Center")
 
-last_sync = get_collection_status()
-if last_sync:
-    st.sidebar.info(f"📅 Last Sync: {last_sync.strftime('%Y-%m-%d %H:%M:%S')}")
+if status['last_sync']:
+    st.sidebar.info(f"📅 Last Sync: {status['last_sync'].strftime('%Y-%m-%d %H:%M:%S')}")
+
+if status['pending_requests']:
+    st.sidebar.caption(f"⏳ {status['pending_requests']} sync request(s) waiting on the collector")
 
 if st.sidebar.button("🔄 Sync Now", use_container_width=True):
-    with st.spinner("Collecting data..."):
-        try:
-            results = run_collection()
-            if results['failed']:
-                st.sidebar.warning(f"⚠️ {len(results['failed'])} instance(s) failed")
-                with st.sidebar.expander("View Errors"):
-                    for err in results['failed']:
-                        st.write(f"❌ {err}")
-            st.sidebar.success(f"✅ Collected {results['total_jobs_collected']} job records")
-            st.cache_resource.clear()
-            st.rerun()
-        except Exception as e:
-            st.sidebar.error(f"❌ Collection failed: {str(e)}")
+    try:
+        queue_collection()
+        st.sidebar.success("✅ Sync queued - the collector daemon will pick it up shortly")
+    except Exception as e:
+        st.sidebar.error(f"❌ Could not queue sync: {str(e)}")
 
 st.sidebar.divider()
 
@@ -47,16 +68,25 @@ with st.sidebar.expander("➕ Add New Instance", expanded=False):
         if st.form_submit_button("Add Server", use_container_width=True):
             if new_svr and new_label:
                 try:
-                    conn = get_central_conn()
-                    cursor = conn.cursor()
-                    cursor.execute(
-                        "INSERT INTO ManagedInstances (ServerName, FriendlyName, IsActive, Hostname) VALUES (?,?,1,?)",
-                        new_svr, new_label, new_hostname
-                    )
-                    conn.commit()
-                    st.success(f"Added {new_label}")
-                    st.cache_resource.clear()
-                    st.rerun()
+                    with central_connection() as conn:
+                        cursor = conn.cursor()
+                        # A soft-deleted row keeps its ServerName until retention.py has purged its data
+                        existing = cursor.execute(
+                            "SELECT IsDeleted FROM ManagedInstances WHERE ServerName = ?", new_svr
+                        ).fetchone()
+                        if existing is None:
+                            cursor.execute(
+                                "INSERT INTO ManagedInstances (ServerName, FriendlyName, IsActive, Hostname) VALUES (?,?,1,?)",
+                                new_svr, new_label, new_hostname
+                            )
+                            conn.commit()
+                    if existing is not None:
+                        st.warning(f"⚠️ {new_svr}: already exists" + (" (its deleted data is still being purged)"
+                                                                       if existing[0] else ""))
+                    else:
+                        st.success(f"Added {new_label}")
+                        invalidate(INSTANCES)
+                        st.rerun()
                 except Exception as e:
                     st.error(f"Failed to add: {str(e)}")
             else:
@@ -64,15 +94,8 @@ with st.sidebar.expander("➕ Add New Instance", expanded=False):
 
 st.title("SQL Server Agent Jobs Monitoring Dashboard")
 
-tab_titles = [
-    "📊 Overview Dashboard",
-    "⚠️ 24-Hour Failures",
-    "⚡ Performance Analytics",
-    "⚙️ Instance Management"
-]
-
-cols = st.columns(len(tab_titles))
-for idx, (col, title) in enumerate(zip(cols, tab_titles)):
+cols = st.columns(len(TABS))
+for idx, (col, (title, _)) in enumerate(zip(cols, TABS)):
     with col:
         if st.button(
             title,
@@ -85,14 +108,12 @@ for idx, (col, title) in enumerate(zip(cols, tab_titles)):
 
 st.divider()
 
-if st.session_state.active_tab == 0:
-    overview.render()
-elif st.session_state.active_tab == 1:
-    failures.render()
-elif st.session_state.active_tab == 2:
-    performance.render()
-elif st.session_state.active_tab == 3:
-    management.render()
+with timer('render_seconds', tab=active_module):
+    importlib.import_module(f"tabs.{active_module}").render()
 
 st.divider()
-st.caption("SQL Server Agent Jobs Monitoring Dashboard | Developed by Database Team | Softlogiclife © 2025")
\ No newline at end of file
+st.caption("SQL Server Agent Jobs Monitoring Dashboard | Developed by Database Team | Softlogiclife © 2025")
+
+observe('rerun_seconds', time.perf_counter() - rerun_started, tab=active_module)
+record_pool_gauges()
+export()
\ No newline at end of file
@@ -0,0 +1,489 @@
+"""In-process stand-in for pyodbc used by the benchmark harness
+
+bench.run installs this module as sys.modules['pyodbc'] before importing
+worker/database. Remote msdb connections stream synthetic history from
+bench.synthetic; the central database is an in-memory store that answers
+the statements worker.py and database.py issue (T-SQL is recognised by
+pattern, not parsed). Server-side query cost is not modelled - only the
+client-side path (round trips, fetch, DataFrame building, caching) - with an
+optional simulated network round-trip time per statement.
+"""
+import re
+import time
+import itertools
+import threading
+from datetime import datetime, timedelta
+import pandas as pd
+from bench.synthetic import instance_names, generate_history
+
+class Error(Exception):
+    pass
+
+class InterfaceError(Error):
+    pass
+
+class OperationalError(Error):
+    pass
+
+class ProgrammingError(Error):
+    pass
+
+SQL_CHAR = 1
+SQL_INTEGER = 4
+SQL_FLOAT = 6
+SQL_DOUBLE = 8
+SQL_TYPE_TIMESTAMP = 93
+SQL_BIT = -7
+SQL_BINARY = -2
+SQL_VARBINARY = -3
+SQL_BIGINT = -5
+SQL_TINYINT = -6
+SQL_WVARCHAR = -9
+SQL_WLONGVARCHAR = -10
+
+_standin = None
+
+def configure(instances, jobs, days, runs_per_day, failure_rate, seed, rtt_ms=0.0):
+    """Create the stand-in server every connect() talks to"""
+    global _standin
+    _standin = StandIn(instances, jobs, days, runs_per_day, failure_rate, seed, rtt_ms / 1000.0)
+    return _standin
+
+def connect(conn_str, timeout=0, autocommit=False, **kwargs):
+    if _standin is None:
+        raise InterfaceError("bench.fake_pyodbc.configure() has not been called")
+    _standin.round_trip()
+    settings = dict(part.split('=', 1) for part in conn_str.split(';') if '=' in part)
+    if settings.get('DATABASE', '').lower() == 'msdb':
+        return Connection(_standin, remote_host=_standin.host_for(settings.get('SERVER')))
+    return Connection(_standin)
+
+def _normalize(sql):
+    return ' '.join(sql.split())
+
+class Connection:
+    def __init__(self, standin, remote_host=None):
+        self._standin = standin
+        self._remote_host = remote_host
+        self.timeout = 0
+        self.autocommit = False
+
+    def cursor(self):
+        return Cursor(self._standin, self._remote_host)
+
+    def execute(self, sql, *params):
+        return self.cursor().execute(sql, *params)
+
+    def commit(self):
+        self._standin.round_trip()
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Cursor:
+    def __init__(self, standin, remote_host):
+        self._standin = standin
+        self._remote_host = remote_host
+        self._result_sets = []
+        self._rows = iter(())
+        self.description = None
+        self.rowcount = -1
+        self.fast_executemany = False
+
+    def setinputsizes(self, sizes):
+        pass
+
+    def execute(self, sql, *params):
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            params = tuple(params[0])
+        self._standin.round_trip()
+        if self._remote_host is not None:
+            result_sets = [self._standin.pull_jobs(self._remote_host, *params)]
+            self.rowcount = -1
+        else:
+            result_sets, self.rowcount = self._standin.execute(_normalize(sql), list(params))
+        self._result_sets = list(result_sets)
+        self._next_result_set()
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._standin.round_trip()
+        self.rowcount = self._standin.execute_many(_normalize(sql), list(seq_of_params))
+
+    def _next_result_set(self):
+        if not self._result_sets:
+            self.description, self._rows = None, iter(())
+            return False
+        columns, rows = self._result_sets.pop(0)
+        self.description = [(column, None, None, None, None, None, True) for column in columns]
+        self._rows = iter(rows)
+        return True
+
+    def nextset(self):
+        return self._next_result_set()
+
+    def fetchone(self):
+        return next(self._rows, None)
+
+    def fetchmany(self, size=1):
+        rows = list(itertools.islice(self._rows, size))
+        if rows:
+            self._standin.round_trip()
+        return rows
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def close(self):
+        pass
+
+class StandIn:
+    """Synthetic remote instances plus an in-memory central monitoring database"""
+
+    def __init__(self, instances, jobs, days, runs_per_day, failure_rate, seed, rtt_seconds):
+        self.jobs = jobs
+        self.days = days
+        self.runs_per_day = runs_per_day
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self.rtt_seconds = rtt_seconds
+        self.history_end = datetime.now().replace(microsecond=0)
+        self.instances = instance_names(instances)
+        self._hosts = {svr_name: host for svr_name, _, host in self.instances}
+        self._lock = threading.RLock()
+        self.staging = []
+        self.job_logs = []
+        self.errors = {}        # fingerprint -> (ErrorID, masked, sample)
+        self.watermarks = {}
+        self.generations = {name: 0 for name in ('instances', 'job_logs', 'rollups', 'health', 'job_logs_rewrite')}
+        self._frames = None
+        self._answers = {}  # (sql, params) -> result of a read, until the next write
+
+    def round_trip(self):
+        if self.rtt_seconds:
+            time.sleep(self.rtt_seconds)
+
+    def host_for(self, svr_name):
+        if svr_name not in self._hosts:
+            raise OperationalError(f"[08001] Named Pipes Provider: Could not open a connection to {svr_name}")
+        return self._hosts[svr_name]
+
+    def expected_rows(self):
+        return len(self.instances) * self.jobs * self.days * self.runs_per_day
+
+    # ---- remote msdb -------------------------------------------------------
+
+    def pull_jobs(self, host, since_id, lookback_days):
+        since_run = self.history_end - timedelta(days=lookback_days) if lookback_days else datetime.min
+        rows = (row for row in generate_history(host, self.jobs, self.days, self.runs_per_day,
+                                                self.failure_rate, self.seed, end=self.history_end)
+                if row[8] > since_id and row[3] >= since_run)
+        columns = ['ServerName', 'JobName', 'Status', 'LastRun', 'ErrorMessage', 'DurationSeconds',
+                   'CPUTimeMS', 'StepCount', 'HistoryID']
+        return columns, rows
+
+    # ---- central database --------------------------------------------------
+
+    def execute_many(self, sql, seq_of_params):
+        with self._lock:
+            self._answers.clear()
+            if sql.startswith('INSERT INTO JobLogs_Staging'):
+                self.staging.extend(seq_of_params)
+            elif sql.startswith('INSERT INTO ErrorMessages'):
+                for fingerprint, masked, sample in seq_of_params:
+                    self.errors.setdefault(bytes(fingerprint), (len(self.errors) + 1, masked, sample))
+            return len(seq_of_params)
+
+    def execute(self, sql, params):
+        """([(columns, rows), ...], rowcount) for one statement or batch"""
+        with self._lock:
+            if sql.startswith('SET NOCOUNT ON;'):
+                return self._batch(sql, params), -1
+            if not sql.startswith(('SELECT', 'WITH')):
+                self._answers.clear()
+            key = (sql, tuple(params))
+            if key not in self._answers:
+                self._answers[key] = self._dispatch(sql, params)
+            return self._answers[key]
+
+    def _dispatch(self, sql, params):
+        for pattern, handler in self._handlers():
+            if re.search(pattern, sql):
+                return handler(sql, params)
+        return [], 0  # DDL, MERGE into tables the benchmark does not read back, ...
+
+    def _handlers(self):
+        return [
+            (r'^SELECT 1$', lambda sql, p: ([(['x'], [(1,)])], 1)),
+            (r'EXEC @result = sp_getapplock', lambda sql, p: ([(['result'], [(0,)])], 1)),
+            (r'^SELECT XACT_STATE\(\)', lambda sql, p: ([(['state'], [(1,)])], 1)),
+            (r'^SELECT ServerName, FriendlyName FROM ManagedInstances WHERE IsActive = 1', self._active_instances),
+            (r'^SELECT ServerName, LastInstanceID FROM CollectionWatermarks', self._watermarks),
+            (r'^SELECT ServerName, BreakerState', lambda sql, p: ([(['ServerName'], [])], 0)),
+            (r'^MERGE CollectionWatermarks', self._save_watermark),
+            (r'^SELECT Fingerprint, ErrorID FROM ErrorMessages', self._lookup_errors),
+            (r'^INSERT INTO JobLogs \(', self._publish),
+            (r'^SELECT jl.ServerName, jl.JobName, jl.LastRun, jl.DurationSeconds', self._baseline_history),
+            (r'^SELECT ServerName, JobName, SourceInstanceID, LastRun', self._staged_runs),
+            (r'^DELETE FROM JobLogs_Staging WHERE RunID = \? AND LastRun', self._drop_expired_staged),
+            (r'^DELETE FROM JobLogs_Staging WHERE RunID', self._discard_staged),
+            (r'^DELETE FROM JobLogs WHERE ServerName IN', self._clear_history),
+            (r'^UPDATE DataGenerations', self._bump),
+            (r'^SELECT Dataset, Generation FROM DataGenerations', self._generations),
+            (r'FROM ErrorMessages WHERE ErrorID = \?', self._error_message),
+            (r'FROM ManagedInstances mi LEFT JOIN InstanceHealth', self._instances_with_health),
+            (r'^WITH Days AS', self._history_page),
+            (r'SELECT DISTINCT JobName FROM JobRollupDaily', self._job_names),
+            (r'EXISTS \(SELECT 1 FROM JobRollupDaily', self._performance_instances),
+            (r'as MaxDuration,\s+FailureCount\s+FROM JobRollupDaily', self._duration_trends),
+            (r'SUM\(ExecutionCount\) as ExecutionCount', self._job_summary),
+            (r'TotalJobs, .*FROM v_EnhancedDashboard', self._kpis),
+            (r'^SELECT \* FROM v_EnhancedDashboard', self._dashboard),
+            (r'^SELECT \* FROM v_InstanceHealthSummary', self._health_summary),
+            (r'^SELECT \* FROM v_Last24HourFailures', self._failures_24h),
+            (r'MAX\(LastCollectedAt\) FROM CollectionWatermarks', self._last_sync),
+            (r'COUNT\(\*\) FROM CollectionRequests', lambda sql, p: ([(['Pending'], [(0,)])], 1)),
+        ]
+
+    def _batch(self, sql, params):
+        """Multi-statement batch (database.bootstrap): one result set per SELECT, honouring IF EXISTS"""
+        result_sets = []
+        for statement in sql[len('SET NOCOUNT ON;'):].split(';'):
+            statement = statement.strip()
+            if statement.startswith('IF EXISTS'):
+                condition, statement = statement.split('BEGIN', 1)
+                pairs = list(zip(params[::2], params[1::2]))
+                if all(self.generations.get(dataset) == generation for dataset, generation in pairs):
+                    break
+                statement = statement.strip()
+            statement = re.sub(r'^BEGIN\s*|\s*END$', '', statement)
+            if statement.endswith('as PendingRequests'):
+                result_sets.append((['LastSync', 'PendingRequests'], [(self._latest_collection(), 0)]))
+            elif statement:
+                result_sets.extend(self.execute(statement, [])[0])
+        return result_sets
+
+    # ---- collector statements -----------------------------------------------
+
+    def _active_instances(self, sql, params):
+        return [(['ServerName', 'FriendlyName'], [(svr, friendly) for svr, friendly, _ in self.instances])], 0
+
+    def _watermarks(self, sql, params):
+        return [(['ServerName', 'LastInstanceID'],
+                 [(svr, last_id) for svr, (_, last_id, _) in self.watermarks.items()])], 0
+
+    def _save_watermark(self, sql, params):
+        svr_name, source_server, last_id = params[:3]
+        self.watermarks[svr_name] = (source_server, last_id, datetime.now())
+        return [], 1
+
+    def _lookup_errors(self, sql, params):
+        rows = [(fingerprint, self.errors[bytes(fingerprint)][0])
+                for fingerprint in params if bytes(fingerprint) in self.errors]
+        return [(['Fingerprint', 'ErrorID'], rows)], len(rows)
+
+    def _publish(self, sql, params):
+        run_id = params[0]
+        published = [row for row in self.staging if row[0] == run_id]
+        first_id = len(self.job_logs) + 1
+        now = datetime.now()
+        # (LogID, ServerName, JobName, Status, LastRun, ErrorID, DurationSeconds, CPUTimeMS, StepCount, CapturedAt)
+        self.job_logs.extend((first_id + i,) + row[2:10] + (now,) for i, row in enumerate(published))
+        self._frames = None
+        return [], len(published)
+
+    def _discard_staged(self, sql, params):
+        run_id = params[0]
+        managed = params[1] if len(params) > 1 else None
+        before = len(self.staging)
+        self.staging = [row for row in self.staging
+                        if row[0] != run_id or (managed is not None and row[1] != managed)]
+        return [], before - len(self.staging)
+
+    def _baseline_history(self, sql, params):
+        run_id, since = params[:2]
+        touched = {(row[2], row[3]) for row in self.staging if row[0] == run_id and row[4] == 'Succeeded'}
+        rows = [(row[1], row[2], row[4], row[6], row[7]) for row in self.job_logs
+                if (row[1], row[2]) in touched and row[3] == 'Succeeded' and row[4] >= since]
+        return [(['ServerName', 'JobName', 'LastRun', 'DurationSeconds', 'CPUTimeMS'], rows)], len(rows)
+
+    def _staged_runs(self, sql, params):
+        run_id, since = params[:2]
+        rows = [(row[2], row[3], row[10], row[5], row[7], row[8]) for row in self.staging
+                if row[0] == run_id and row[4] == 'Succeeded' and row[5] >= since]
+        return [(['ServerName', 'JobName', 'SourceInstanceID', 'LastRun', 'DurationSeconds', 'CPUTimeMS'],
+                 rows)], len(rows)
+
+    def _drop_expired_staged(self, sql, params):
+        run_id, cutoff = params[:2]
+        cutoff = datetime.combine(cutoff, datetime.min.time())
+        before = len(self.staging)
+        self.staging = [row for row in self.staging if row[0] != run_id or row[5] >= cutoff]
+        return [], before - len(self.staging)
+
+    def _clear_history(self, sql, params):
+        host = self._hosts.get(params[0])
+        before = len(self.job_logs)
+        self.job_logs = [row for row in self.job_logs if row[1] != host]
+        self._frames = None
+        return [], before - len(self.job_logs)
+
+    def _bump(self, sql, params):
+        for dataset in params:
+            self.generations[dataset] = self.generations.get(dataset, 0) + 1
+        return [], len(params)
+
+    def _generations(self, sql, params):
+        return [(['Dataset', 'Generation'], list(self.generations.items()))], 0
+
+    def _latest_collection(self):
+        return max((collected_at for _, _, collected_at in self.watermarks.values()), default=None)
+
+    def _last_sync(self, sql, params):
+        return [(['LastCollectedAt'], [(self._latest_collection(),)])], 1
+
+    # ---- dashboard reads (computed from the stored rows) ---------------------
+
+    def _frame(self):
+        if self._frames is None:
+            logs = pd.DataFrame(self.job_logs, columns=[
+                'LogID', 'ServerName', 'JobName', 'Status', 'LastRun', 'ErrorID',
+                'DurationSeconds', 'CPUTimeMS', 'StepCount', 'CapturedAt'])
+            instances = pd.DataFrame(self.instances, columns=['ManagedServer', 'FriendlyName', 'HostName'])
+            logs = logs.merge(instances, left_on='ServerName', right_on='HostName', how='inner')
+            logs['RunDate'] = logs['LastRun'].dt.normalize()
+            daily = (logs.groupby(['ServerName', 'JobName', 'RunDate'])
+                     .agg(ExecutionCount=('LogID', 'size'),
+                          FailureCount=('Status', lambda s: int((s == 'Failed').sum())),
+                          DurationSum=('DurationSeconds', 'sum'),
+                          DurationMax=('DurationSeconds', 'max'))
+                     .reset_index())
+            self._frames = (logs, daily)
+        return self._frames
+
+    def _preview(self, error_ids):
+        masked = {error_id: text[:200] for error_id, text, _ in self.errors.values()}
+        return error_ids.map(masked)
+
+    @staticmethod
+    def _result(frame):
+        return [(list(frame.columns), list(frame.itertuples(index=False, name=None)))], len(frame)
+
+    def _instances_with_health(self, sql, params):
+        return self._result(pd.DataFrame(
+            [(svr, friendly, host, 1, self.history_end, 'closed', 0, None, None, 5.0)
+             for svr, friendly, host in self.instances],
+            columns=['ServerName', 'FriendlyName', 'HostName', 'IsActive', 'DateAdded', 'BreakerState',
+                     'ConsecutiveFailures', 'LastError', 'NextRetryAt', 'ConnectLatencyMs']))
+
+    def _latest(self):
+        logs, _ = self._frame()
+        latest = logs.sort_values('LastRun').groupby(['ServerName', 'JobName']).tail(1)
+        return latest.assign(ErrorPreview=self._preview(latest['ErrorID']), IsActive=1,
+                             AvgDuration=0, MaxDuration=0, AvgCPU=0)
+
+    def _dashboard(self, sql, params):
+        return self._result(self._latest()[[
+            'LogID', 'ServerName', 'FriendlyName', 'JobName', 'Status', 'LastRun', 'ErrorID',
+            'ErrorPreview', 'DurationSeconds', 'CPUTimeMS', 'StepCount', 'CapturedAt', 'IsActive',
+            'AvgDuration', 'MaxDuration', 'AvgCPU']])
+
+    def _kpis(self, sql, params):
+        latest = self._latest()
+        return [(['TotalJobs', 'FailedJobs', 'ActiveInstances'],
+                 [(len(latest), int((latest['Status'] == 'Failed').sum()), len(self.instances))])], 1
+
+    def _health_summary(self, sql, params):
+        logs, _ = self._frame()
+        day_ago = datetime.now() - timedelta(hours=24)
+        recent = logs[logs['LastRun'] >= day_ago]
+        rows = []
+        for svr, friendly, host in self.instances:
+            inst, inst_recent = logs[logs['HostName'] == host], recent[recent['HostName'] == host]
+            rows.append((svr, friendly, 1, self.history_end, inst['JobName'].nunique(),
+                         int((inst_recent['Status'] == 'Failed').sum()),
+                         int((inst_recent['Status'] == 'Succeeded').sum()),
+                         inst['LastRun'].max(), inst['DurationSeconds'].mean(), inst['CPUTimeMS'].mean(),
+                         self.watermarks.get(svr, (None, None, None))[2]))
+        return self._result(pd.DataFrame(rows, columns=[
+            'ServerName', 'FriendlyName', 'IsActive', 'DateAdded', 'TotalJobs', 'FailuresLast24h',
+            'SuccessLast24h', 'LastDataCollection', 'AvgJobDuration', 'AvgCPUUsage', 'LastSync']))
+
+    def _failures_24h(self, sql, params):
+        logs, _ = self._frame()
+        failed = logs[(logs['Status'] == 'Failed') & (logs['LastRun'] >= datetime.now() - timedelta(hours=24))]
+        grouped = (failed.groupby(['ServerName', 'FriendlyName', 'JobName', 'ErrorID'])
+                   .agg(FailureCount=('LogID', 'size'), FirstFailure=('LastRun', 'min'),
+                        LastRun=('LastRun', 'max'), AvgDurationSeconds=('DurationSeconds', 'mean'))
+                   .reset_index())
+        minutes_ago = (datetime.now() - grouped['LastRun']).dt.total_seconds() // 60
+        grouped = grouped.assign(ErrorPreview=self._preview(grouped['ErrorID']),
+                                 MinutesAgo=minutes_ago, HoursAgo=minutes_ago // 60)
+        return self._result(grouped)
+
+    def _window(self, days):
+        _, daily = self._frame()
+        return daily[daily['RunDate'] >= pd.Timestamp(datetime.now().date() - timedelta(days=days))]
+
+    def _performance_instances(self, sql, params):
+        hosts = set(self._window(params[0])['ServerName'])
+        return self._result(pd.DataFrame(
+            [(host, friendly) for _, friendly, host in self.instances if host in hosts],
+            columns=['HostName', 'FriendlyName']))
+
+    def _job_summary(self, sql, params):
+        server, days = params
+        daily = self._window(days)
+        summary = (daily[daily['ServerName'] == server].groupby('JobName')
+                   .agg(ExecutionCount=('ExecutionCount', 'sum'), FailureCount=('FailureCount', 'sum'),
+                        MaxDuration=('DurationMax', 'max'))
+                   .reset_index().sort_values('MaxDuration', ascending=False))
+        return self._result(summary)
+
+    def _duration_trends(self, sql, params):
+        server, days = params
+        daily = self._window(days)
+        trends = daily[daily['ServerName'] == server]
+        trends = trends.assign(AvgDuration=trends['DurationSum'] / trends['ExecutionCount'],
+                               MaxDuration=trends['DurationMax'])
+        return self._result(trends[['JobName', 'RunDate', 'AvgDuration', 'MaxDuration', 'FailureCount']]
+                            .sort_values(['JobName', 'RunDate']))
+
+    def _job_names(self, sql, params):
+        _, daily = self._frame()
+        names = sorted(daily.loc[daily['ServerName'] == params[0], 'JobName'].unique())
+        return [(['JobName'], [(name,) for name in names])], len(names)
+
+    def _history_page(self, sql, params):
+        status_count = re.search(r'Status IN \(([?, ]+)\)', sql).group(1).count('?')
+        days, end, top, server, job = params[:5]
+        start = end - timedelta(days=days - 1)
+        statuses = params[5:5 + status_count]
+        before = params[5 + status_count:]
+        logs, _ = self._frame()
+        page = logs[(logs['ServerName'] == server) & (logs['JobName'] == job)
+                    & (logs['LastRun'] >= pd.Timestamp(start))
+                    & (logs['LastRun'] < pd.Timestamp(end) + pd.Timedelta(days=1))
+                    & logs['Status'].isin(statuses)]
+        if before:
+            page = page[(page['LastRun'] < before[0])
+                        | ((page['LastRun'] == before[1]) & (page['LogID'] < before[2]))]
+        page = page.sort_values(['LastRun', 'LogID'], ascending=False).head(top)
+        page = page.assign(ErrorPreview=self._preview(page['ErrorID']))
+        return self._result(page[['LogID', 'LastRun', 'Status', 'DurationSeconds', 'CPUTimeMS',
+                                  'ErrorID', 'ErrorPreview']])
+
+    def _error_message(self, sql, params):
+        for error_id, masked, sample in self.errors.values():
+            if error_id == params[0]:
+                return [(['MaskedMessage', 'SampleMessage', 'FirstSeenAt'], [(masked, sample, self.history_end)])], 1
+        return [(['MaskedMessage', 'SampleMessage', 'FirstSeenAt'], [])], 0
@@ -0,0 +1,209 @@
+"""Collector and dashboard benchmark against synthetic msdb history
+
+    python -m bench.run --instances 20 --jobs 200 --days 30
+    python -m bench.run --compare bench/results/<old>.json bench/results/<new>.json
+
+Runs worker.run_collection and the database.py readers on the in-process
+stand-in from bench.fake_pyodbc and writes bench/results/<commit>.json.
+Latencies are client-side only (round trips, fetch, DataFrame building,
+caching); time the real SQL with `python -m migrations --report`.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import datetime
+import subprocess
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+import streamlit.logger
+from bench import fake_pyodbc
+sys.modules['pyodbc'] = fake_pyodbc  # before worker/database import pyodbc
+streamlit.logger.set_log_level('error')  # "no runtime" cache warnings outside `streamlit run`
+
+import worker
+import database
+from tabs.history import RUN_STATUSES
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+REGRESSION_THRESHOLD = 0.10
+
+def _views(host, job):
+    today = datetime.date.today()
+    return [
+        ('dashboard', database.get_dashboard_data),
+        ('health_summary', database.get_health_summary),
+        ('failures_24h', database.get_failures_24h),
+        ('instances', database.get_instances),
+        ('performance_instances', lambda: database.get_performance_instances(30)),
+        ('job_performance_summary', lambda: database.get_job_performance_summary(host, 30)),
+        ('job_duration_trends', lambda: database.get_job_duration_trends(host, 365)),
+        ('job_history_page', lambda: database.get_job_history_page(
+            host, job, today - datetime.timedelta(days=365), today, RUN_STATUSES)),
+        ('bootstrap_overview', lambda: database.bootstrap('overview')),
+    ]
+
+def _reset_caches():
+    """Forget every cached result and generation check so the next read goes to the database"""
+    database._cached_query.clear()
+    database._generations['checked_at'] = None
+    database._bootstrap.update(checked_at=None, tabs={})
+
+def _percentiles(samples_ms):
+    p50, p95, p99 = np.percentile(samples_ms, [50, 95, 99])
+    return {'p50_ms': round(p50, 3), 'p95_ms': round(p95, 3), 'p99_ms': round(p99, 3),
+            'max_ms': round(max(samples_ms), 3)}
+
+def _traced(fn):
+    """(result, peak traced memory in MB) for one call"""
+    tracemalloc.start()
+    try:
+        result = fn()
+        return result, round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+    finally:
+        tracemalloc.stop()
+
+def bench_ingest(standin, trace_memory):
+    """Full resync of every instance, then an incremental run with nothing new"""
+    collect = lambda: worker.run_collection(full_resync=True, lookback_days=0)
+    results = collect()
+    if results['failed']:
+        raise RuntimeError('; '.join(results['failed']))
+    incremental = worker.run_collection(lookback_days=0)
+    ingest = {
+        'rows': results['total_jobs_collected'],
+        'expected_rows': standin.expected_rows(),
+        'elapsed_seconds': results['elapsed_seconds'],
+        'publish_seconds': results['publish_seconds'],
+        'rows_per_sec': results['rows_per_sec'],
+        'end_to_end_rows_per_sec': round(results['total_jobs_collected'] / results['elapsed_seconds']),
+        'incremental_seconds': incremental['elapsed_seconds'],
+    }
+    if trace_memory:
+        # Separate pass: tracing slows allocation-heavy code enough to skew the timings above
+        _, ingest['peak_memory_mb'] = _traced(collect)
+    return ingest
+
+def bench_views(standin, repeat, trace_memory):
+    host = standin.instances[0][2]
+    job = 'Job 0000'
+    views = {}
+    for name, read in _views(host, job):
+        read()  # let the stand-in compute (and memoize) its answers first
+        cold, warm = [], []
+        for _ in range(repeat):
+            _reset_caches()
+            started = time.perf_counter()
+            read()
+            cold.append((time.perf_counter() - started) * 1000)
+            started = time.perf_counter()
+            result = read()
+            warm.append((time.perf_counter() - started) * 1000)
+        views[name] = {'cold': _percentiles(cold), 'warm': _percentiles(warm),
+                       'rows': len(result) if isinstance(result, pd.DataFrame) else None}
+        if trace_memory:
+            _reset_caches()
+            _, views[name]['peak_memory_mb'] = _traced(read)
+    return views
+
+def _git(*args):
+    try:
+        return subprocess.run(['git', *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+def save_results(results):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{results['commit'] or 'unversioned'}{'-dirty' if results['dirty'] else ''}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, default=str)
+    return path
+
+def _metrics(results):
+    """{label: (value, higher_is_better)} for the numbers worth comparing"""
+    metrics = {'ingest rows/sec': (results['ingest']['rows_per_sec'], True),
+               'ingest elapsed s': (results['ingest']['elapsed_seconds'], False)}
+    if 'peak_memory_mb' in results['ingest']:
+        metrics['ingest peak MB'] = (results['ingest']['peak_memory_mb'], False)
+    for name, view in results['views'].items():
+        metrics[f"{name} cold p50 ms"] = (view['cold']['p50_ms'], False)
+        metrics[f"{name} cold p95 ms"] = (view['cold']['p95_ms'], False)
+        metrics[f"{name} warm p50 ms"] = (view['warm']['p50_ms'], False)
+    return metrics
+
+def compare(old_path, new_path):
+    """Print old vs new with % change; returns 1 when anything regressed past REGRESSION_THRESHOLD"""
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+    if old['scale'] != new['scale']:
+        print(f"Warning: different scales {old['scale']} vs {new['scale']}")
+    old_metrics, new_metrics = _metrics(old), _metrics(new)
+    print(f"{'Metric':<40}{old['commit'] or 'old':>14}{new['commit'] or 'new':>14}{'Change':>10}")
+    regressed = False
+    for label, (new_value, higher_is_better) in new_metrics.items():
+        if label not in old_metrics:
+            continue
+        old_value = old_metrics[label][0]
+        change = (new_value - old_value) / old_value if old_value else 0.0
+        worse = -change if higher_is_better else change
+        flag = '  <- regression' if worse > REGRESSION_THRESHOLD else ''
+        regressed = regressed or bool(flag)
+        print(f"{label:<40}{old_value:>14}{new_value:>14}{change:>+10.1%}{flag}")
+    return 1 if regressed else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark collection and dashboard reads on synthetic data")
+    parser.add_argument("--instances", type=int, default=10)
+    parser.add_argument("--jobs", type=int, default=100, help="jobs per instance")
+    parser.add_argument("--days", type=int, default=30, help="days of history per job")
+    parser.add_argument("--runs-per-day", type=int, default=4, help="runs per job per day")
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="simulated network round trip per statement")
+    parser.add_argument("--repeat", type=int, default=20, help="samples per view")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc passes")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two saved results")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return compare(*args.compare)
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s")
+    standin = fake_pyodbc.configure(args.instances, args.jobs, args.days, args.runs_per_day,
+                                    args.failure_rate, args.seed, args.rtt_ms)
+    scale = {k: getattr(args, k) for k in ('instances', 'jobs', 'days', 'runs_per_day',
+                                           'failure_rate', 'seed', 'rtt_ms')}
+    print(f"Benchmarking {standin.expected_rows():,} history rows ({args.instances} instances x "
+          f"{args.jobs} jobs x {args.days} days x {args.runs_per_day} runs)")
+
+    results = {
+        'commit': _git('rev-parse', '--short', 'HEAD'),
+        'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scale': scale,
+        'ingest': bench_ingest(standin, not args.no_memory),
+    }
+    ingest = results['ingest']
+    print(f"Ingest: {ingest['rows']:,} rows in {ingest['elapsed_seconds']}s "
+          f"({ingest['rows_per_sec']:,} rows/sec written, {ingest['end_to_end_rows_per_sec']:,} end to end)"
+          + (f", peak {ingest['peak_memory_mb']} MB" if 'peak_memory_mb' in ingest else ''))
+
+    results['views'] = bench_views(standin, args.repeat, not args.no_memory)
+    print(f"{'View':<28}{'Rows':>8}{'Cold p50':>10}{'p95':>10}{'p99':>10}{'Warm p50':>10}")
+    for name, view in results['views'].items():
+        print(f"{name:<28}{view['rows'] or 0:>8}{view['cold']['p50_ms']:>10.2f}{view['cold']['p95_ms']:>10.2f}"
+              f"{view['cold']['p99_ms']:>10.2f}{view['warm']['p50_ms']:>10.2f}")
+    print(f"Saved {save_results(results)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
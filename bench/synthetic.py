@@ -0,0 +1,53 @@
+import random
+from datetime import datetime, timedelta
+
+# Message shapes close to what SQL Agent writes to sysjobhistory (step_id = 0 rows)
+SUCCESS_MESSAGE = ("The job succeeded.  The Job was invoked by Schedule {schedule} (Nightly).  "
+                   "The last step to run was step {steps} (Step {steps}).")
+FAILURE_MESSAGES = [
+    "The job failed.  The Job was invoked by Schedule {schedule} (Nightly).  The last step to run was "
+    "step {steps} (Step {steps}).  Executed as user: CORP\\svc_sql. Started {started:%Y-%m-%d %H:%M:%S}. "
+    "Login timeout expired [SQLSTATE HYT00] (Error 0).  The step failed.",
+    "Executed as user: CORP\\svc_sql. Violation of PRIMARY KEY constraint 'PK_Orders'. Cannot insert "
+    "duplicate key in object 'dbo.Orders'. The duplicate key value is ({key}). [SQLSTATE 23000] "
+    "(Error 2627).  The step failed.",
+    "Executed as user: CORP\\svc_sql. Transaction (Process ID {spid}) was deadlocked on lock resources "
+    "with another process and has been chosen as the deadlock victim. [SQLSTATE 40001] (Error 1205).  "
+    "The step failed.",
+]
+
+def instance_names(instances):
+    """(managed ServerName, FriendlyName, HostName) for each synthetic instance"""
+    return [(f"BENCH-SQL{i:02d}\\INST", f"Bench {i:02d}", f"BENCHHOST{i:02d}") for i in range(instances)]
+
+def generate_history(host_name, jobs, days, runs_per_day, failure_rate, seed, end=None):
+    """Yield pull_jobs.sql-shaped rows for one instance, oldest first
+
+    (ServerName, JobName, Status, LastRun, ErrorMessage, DurationSeconds,
+    CPUTimeMS, StepCount, HistoryID); HistoryID increases like
+    sysjobhistory.instance_id. Deterministic for a given seed.
+    """
+    rng = random.Random(f"{seed}:{host_name}")
+    end = end or datetime.now().replace(microsecond=0)
+    start = end - timedelta(days=days)
+    interval = timedelta(days=1) / runs_per_day
+    profiles = [(f"Job {job:04d}", rng.randint(5, 600), rng.randint(1, 8)) for job in range(jobs)]
+
+    history_id = 0
+    run_at = start
+    while run_at < end:
+        for job_name, base_duration, steps in profiles:
+            history_id += 1
+            failed = rng.random() < failure_rate
+            duration = max(1, int(rng.gauss(base_duration, base_duration * 0.2)))
+            if rng.random() < 0.01:
+                duration *= 10  # occasional spike
+            if failed:
+                message = rng.choice(FAILURE_MESSAGES).format(
+                    schedule=history_id % 50, steps=steps, started=run_at,
+                    key=rng.randint(100000, 999999), spid=rng.randint(50, 400))
+            else:
+                message = SUCCESS_MESSAGE.format(schedule=history_id % 50, steps=steps)
+            yield (host_name, job_name, 'Failed' if failed else 'Succeeded', run_at, message,
+                   duration, duration * 10 if not failed else 0, steps, history_id)
+        run_at += interval
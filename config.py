@@ -4,4 +4,90 @@ DB_CONFIG = {
     "server": "(localdb)\\MSSQLLocalDB", # Update to your Central Server Name
     "database": "SQL_Monitoring",
     "trusted_connection": "yes"
+}
+
+# Central connection pool (database.py), shared by the UI and the collector
+POOL_CONFIG = {
+    "min_size": 2,              # Connections opened up front
+    "max_size": 10,             # Hard cap; further callers wait
+    "acquire_timeout": 10,      # Seconds to wait for a free connection
+    "validate_idle_seconds": 5  # Ping connections idle longer than this on checkout
+}
+
+# Dashboard query cache (database.py)
+CACHE_CONFIG = {
+    "generation_check_seconds": 2,  # How long a DataGenerations read is reused before re-checking
+    "max_entries": 500          # Cached query results kept per process (older generations age out)
+}
+
+# Local Arrow snapshot of recent JobLogs (snapshot.py; needs pyarrow)
+SNAPSHOT_CONFIG = {
+    "enabled": True,            # False = history reads always go to SQL Server
+    "path": ".cache/job_history",  # Directory on the Streamlit host
+    "retention_days": 30,       # Days of history kept locally
+    "fetch_chunk_size": 50000,  # Rows per fetchmany() while refreshing
+    "max_parts_per_day": 16     # Incremental files per day before they are compacted into one
+}
+
+# JobLogs retention (retention.py; run by the collector daemon, or python -m retention)
+RETENTION_CONFIG = {
+    "raw_days": 90,             # Days of raw JobLogs rows kept; older days live on in JobRollupDaily (None = keep all)
+    "hourly_rollup_days": 30,   # JobRollupHourly window (the health summary reads the last 7 days)
+    "future_partitions": 7,     # Empty day partitions kept ahead of today so new rows never land in a split
+    "check_minutes": 60,        # How often the daemon enforces retention
+    "purge_chunk_rows": 2000    # Rows per committed delete when purging a deleted instance (stays under lock escalation)
+}
+
+# Per-job duration/CPU baselines and run flags (analytics.py), refreshed at publish time
+ANALYTICS_CONFIG = {
+    "enabled": True,
+    "baseline_days": 28,        # Reference window of successful runs, ending where the recent window starts
+    "recent_days": 3,           # Runs compared against the reference; new runs older than this are not flagged
+    "min_samples": 10,          # Reference runs a job needs before it can be flagged
+    "min_recent_samples": 3,    # Recent runs needed to call a sustained shift a regression
+    "anomaly_z": 3.5,           # Robust z-score, (x - median) / (1.4826 x MAD), that marks one run as an anomaly
+    "regression_ratio": 1.5,    # Recent median / reference median that marks a job as regressed
+    "min_delta_seconds": 30     # Ignore slowdowns smaller than this (CPU: x1000 ms); short jobs jitter
+}
+
+# Chart downsampling (downsample.py)
+CHART_CONFIG = {
+    "max_points_per_series": 400,  # Points plotted per line/bar series; failures are always kept
+    "max_points_per_chart": 4000,  # Shared by every series of a multi-line chart (Performance trends)
+    "method": "lttb"            # "lttb" keeps the line's shape, "minmax" keeps every bucket's extremes
+}
+
+# Hot-path timings and counters (instrumentation.py), shown on the Diagnostics tab
+METRICS_CONFIG = {
+    "enabled": True,            # Recording costs a few µs per timed call
+    "prefix": "sqlmon_",        # Prometheus metric name prefix
+    "textfile_dir": ".cache/metrics",  # <process>.prom per process for node_exporter's textfile collector; None = no export
+    "export_interval_seconds": 15,     # Minimum time between rewrites of the .prom file
+    # Histogram bucket upper bounds, seconds
+    "buckets": [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300]
+}
+
+# Collector tuning (worker.py)
+COLLECTOR_CONFIG = {
+    "max_workers": 16,          # Instances pulled in parallel
+    "connect_timeout": 10,      # Seconds to wait for a remote login
+    "instance_timeout": 120,    # Seconds allowed per instance (query timeout)
+    "total_timeout": 900,       # Seconds allowed for a whole collection run
+    "lookback_days": 90,        # History window pulled from msdb (0 = all)
+    "insert_batch_size": 5000,  # JobLogs rows per executemany round trip
+    "fetch_chunk_size": 5000,   # Rows per fetchmany() from a remote msdb
+    "queue_max_chunks": 32,     # Fetched chunks buffered ahead of the writer (bounds memory)
+    # Daemon scheduling (python -m worker --daemon)
+    "poll_seconds": 15,         # How often the daemon checks for due instances / queued requests
+    "default_interval_minutes": 15,  # Used when ManagedInstances.CollectionIntervalMinutes is NULL
+    # Sharding: collectors (daemons on any host, or --processes) split instances via CollectionLeases
+    "lease_batch_size": 64,     # Instances a collector claims per run; the rest stay free for other shards
+    "lease_grace_seconds": 300, # Lease = total_timeout + this; an owner that dies loses its instances after that
+    "shard_processes": 1,       # Default process count for one-off runs (python -m worker --processes N)
+    # Circuit breaker for unreachable instances (state kept in InstanceHealth)
+    "breaker_failure_threshold": 3,  # Consecutive failures before an instance is skipped
+    "breaker_cooldown_seconds": 300, # First skip period; doubles with each further failure
+    "retry_max_seconds": 3600,  # Cooldown ceiling
+    "min_connect_timeout": 2,   # Floor for the latency-based connect timeout
+    "latency_timeout_multiplier": 5  # Connect timeout = observed login latency x this
 }
\ No newline at end of file
@@ -1,65 +1,571 @@
 import streamlit as st
 import pandas as pd
 import pyodbc
+import re
+import queue
+import functools
+import threading
+import time
 import warnings
-from config import DB_CONFIG
+from contextlib import contextmanager
+from config import DB_CONFIG, POOL_CONFIG, CACHE_CONFIG
+from migrations import apply_migrations, read_committed_snapshot_enabled
+from instrumentation import timer, observe, increment, set_gauge
 
 warnings.filterwarnings('ignore', message='pandas only supports SQLAlchemy')
 
-@st.cache_resource
-def get_central_conn():
-    """Cached database connection shared across modules"""
-    return pyodbc.connect(
+def central_conn_str():
+    """Connection string for the central monitoring database"""
+    return (
         f"DRIVER={DB_CONFIG['driver']};"
         f"SERVER={DB_CONFIG['server']};"
         f"DATABASE={DB_CONFIG['database']};"
         f"Trusted_Connection=yes;"
     )
 
-def _fetch_from_db(query, params=None):
-    """Internal function to fetch from database"""
+class PoolTimeoutError(Exception):
+    """No central connection became available within the acquire timeout"""
+
+class ConnectionPool:
+    """Thread-safe pool of central-database connections
+
+    Connections are handed out LIFO (warm ones first), pinged on checkout when
+    they have sat idle, and replaced transparently when found dead. The pool
+    grows on demand up to max_size; callers beyond that wait up to
+    acquire_timeout seconds.
+    """
+
+    def __init__(self, conn_str, min_size, max_size, acquire_timeout, validate_idle_seconds):
+        self._conn_str = conn_str
+        self._max_size = max_size
+        self._acquire_timeout = acquire_timeout
+        self._validate_idle_seconds = validate_idle_seconds
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._size = 0
+        self._stats = {
+            'acquired': 0, 'created': 0, 'reconnects': 0, 'timeouts': 0,
+            'wait_seconds_total': 0.0, 'wait_seconds_max': 0.0
+        }
+        for _ in range(min_size):
+            try:
+                self._idle.put((self._open(), time.monotonic()))
+            except pyodbc.Error:
+                break  # server unavailable; grow lazily once it's back
+
+    def _reserve(self):
+        """Claim a slot for a new connection if the pool may still grow"""
+        with self._lock:
+            if self._size >= self._max_size:
+                return False
+            self._size += 1
+            return True
+
+    def _open(self, reserved=False):
+        if not reserved and not self._reserve():
+            raise PoolTimeoutError("Connection pool is full")
+        try:
+            conn = pyodbc.connect(self._conn_str)
+        except Exception:
+            with self._lock:
+                self._size -= 1
+            raise
+        with self._lock:
+            self._stats['created'] += 1
+        return conn
+
+    def _discard(self, conn):
+        with self._lock:
+            self._size -= 1
+        try:
+            conn.close()
+        except pyodbc.Error:
+            pass
+
+    def _is_alive(self, conn, idle_since):
+        if time.monotonic() - idle_since < self._validate_idle_seconds:
+            return True
+        try:
+            conn.cursor().execute("SELECT 1").fetchall()
+            return True
+        except pyodbc.Error:
+            return False
+
+    def acquire(self, timeout=None):
+        """Check out a live connection (raises PoolTimeoutError when exhausted)"""
+        started = time.monotonic()
+        deadline = started + (self._acquire_timeout if timeout is None else timeout)
+        while True:
+            try:
+                conn, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                if self._reserve():
+                    conn, idle_since = self._open(reserved=True), time.monotonic()
+                else:
+                    try:
+                        conn, idle_since = self._idle.get(timeout=max(0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        with self._lock:
+                            self._stats['timeouts'] += 1
+                        increment('pool_timeouts_total')
+                        raise PoolTimeoutError(
+                            f"No central connection available within {self._acquire_timeout}s "
+                            f"(pool size {self._max_size})"
+                        )
+
+            if self._is_alive(conn, idle_since):
+                waited = time.monotonic() - started
+                with self._lock:
+                    self._stats['acquired'] += 1
+                    self._stats['wait_seconds_total'] += waited
+                    self._stats['wait_seconds_max'] = max(self._stats['wait_seconds_max'], waited)
+                observe('pool_acquire_wait_seconds', waited)
+                return conn
+
+            self._discard(conn)
+            with self._lock:
+                self._stats['reconnects'] += 1
+
+    def release(self, conn, broken=False):
+        """Return a connection; anything left uncommitted is rolled back"""
+        if not broken:
+            try:
+                conn.rollback()
+            except pyodbc.Error:
+                broken = True
+        if broken:
+            self._discard(conn)
+        else:
+            self._idle.put((conn, time.monotonic()))
+
+    @contextmanager
+    def connection(self):
+        """with pool.connection() as conn: ... (caller commits)"""
+        conn = self.acquire()
+        broken = False
+        try:
+            yield conn
+        except pyodbc.Error:
+            broken = True
+            raise
+        finally:
+            self.release(conn, broken=broken)
+
+    def stats(self):
+        """Acquire/size metrics for diagnostics"""
+        with self._lock:
+            stats = dict(self._stats, size=self._size, idle=self._idle.qsize(), max_size=self._max_size)
+        stats['in_use'] = stats['size'] - stats['idle']
+        stats['wait_seconds_avg'] = (stats['wait_seconds_total'] / stats['acquired']
+                                     if stats['acquired'] else 0.0)
+        return stats
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Process-wide central connection pool (shared by the UI and the collector)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    central_conn_str(),
+                    min_size=POOL_CONFIG['min_size'],
+                    max_size=POOL_CONFIG['max_size'],
+                    acquire_timeout=POOL_CONFIG['acquire_timeout'],
+                    validate_idle_seconds=POOL_CONFIG['validate_idle_seconds']
+                )
+    return _pool
+
+def central_connection():
+    """Pooled central connection as a context manager"""
+    return get_pool().connection()
+
+def get_pool_stats():
+    return get_pool().stats()
+
+def record_pool_gauges():
+    """Copy the pool's current stats into pool_* gauges for export"""
+    for key, value in get_pool_stats().items():
+        set_gauge(f'pool_{key}', value)
+
+@st.cache_resource
+def ensure_schema():
+    """Apply pending schema migrations once per server process"""
+    with central_connection() as conn:
+        return apply_migrations(conn)
+
+@st.cache_resource
+def read_committed_snapshot_on():
+    """Whether the central database has READ_COMMITTED_SNAPSHOT on (checked once per server process)"""
+    with central_connection() as conn:
+        return read_committed_snapshot_enabled(conn.cursor())
+
+# Dataset tags. Each has a DataGenerations row that writers bump in the same
+# transaction as their change; cached reads are keyed by the generations they depend on.
+INSTANCES = 'instances'   # ManagedInstances
+JOB_LOGS = 'job_logs'     # JobLogs
+ROLLUPS = 'rollups'       # JobRollupHourly / JobRollupDaily / JobBaselines / JobAnomalies
+HEALTH = 'health'         # InstanceHealth / InstanceHealthSummary
+JOB_LOGS_REWRITE = 'job_logs_rewrite'  # JobLogs rows deleted (not just appended); see snapshot.py
+ALL_DATASETS = (INSTANCES, JOB_LOGS, ROLLUPS, HEALTH, JOB_LOGS_REWRITE)
+
+_generations = {'values': {}, 'checked_at': None}
+_generations_lock = threading.Lock()
+
+def get_generations():
+    """{dataset: generation}, re-read from DataGenerations at most every generation_check_seconds"""
+    with _generations_lock:
+        checked_at = _generations['checked_at']
+        if checked_at is not None and time.monotonic() - checked_at < CACHE_CONFIG['generation_check_seconds']:
+            return _generations['values']
+    try:
+        with timer('db_query_seconds', query='generations'), central_connection() as conn:
+            rows = conn.cursor().execute("SELECT Dataset, Generation FROM DataGenerations").fetchall()
+    except Exception:
+        return {}  # unknown generations never match a cached key; the query itself reports the error
+    values = {row[0]: row[1] for row in rows}
+    with _generations_lock:
+        _generations['values'] = values
+        _generations['checked_at'] = time.monotonic()
+    return values
+
+def bump_generations(cursor, *datasets):
+    """Mark datasets as changed (caller commits, together with the change itself)"""
+    placeholders = ', '.join('?' for _ in datasets)
+    cursor.execute(f"""
+        UPDATE DataGenerations SET Generation = Generation + 1, UpdatedAt = GETDATE()
+        WHERE Dataset IN ({placeholders})
+    """, datasets)
+
+def invalidate(*datasets, cursor=None):
+    """Bump datasets after a UI edit so every session re-reads only what changed
+
+    With cursor the bump joins the caller's transaction (caller commits).
+    """
+    if cursor is not None:
+        bump_generations(cursor, *datasets)
+    else:
+        with central_connection() as conn:
+            bump_generations(conn.cursor(), *datasets)
+            conn.commit()
+    with _generations_lock:
+        _generations['checked_at'] = None
+
+_cache_miss = threading.local()
+
+@st.cache_data(max_entries=CACHE_CONFIG['max_entries'], show_spinner=False)
+def _cached_query(query, params, generation_key, name):
+    """Query result for one combination of dataset generations (errors are not cached)"""
+    _cache_miss.flag = True  # the body only runs when st.cache_data has no entry
+    with timer('db_query_seconds', query=name), central_connection() as conn:
+        frame = pd.read_sql(query, conn, params=params)
+    increment('db_query_rows_total', len(frame), query=name)
+    return frame
+
+@functools.lru_cache(maxsize=256)
+def _query_label(query):
+    """Metric label for an unnamed query: the first table or view it reads"""
+    match = re.search(r'\bFROM\s+\[?(?:dbo\]?\.)?\[?(\w+)', query, re.IGNORECASE)
+    return match.group(1) if match else 'query'
+
+def fetch_data(query, params=None, datasets=ALL_DATASETS, name=None):
+    """Fetch data, cached until one of the datasets it reads from changes
+
+    name labels the query's metrics (defaults to the first table it reads).
+    """
+    name = name or _query_label(query)
+    generations = get_generations()
+    generation_key = tuple((dataset, generations.get(dataset)) for dataset in sorted(datasets))
+    _cache_miss.flag = False
+    started = time.perf_counter()
     try:
-        conn = get_central_conn()
-        return pd.read_sql(query, conn, params=params)
+        frame = _cached_query(query, params, generation_key, name)
     except Exception as e:
+        increment('db_errors_total', query=name)
         st.error(f"Database error: {str(e)}")
         return pd.DataFrame()
-
-@st.cache_data(ttl=60)
-def fetch_data(query, params=None):
-    """Fetch data with 60-second cache"""
-    return _fetch_from_db(query, params)
-
-@st.cache_data(ttl=300)
-def fetch_static_data(query, params=None):
-    """For rarely changing data (5-minute cache)"""
-    return _fetch_from_db(query, params)
+    result = 'miss' if _cache_miss.flag else 'hit'
+    observe('fetch_seconds', time.perf_counter() - started, query=name, cache=result)
+    increment('cache_requests_total', query=name, cache=result)
+    return frame
 
 def get_dashboard_data():
     """Fast access to dashboard data"""
-    return fetch_data("SELECT * FROM v_EnhancedDashboard WHERE IsActive = 1")
+    return fetch_data("SELECT * FROM v_EnhancedDashboard WHERE IsActive = 1",
+                      datasets=(INSTANCES, JOB_LOGS), name='dashboard')
 
 def get_health_summary():
     """Fast access to health summary"""
-    return fetch_data("SELECT * FROM v_InstanceHealthSummary WHERE IsActive = 1")
+    return fetch_data("SELECT * FROM v_InstanceHealthSummary WHERE IsActive = 1",
+                      datasets=(INSTANCES, HEALTH), name='health_summary')
 
 def get_failures_24h():
     """Fast access to 24h failures"""
-    return fetch_data("SELECT * FROM v_Last24HourFailures")
+    return fetch_data("SELECT * FROM v_Last24HourFailures", datasets=(INSTANCES, JOB_LOGS), name='failures_24h')
 
-def get_performance_trends():
-    """Fast access to performance data"""
+def get_performance_instances(days=30):
+    """Instances with rollup data in the window (HostName is the JobRollupDaily.ServerName key)"""
     return fetch_data("""
-        SELECT * FROM v_PerformanceTrends 
-        WHERE RunDate >= DATEADD(day, -30, GETDATE())
-        ORDER BY RunDate DESC
-    """)
+        SELECT mi.HostName, mi.FriendlyName
+        FROM ManagedInstances mi
+        WHERE mi.IsDeleted = 0
+          AND EXISTS (SELECT 1 FROM JobRollupDaily r
+                      WHERE r.ServerName = mi.HostName
+                        AND r.RunDate >= DATEADD(day, -?, CAST(GETDATE() AS DATE)))
+        ORDER BY mi.FriendlyName
+    """, params=[days], datasets=(INSTANCES, ROLLUPS), name='performance_instances')
+
+def get_job_performance_summary(server, days=30):
+    """One row per job on an instance over the window, slowest first"""
+    return fetch_data("""
+        SELECT JobName,
+               SUM(ExecutionCount) as ExecutionCount,
+               SUM(FailureCount) as FailureCount,
+               MAX(DurationMax) as MaxDuration
+        FROM JobRollupDaily
+        WHERE ServerName = ?
+          AND RunDate >= DATEADD(day, -?, CAST(GETDATE() AS DATE))
+        GROUP BY JobName
+        ORDER BY MaxDuration DESC
+    """, params=[server, days], datasets=(ROLLUPS,), name='job_performance_summary')
+
+def get_job_duration_trends(server, days=30):
+    """Daily duration rows for every job on an instance (charted downsampled, see downsample.py)"""
+    return fetch_data("""
+        SELECT JobName, RunDate,
+               CAST(DurationSum AS FLOAT) / ExecutionCount as AvgDuration,
+               DurationMax as MaxDuration,
+               FailureCount
+        FROM JobRollupDaily
+        WHERE ServerName = ?
+          AND RunDate >= DATEADD(day, -?, CAST(GETDATE() AS DATE))
+        ORDER BY JobName, RunDate
+    """, params=[server, days], datasets=(ROLLUPS,), name='job_duration_trends')
+
+def get_job_history_page(server, job, start_date, end_date, statuses, before=None, page_size=50):
+    """One page of a job's runs, newest first, via keyset seek on (LastRun, LogID)
+
+    before is the (LastRun, LogID) of the previous page's last row; the date
+    range is inclusive. Returns up to page_size + 1 rows so callers can tell
+    whether an older page exists.
+
+    JobLogs indexes are ordered only within each day partition, so the single
+    statement seeks IX_JobLogs_Server_Job_LastRun_LogID once per day, newest
+    day first. Ordering by (day, LastRun, LogID) is the order those seeks
+    return, so the plan stops after page_size + 1 rows instead of sorting
+    the whole range.
+    """
+    if not statuses:
+        return pd.DataFrame()
+    last_day = min(end_date, before[0].date()) if before is not None else end_date
+    days = (last_day - start_date).days + 1
+    if days < 1:
+        return pd.DataFrame(columns=['LogID', 'LastRun', 'Status', 'DurationSeconds', 'CPUTimeMS',
+                                     'ErrorID', 'ErrorPreview'])
+    params = [days, last_day, page_size + 1, server, job, *statuses]
+    seek = ""
+    if before is not None:
+        seek = "AND (LastRun < ? OR (LastRun = ? AND LogID < ?))"
+        params += [before[0], before[0], before[1]]
+    return fetch_data(f"""
+        WITH Days AS (
+            SELECT TOP (?) DATEADD(day, 1 - ROW_NUMBER() OVER (ORDER BY (SELECT NULL)), CAST(? AS DATE)) as RunDay
+            FROM sys.all_columns a CROSS JOIN sys.all_columns b
+        ),
+        Page AS (
+            SELECT TOP (?) jl.LogID, jl.LastRun, jl.Status, jl.DurationSeconds, jl.CPUTimeMS, jl.ErrorID
+            FROM Days d
+            CROSS APPLY (
+                SELECT LogID, LastRun, Status, DurationSeconds, CPUTimeMS, ErrorID
+                FROM JobLogs
+                WHERE ServerName = ? AND JobName = ? AND RunDateOnly = d.RunDay
+                  AND Status IN ({', '.join('?' for _ in statuses)})
+                  {seek}
+            ) jl
+            ORDER BY d.RunDay DESC, jl.LastRun DESC, jl.LogID DESC
+        )
+        SELECT p.LogID, p.LastRun, p.Status, p.DurationSeconds, p.CPUTimeMS, p.ErrorID,
+               LEFT(e.MaskedMessage, 200) as ErrorPreview
+        FROM Page p
+        LEFT JOIN ErrorMessages e ON e.ErrorID = p.ErrorID
+        ORDER BY p.LastRun DESC, p.LogID DESC
+    """, params=params, datasets=(JOB_LOGS,), name='job_history_page')
+
+def get_job_baselines(server):
+    """Per-job baselines and regression state for one instance (HostName; see analytics.py)"""
+    return fetch_data("""
+        SELECT JobName, SampleCount, DurationMedian, DurationP95, DurationMAD, RecentDurationMedian,
+               CPUMedian, CPUP95, RecentCPUMedian, RecentCount, IsRegression, UpdatedAt
+        FROM JobBaselines
+        WHERE ServerName = ?
+    """, params=[server], datasets=(ROLLUPS,), name='job_baselines')
+
+def get_job_anomalies(server, days=30):
+    """Runs flagged at publish time for one instance, newest first"""
+    return fetch_data("""
+        SELECT TOP 500 JobName, LastRun, Flag, Metric, Value, BaselineMedian, Score
+        FROM JobAnomalies
+        WHERE ServerName = ? AND LastRun >= DATEADD(day, -?, GETDATE())
+        ORDER BY LastRun DESC
+    """, params=[server, days], datasets=(ROLLUPS,), name='job_anomalies')
+
+def get_partition_sizes():
+    """Rows and space per JobLogs day partition, from the catalog (no table scan)"""
+    return fetch_data("""
+        SELECT ps.partition_number as PartitionNumber,
+               CAST(lo.value AS date) as RangeStart,
+               CAST(hi.value AS date) as RangeEnd,
+               SUM(CASE WHEN ps.index_id = 1 THEN ps.row_count ELSE 0 END) as Rows,
+               SUM(ps.used_page_count) * 8 / 1024.0 as UsedMB
+        FROM sys.dm_db_partition_stats ps
+        JOIN sys.indexes i ON i.object_id = ps.object_id AND i.index_id = ps.index_id
+        JOIN sys.partition_schemes s ON s.data_space_id = i.data_space_id
+        LEFT JOIN sys.partition_range_values lo
+            ON lo.function_id = s.function_id AND lo.boundary_id = ps.partition_number - 1
+        LEFT JOIN sys.partition_range_values hi
+            ON hi.function_id = s.function_id AND hi.boundary_id = ps.partition_number
+        WHERE ps.object_id = OBJECT_ID('dbo.JobLogs')
+        GROUP BY ps.partition_number, lo.value, hi.value
+        ORDER BY ps.partition_number
+    """, datasets=(JOB_LOGS,), name='partition_sizes')
+
+def get_error_message(error_id):
+    """Full text for an interned message (rows never change, so no dataset dependency)"""
+    return fetch_data("""
+        SELECT MaskedMessage, SampleMessage, FirstSeenAt FROM ErrorMessages WHERE ErrorID = ?
+    """, params=[int(error_id)], datasets=(), name='error_message')
 
 def get_instances():
-    """Fast access to instances list"""
-    return fetch_static_data("SELECT ServerName, FriendlyName, IsActive, DateAdded FROM ManagedInstances ORDER BY FriendlyName")
+    """Fast access to instances list (with collector circuit breaker state)"""
+    return fetch_data("""
+        SELECT mi.ServerName, mi.FriendlyName, mi.HostName, mi.IsActive, mi.DateAdded,
+               ISNULL(ih.BreakerState, 'closed') as BreakerState,
+               ISNULL(ih.ConsecutiveFailures, 0) as ConsecutiveFailures,
+               ih.LastError, ih.NextRetryAt, ih.ConnectLatencyMs
+        FROM ManagedInstances mi
+        LEFT JOIN InstanceHealth ih ON ih.ServerName = mi.ServerName
+        WHERE mi.IsDeleted = 0
+        ORDER BY mi.FriendlyName
+    """, datasets=(INSTANCES, HEALTH), name='instances')
+
+# ============================================
+# Per-rerun bootstrap: sync status, generations and the active tab's datasets in one batch
+# ============================================
+BOOTSTRAP_QUERIES = {
+    'overview': [
+        ('kpis', """
+            SELECT COUNT(*) as TotalJobs,
+                   ISNULL(SUM(CASE WHEN Status = 'Failed' THEN 1 ELSE 0 END), 0) as FailedJobs,
+                   (SELECT COUNT(*) FROM v_InstanceHealthSummary WHERE IsActive = 1) as ActiveInstances
+            FROM v_EnhancedDashboard WHERE IsActive = 1
+        """),
+        ('dashboard', "SELECT * FROM v_EnhancedDashboard WHERE IsActive = 1"),
+        ('health_summary', "SELECT * FROM v_InstanceHealthSummary WHERE IsActive = 1"),
+        ('flagged_runs', """
+            SELECT TOP 50 mi.FriendlyName, a.JobName, a.LastRun, a.Flag, a.Metric,
+                   a.Value, a.BaselineMedian, a.Score
+            FROM JobAnomalies a
+            INNER JOIN ManagedInstances mi ON mi.HostName = a.ServerName
+            WHERE mi.IsActive = 1 AND a.LastRun >= DATEADD(hour, -24, GETDATE())
+            ORDER BY a.Score DESC
+        """),
+        ('regressions', """
+            SELECT mi.FriendlyName, b.JobName, b.DurationMedian, b.RecentDurationMedian,
+                   b.CPUMedian, b.RecentCPUMedian, b.RecentCount
+            FROM JobBaselines b
+            INNER JOIN ManagedInstances mi ON mi.HostName = b.ServerName
+            WHERE mi.IsActive = 1 AND b.IsRegression = 1
+        """),
+    ],
+    'failures': [
+        ('failures_24h', "SELECT * FROM v_Last24HourFailures"),
+    ],
+}
+BOOTSTRAP_DEPENDENCIES = {
+    'overview': (INSTANCES, JOB_LOGS, HEALTH, ROLLUPS),
+    'failures': (INSTANCES, JOB_LOGS),
+}
+
+_bootstrap = {'status': {'last_sync': None, 'pending_requests': 0}, 'checked_at': None, 'tabs': {}}
+_bootstrap_lock = threading.Lock()
+
+def _generation_key(generations, datasets):
+    return tuple((dataset, generations.get(dataset)) for dataset in sorted(datasets))
+
+def _read_result_set(cursor):
+    columns = [column[0] for column in cursor.description]
+    return pd.DataFrame.from_records([tuple(row) for row in cursor.fetchall()],
+                                     columns=columns, coerce_float=True)
+
+def _bootstrap_result(tab):
+    frames = _bootstrap['tabs'].get(tab, (None, {}))[1]
+    return dict(_bootstrap['status'], **{name: frames.get(name, pd.DataFrame())
+                                         for name, _ in BOOTSTRAP_QUERIES.get(tab, [])})
+
+def bootstrap(tab):
+    """Sync status plus the tab's datasets, costing at most one round trip per rerun
+
+    Within generation_check_seconds of the last call nothing is sent. Otherwise
+    one batch returns the sync status and DataGenerations, and re-sends the
+    tab's datasets only when a generation they depend on has moved since they
+    were cached.
+    """
+    queries = BOOTSTRAP_QUERIES.get(tab, [])
+    dependencies = BOOTSTRAP_DEPENDENCIES.get(tab, ())
+    with _bootstrap_lock:
+        checked_at = _bootstrap['checked_at']
+        cached = _bootstrap['tabs'].get(tab)
+        if (checked_at is not None
+                and time.monotonic() - checked_at < CACHE_CONFIG['generation_check_seconds']
+                and (not queries or cached and cached[0] == _generation_key(_generations['values'], dependencies))):
+            increment('bootstrap_requests_total', tab=tab, result='cached')
+            return _bootstrap_result(tab)
+
+    batch = ["""
+        SET NOCOUNT ON;
+        SELECT (SELECT MAX(LastCollectedAt) FROM CollectionWatermarks) as LastSync,
+               (SELECT COUNT(*) FROM CollectionRequests WHERE CompletedAt IS NULL) as PendingRequests;
+        SELECT Dataset, Generation FROM DataGenerations;
+    """]
+    params = []
+    if queries:
+        # Skip the datasets server-side when the cached copy is still current
+        if cached:
+            changed = ' OR '.join('(Dataset = ? AND Generation <> ?)' for _ in cached[0])
+            batch.append(f"IF EXISTS (SELECT 1 FROM DataGenerations WHERE {changed})")
+            params += [value for pair in cached[0] for value in pair]
+        batch.append("BEGIN\n" + ";\n".join(query for _, query in queries) + ";\nEND")
+
+    try:
+        with timer('bootstrap_seconds', tab=tab), central_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("\n".join(batch), params)
+            status = cursor.fetchone()
+            cursor.nextset()
+            generations = {dataset: generation for dataset, generation in cursor.fetchall()}
+            frames = {}
+            for name, _ in queries:
+                if not cursor.nextset():
+                    break  # IF skipped the datasets: cached copy is current
+                frames[name] = _read_result_set(cursor)
+    except Exception as e:
+        increment('bootstrap_requests_total', tab=tab, result='error')
+        st.error(f"Database error: {str(e)}")
+        return _bootstrap_result(tab)
+    # refreshed: datasets re-sent; current: the IF found the cached copy still valid
+    increment('bootstrap_requests_total', tab=tab, result='refreshed' if frames or not queries else 'current')
 
-def clear_all_caches():
-    """Clear all caches when data is updated"""
-    st.cache_data.clear()
-    st.cache_resource.clear()
+    with _bootstrap_lock:
+        now = time.monotonic()
+        _bootstrap['status'] = {'last_sync': status[0], 'pending_requests': status[1]}
+        _bootstrap['checked_at'] = now
+        if frames:
+            _bootstrap['tabs'][tab] = (_generation_key(generations, dependencies), frames)
+        elif cached:
+            _bootstrap['tabs'][tab] = (_generation_key(generations, dependencies), cached[1])
+    with _generations_lock:
+        _generations['values'] = generations
+        _generations['checked_at'] = now
+    return _bootstrap_result(tab)
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+def _as_numeric(values):
+    """Float view of an x/y column (datetimes become epoch nanoseconds)"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(float)
+    return pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: positions of the threshold points that best keep the line's shape
+
+    x must be sorted. Bucket averages come from cumulative sums; only the
+    per-bucket triangle-area argmax walks the buckets in order.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    y = np.nan_to_num(y)
+    # threshold - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    avg_x = (cum_x[ends] - cum_x[starts]) / (ends - starts)
+    avg_y = (cum_y[ends] - cum_y[starts]) / (ends - starts)
+    # Each bucket is scored against the average of the next one (the last against the final point)
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    anchor = 0
+    for bucket, (start, end) in enumerate(zip(starts, ends)):
+        area = np.abs((x[anchor] - next_x[bucket]) * (y[start:end] - y[anchor])
+                      - (x[anchor] - x[start:end]) * (next_y[bucket] - y[anchor]))
+        anchor = start + int(np.argmax(area))
+        selected[bucket + 1] = anchor
+    return selected
+
+def minmax_indices(x, y, threshold):
+    """Min and max of each of threshold // 2 equal-count buckets, plus both endpoints
+
+    Keeps every local spike at the cost of a jagged line. Fully vectorized.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 4:
+        return np.arange(n)
+    buckets = np.arange(n) * (threshold // 2) // n
+    order = np.lexsort((np.where(np.isnan(y), -np.inf, y), buckets))
+    firsts = np.flatnonzero(np.r_[True, buckets[order][1:] != buckets[order][:-1]])
+    lasts = np.r_[firsts[1:] - 1, n - 1]
+    return np.unique(np.r_[0, order[firsts], order[lasts], n - 1])
+
+METHODS = {'lttb': lttb_indices, 'minmax': minmax_indices}
+
+def downsample(frame, x, y, max_points, by=None, keep=None, method='lttb'):
+    """Rows of frame thinned to about max_points per series, in their original order
+
+    by names the column(s) that split series (one line per job, say); keep is
+    a boolean mask of rows that must survive regardless (failures).
+    """
+    if frame.empty or len(frame) <= max_points and by is None:
+        return frame
+    x_values = _as_numeric(frame[x])
+    y_values = _as_numeric(frame[y])
+    series_rows = frame.groupby(by, sort=False).indices.values() if by is not None else [np.arange(len(frame))]
+
+    selected = np.zeros(len(frame), dtype=bool)
+    for rows in series_rows:
+        rows = rows[np.argsort(x_values[rows], kind='stable')]
+        selected[rows[METHODS[method](x_values[rows], y_values[rows], max_points)]] = True
+    if keep is not None:
+        selected |= np.asarray(keep, dtype=bool)
+    return frame.iloc[np.flatnonzero(selected)]
@@ -0,0 +1,284 @@
+import os
+import re
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from config import METRICS_CONFIG
+
+# In-process metrics for the dashboard and the collector: latency histograms,
+# counters and gauges keyed by (name, labels). Recording is a perf_counter
+# pair, a bisect and a dict update under one lock, so it stays on in production.
+# Each process exports its own Prometheus text file (node_exporter textfile
+# collector format): <textfile_dir>/<process>.prom, with a process label on
+# every series so the files never repeat a series. Collector daemons add
+# their pid to the name and remove the file when they stop; one-off runs
+# share a single collector.prom.
+BUCKETS = tuple(METRICS_CONFIG['buckets'])
+
+class _Histogram:
+    __slots__ = ('counts', 'count', 'sum', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last slot: above the largest bucket
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def copy(self):
+        copy = _Histogram()
+        copy.counts, copy.count, copy.sum, copy.max = list(self.counts), self.count, self.sum, self.max
+        return copy
+
+    def quantile(self, q):
+        """Estimate by linear interpolation inside the bucket that holds the q-th observation"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = BUCKETS[i - 1] if i else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / bucket_count, self.max)
+            seen += bucket_count
+        return self.max
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_gauges = {}
+_export = {'process': 'dashboard', 'exported_at': 0.0}
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def observe(name, seconds, **labels):
+    """Record one duration (seconds) in the name{labels} histogram"""
+    if not METRICS_CONFIG['enabled']:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = _Histogram()
+        histogram.observe(seconds)
+
+def increment(name, value=1, **labels):
+    if not METRICS_CONFIG['enabled']:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def set_gauge(name, value, **labels):
+    if not METRICS_CONFIG['enabled']:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+@contextmanager
+def timer(name, **labels):
+    """with timer('db_query_seconds', query='dashboard'): ..."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+def snapshot():
+    """Copies of every series, to hand to another process (see merge)"""
+    with _lock:
+        return ({key: histogram.copy() for key, histogram in _histograms.items()},
+                dict(_counters), dict(_gauges))
+
+def merge(other):
+    """Fold another process's snapshot() in: histograms and counters add up, gauges are replaced"""
+    histograms, counters, gauges = other
+    with _lock:
+        for key, histogram in histograms.items():
+            mine = _histograms.get(key)
+            if mine is None:
+                _histograms[key] = histogram.copy()
+                continue
+            mine.counts = [a + b for a, b in zip(mine.counts, histogram.counts)]
+            mine.count += histogram.count
+            mine.sum += histogram.sum
+            mine.max = max(mine.max, histogram.max)
+        for key, value in counters.items():
+            _counters[key] = _counters.get(key, 0) + value
+        _gauges.update(gauges)
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _gauges.clear()
+
+def _label_text(labels):
+    return ', '.join(f"{k}={v}" for k, v in labels)
+
+def _summary_row(name, labels, histogram, peak=True):
+    count = histogram.count
+    return {'Metric': name, 'Labels': _label_text(labels), 'Count': count,
+            'Total (s)': round(histogram.sum, 3),
+            'Avg (ms)': round(histogram.sum / count * 1000, 2) if count else 0.0,
+            'p50 (ms)': round(histogram.quantile(0.5) * 1000, 2),
+            'p95 (ms)': round(histogram.quantile(0.95) * 1000, 2),
+            'p99 (ms)': round(histogram.quantile(0.99) * 1000, 2),
+            'Max (ms)': round(histogram.max * 1000, 2) if peak else None}
+
+def histogram_rows():
+    """One dict per histogram series for the Diagnostics tab (times in ms)"""
+    with _lock:
+        series = sorted((key, histogram.copy()) for key, histogram in _histograms.items())
+    return [_summary_row(name, labels, histogram) for (name, labels), histogram in series]
+
+def counter_rows():
+    with _lock:
+        series = sorted(list(_counters.items()) + list(_gauges.items()))
+    return [{'Metric': name, 'Labels': _label_text(labels), 'Value': value}
+            for (name, labels), value in series]
+
+# ---- Prometheus text exposition ----------------------------------------
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _unescape(value):
+    return re.sub(r'\\(.)', lambda m: '\n' if m.group(1) == 'n' else m.group(1), value)
+
+def _series(name, labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return name
+    return name + '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+def prometheus_text():
+    """Every metric in Prometheus text format (names get METRICS_CONFIG['prefix'], series a process label)"""
+    prefix = METRICS_CONFIG['prefix']
+    process = (('process', _export['process']),)
+    with _lock:
+        histograms = {key: histogram.copy() for key, histogram in _histograms.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+
+    lines = []
+    declared = set()
+
+    def declare(name, kind):
+        if name not in declared:
+            declared.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), histogram in sorted(histograms.items()):
+        name, labels = prefix + name, process + labels
+        declare(name, 'histogram')
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS, histogram.counts):
+            cumulative += bucket_count
+            lines.append(f"{_series(name + '_bucket', labels, [('le', repr(float(bound)))])} {cumulative}")
+        lines.append(f"{_series(name + '_bucket', labels, [('le', '+Inf')])} {histogram.count}")
+        lines.append(f"{_series(name + '_sum', labels)} {histogram.sum}")
+        lines.append(f"{_series(name + '_count', labels)} {histogram.count}")
+    for kind, values in (('counter', counters), ('gauge', gauges)):
+        for (name, labels), value in sorted(values.items()):
+            declare(prefix + name, kind)
+            lines.append(f"{_series(prefix + name, process + labels)} {value}")
+    return '\n'.join(lines) + '\n'
+
+def set_process(name):
+    """Name this process's export file and process label (dashboard, collector, collector-<pid>)"""
+    _export['process'] = name
+
+def exported_processes(prefix):
+    """Process names with an export file starting with prefix, most recently written first"""
+    if not METRICS_CONFIG['textfile_dir']:
+        return []
+    directory = os.path.abspath(METRICS_CONFIG['textfile_dir'])
+    try:
+        names = [name for name in os.listdir(directory) if name.startswith(prefix) and name.endswith('.prom')]
+    except OSError:
+        return []
+    names.sort(key=lambda name: os.path.getmtime(os.path.join(directory, name)), reverse=True)
+    return [name[:-len('.prom')] for name in names]
+
+def textfile_path(process=None):
+    if not METRICS_CONFIG['textfile_dir']:
+        return None
+    return os.path.join(os.path.abspath(METRICS_CONFIG['textfile_dir']), f"{process or _export['process']}.prom")
+
+def export(force=False):
+    """Rewrite this process's .prom file, at most every export_interval_seconds"""
+    path = textfile_path()
+    if not METRICS_CONFIG['enabled'] or path is None:
+        return
+    now = time.monotonic()
+    if not force and now - _export['exported_at'] < METRICS_CONFIG['export_interval_seconds']:
+        return
+    _export['exported_at'] = now
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'  # the textfile collector ignores non-.prom files
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
+
+def remove_export():
+    """Delete this process's .prom file (long-running processes with a per-pid name, on exit)"""
+    path = textfile_path()
+    if path is None:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+_LINE = re.compile(r'^(\w+?)(?:_(bucket|sum|count))?(?:\{(.*)\})? (\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+def read_textfile(process):
+    """(histogram rows, counter rows) from another process's export, shaped like histogram_rows()/counter_rows()"""
+    path = textfile_path(process)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+    except (OSError, TypeError):
+        return None
+    prefix = METRICS_CONFIG['prefix']
+    kinds = dict(re.findall(r'^# TYPE (\w+) (\w+)$', text, re.MULTILINE))
+    histograms, values = {}, []
+    for line in text.splitlines():
+        match = _LINE.match(line)
+        if line.startswith('#') or not match:
+            continue
+        name, suffix, label_text, value = match.groups()
+        if kinds.get(name) != 'histogram':
+            name, suffix = line.split('{')[0].split(' ')[0], None
+        labels = [(k, _unescape(v)) for k, v in _LABEL.findall(label_text or '') if k != 'process']
+        if suffix is None:
+            values.append({'Metric': name[len(prefix):], 'Labels': _label_text(labels), 'Value': float(value)})
+            continue
+        key = (name[len(prefix):], tuple(pair for pair in labels if pair[0] != 'le'))
+        histogram = histograms.setdefault(key, {'buckets': [], 'count': 0, 'sum': 0.0})
+        if suffix == 'bucket':
+            histogram['buckets'].append(int(float(value)))
+        else:
+            histogram[suffix] = float(value)
+
+    rows = []
+    for (name, labels), h in sorted(histograms.items()):
+        restored = _Histogram()
+        cumulative = h['buckets'][:len(BUCKETS)] + [int(h['count'])]
+        restored.counts = [b - a for a, b in zip([0] + cumulative[:-1], cumulative)]
+        restored.count, restored.sum = int(h['count']), h['sum']
+        # The export has no max; the highest non-empty bucket bounds the estimate
+        filled = [i for i, bucket_count in enumerate(restored.counts) if bucket_count]
+        restored.max = BUCKETS[min(filled[-1], len(BUCKETS) - 1)] if filled else 0.0
+        rows.append(_summary_row(name, labels, restored, peak=False))
+    return rows, values
@@ -0,0 +1,187 @@
+import os
+import re
+import sys
+import time
+import statistics
+import pyodbc
+from config import DB_CONFIG
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sql', 'migrations')
+
+# Representative dashboard statements timed by --report: (query, params filled from
+# sample data, condition the query needs). The "before" timings run on the unmigrated
+# schema, so a query on objects a migration adds is guarded and reported as n/a.
+REPORT_QUERIES = {
+    "Dashboard (latest run per job)": ("SELECT * FROM v_EnhancedDashboard WHERE IsActive = 1", (), None),
+    "24-hour failures": ("SELECT * FROM v_Last24HourFailures", (), None),
+    "Job history (top 50)": ("""
+        SELECT TOP 50 LastRun, Status, DurationSeconds, CPUTimeMS
+        FROM JobLogs WHERE ServerName = ? AND JobName = ?
+        ORDER BY LastRun DESC
+    """, ('server', 'job'), None),
+    "Data statistics": ("""
+        SELECT (SELECT SUM(row_count) FROM sys.dm_db_partition_stats
+                WHERE object_id = OBJECT_ID('dbo.JobLogs') AND index_id = 1),
+               (SELECT MIN(LastRun) FROM JobLogs), (SELECT MAX(LastRun) FROM JobLogs),
+               (SELECT COUNT(DISTINCT ServerName) FROM JobRollupDaily)
+    """, (), "OBJECT_ID('dbo.JobRollupDaily', 'U') IS NOT NULL"
+            " AND HAS_PERMS_BY_NAME(DB_NAME(), 'DATABASE', 'VIEW DATABASE STATE') = 1"),
+    "Rows for one server (delete path)": ("SELECT COUNT(*) FROM JobLogs WHERE ServerName = ?", ('server',), None),
+}
+
+def _split_batches(script):
+    """Split a script on GO separators like SSMS/sqlcmd do"""
+    return [batch.strip() for batch in re.split(r'^\s*GO\s*$', script, flags=re.MULTILINE | re.IGNORECASE)
+            if batch.strip()]
+
+def _ensure_version_table(cursor):
+    cursor.execute("""
+        IF OBJECT_ID('dbo.SchemaVersion', 'U') IS NULL
+            CREATE TABLE dbo.SchemaVersion (
+                Version int NOT NULL PRIMARY KEY,
+                Name nvarchar(200) NOT NULL,
+                AppliedAt datetime NOT NULL DEFAULT (GETDATE()),
+                DurationMs int NULL
+            )
+    """)
+
+def available_migrations():
+    """(version, name, path) for every sql/migrations/NNNN_name.sql, in order"""
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = re.match(r'^(\d+)_(.+)\.sql$', filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    return migrations
+
+def get_schema_version(cursor):
+    """Highest applied migration version (0 = baseline schema.sql, at most upgraded by 0000)"""
+    _ensure_version_table(cursor)
+    cursor.execute("SELECT ISNULL(MAX(Version), 0) FROM dbo.SchemaVersion")
+    return cursor.fetchone()[0]
+
+def _is_applied(cursor, version):
+    cursor.execute("SELECT COUNT(*) FROM dbo.SchemaVersion WHERE Version = ?", version)
+    return cursor.fetchone()[0] > 0
+
+RCSI_OFF_MESSAGE = ("READ_COMMITTED_SNAPSHOT is off, so dashboard reads wait on collector publishes; "
+                    "have a DBA run `python -m migrations --enable-rcsi` once")
+
+def read_committed_snapshot_enabled(cursor):
+    """Whether the current database has READ_COMMITTED_SNAPSHOT on"""
+    cursor.execute("SELECT is_read_committed_snapshot_on FROM sys.databases WHERE database_id = DB_ID()")
+    return bool(cursor.fetchone()[0])
+
+def enable_read_committed_snapshot(conn):
+    """Turn on READ_COMMITTED_SNAPSHOT so dashboard readers never wait on a publish
+
+    A one-off DBA step (--enable-rcsi), never run at startup: ROLLBACK
+    IMMEDIATE kills every open transaction in the database, and ALTER
+    DATABASE can't run inside a transaction, so this uses autocommit mode.
+    Returns True when it changed the setting.
+    """
+    cursor = conn.cursor()
+    enabled = read_committed_snapshot_enabled(cursor)
+    conn.commit()
+    if enabled:
+        return False
+    conn.autocommit = True
+    try:
+        cursor.execute("ALTER DATABASE CURRENT SET READ_COMMITTED_SNAPSHOT ON WITH ROLLBACK IMMEDIATE")
+    finally:
+        conn.autocommit = False
+    return True
+
+def apply_migrations(conn):
+    """Apply pending migrations, each in its own transaction; returns the names applied
+
+    An exclusive app lock serializes concurrent callers (several Streamlit
+    sessions and the collector may all start at once). Each version is
+    checked on its own, so 0000 (added after later versions shipped) still
+    runs on databases that already have them.
+    """
+    cursor = conn.cursor()
+    applied = []
+    for version, name, path in available_migrations():
+        cursor.execute("""
+            EXEC sp_getapplock @Resource = 'SQL_Monitoring.Migrations',
+                @LockMode = 'Exclusive', @LockOwner = 'Transaction', @LockTimeout = 60000;
+        """)
+        _ensure_version_table(cursor)
+        if _is_applied(cursor, version):
+            conn.commit()
+            continue
+
+        with open(path, 'r', encoding='utf-8') as f:
+            script = f.read()
+        started = time.perf_counter()
+        try:
+            for batch in _split_batches(script):
+                cursor.execute(batch)
+            cursor.execute(
+                "INSERT INTO dbo.SchemaVersion (Version, Name, DurationMs) VALUES (?, ?, ?)",
+                (version, name, int((time.perf_counter() - started) * 1000))
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(f"{version:04d}_{name}")
+    return applied
+
+def time_report_queries(conn, repeat=3):
+    """Median wall-clock milliseconds for each REPORT_QUERIES statement (None when its condition fails)"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT TOP 1 ServerName, JobName FROM JobLogs ORDER BY LogID DESC")
+    sample = cursor.fetchone() or ('', '')
+    sample_values = {'server': sample[0], 'job': sample[1]}
+
+    timings = {}
+    for label, (query, param_names, requires) in REPORT_QUERIES.items():
+        if requires and not cursor.execute(f"SELECT CASE WHEN {requires} THEN 1 ELSE 0 END").fetchone()[0]:
+            timings[label] = None
+            continue
+        params = [sample_values[p] for p in param_names]
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            cursor.execute(query, params).fetchall()
+            runs.append((time.perf_counter() - started) * 1000)
+        timings[label] = statistics.median(runs)
+    conn.commit()
+    return timings
+
+def _ms(value):
+    return 'n/a' if value is None else f"{value:.1f}"
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    report = '--report' in argv
+    enable_rcsi = '--enable-rcsi' in argv
+    conn = pyodbc.connect(
+        f"DRIVER={DB_CONFIG['driver']};"
+        f"SERVER={DB_CONFIG['server']};"
+        f"DATABASE={DB_CONFIG['database']};"
+        f"Trusted_Connection=yes;"
+    )
+    try:
+        if enable_rcsi:
+            changed = enable_read_committed_snapshot(conn)
+            print("READ_COMMITTED_SNAPSHOT " + ("turned on" if changed else "was already on"))
+        before = time_report_queries(conn) if report else None
+        applied = apply_migrations(conn)
+        print(f"Schema version {get_schema_version(conn.cursor())}; applied: {', '.join(applied) or 'nothing'}")
+        if not read_committed_snapshot_enabled(conn.cursor()):
+            print(f"Warning: {RCSI_OFF_MESSAGE}")
+        conn.commit()
+        if report:
+            after = time_report_queries(conn)
+            print(f"{'Query':<36}{'Before (ms)':>14}{'After (ms)':>14}")
+            for label in REPORT_QUERIES:
+                print(f"{label:<36}{_ms(before[label]):>14}{_ms(after[label]):>14}")
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,323 @@
+import sys
+import time
+import logging
+import argparse
+import threading
+import pandas as pd
+from datetime import date, timedelta
+from config import RETENTION_CONFIG, SNAPSHOT_CONFIG
+from database import central_connection, bump_generations, ALL_DATASETS, JOB_LOGS, JOB_LOGS_REWRITE, ROLLUPS
+from instrumentation import observe, increment
+
+log = logging.getLogger("retention")
+
+# JobLogs is partitioned by day on RunDateOnly (migration 0007). RANGE RIGHT:
+# partition n holds [boundary n-1, boundary n), partition 1 everything before
+# the first boundary. Days older than the raw window are folded into
+# JobRollupDaily, then their partitions are truncated and the empty ranges
+# merged away, all in one transaction.
+PARTITION_FUNCTION = 'pf_JobLogs_RunDate'
+PARTITION_SCHEME = 'ps_JobLogs_RunDate'
+
+# Rebuilds the daily rollup rows of days about to be purged from their raw rows
+# (exact, since a day's rows all sit in its partition), so the aggregates that
+# outlive the purge match what was stored even if a publish-time MERGE drifted
+COMPACT_DAILY = """
+    MERGE JobRollupDaily AS t
+    USING (
+        SELECT ServerName, JobName, RunDateOnly AS RunDate,
+               COUNT(*) AS ExecutionCount,
+               SUM(CASE WHEN Status = 'Succeeded' THEN 1 ELSE 0 END) AS SuccessCount,
+               SUM(CASE WHEN Status = 'Failed' THEN 1 ELSE 0 END) AS FailureCount,
+               SUM(CAST(ISNULL(DurationSeconds, 0) AS bigint)) AS DurationSum,
+               MIN(ISNULL(DurationSeconds, 0)) AS DurationMin,
+               MAX(ISNULL(DurationSeconds, 0)) AS DurationMax,
+               SUM(CAST(ISNULL(CPUTimeMS, 0) AS bigint)) AS CPUSum,
+               MIN(ISNULL(CPUTimeMS, 0)) AS CPUMin,
+               MAX(ISNULL(CPUTimeMS, 0)) AS CPUMax
+        FROM JobLogs
+        WHERE RunDateOnly < ?
+        GROUP BY ServerName, JobName, RunDateOnly
+    ) AS s
+        ON t.ServerName = s.ServerName AND t.JobName = s.JobName AND t.RunDate = s.RunDate
+    WHEN MATCHED THEN UPDATE SET
+        ExecutionCount = s.ExecutionCount,
+        SuccessCount = s.SuccessCount,
+        FailureCount = s.FailureCount,
+        DurationSum = s.DurationSum,
+        DurationMin = s.DurationMin,
+        DurationMax = s.DurationMax,
+        CPUSum = s.CPUSum,
+        CPUMin = s.CPUMin,
+        CPUMax = s.CPUMax
+    WHEN NOT MATCHED THEN
+        INSERT (ServerName, JobName, RunDate, ExecutionCount, SuccessCount, FailureCount,
+                DurationSum, DurationMin, DurationMax, CPUSum, CPUMin, CPUMax)
+        VALUES (s.ServerName, s.JobName, s.RunDate, s.ExecutionCount, s.SuccessCount,
+                s.FailureCount, s.DurationSum, s.DurationMin, s.DurationMax,
+                s.CPUSum, s.CPUMin, s.CPUMax);
+"""
+
+def raw_cutoff(today=None):
+    """First RunDate whose raw JobLogs rows are kept (None = keep everything)"""
+    if not RETENTION_CONFIG['raw_days']:
+        return None
+    return (today or date.today()) - timedelta(days=RETENTION_CONFIG['raw_days'])
+
+def _boundaries(cursor):
+    cursor.execute("""
+        SELECT CAST(v.value AS date)
+        FROM sys.partition_range_values v
+        JOIN sys.partition_functions f ON f.function_id = v.function_id
+        WHERE f.name = ?
+        ORDER BY v.boundary_id
+    """, PARTITION_FUNCTION)
+    return [row[0] for row in cursor.fetchall()]
+
+def _partition_rows(cursor, last_partition):
+    """Rows in JobLogs partitions 1..last_partition"""
+    cursor.execute("""
+        SELECT ISNULL(SUM(row_count), 0) FROM sys.dm_db_partition_stats
+        WHERE object_id = OBJECT_ID('dbo.JobLogs') AND index_id = 1 AND partition_number <= ?
+    """, last_partition)
+    return cursor.fetchone()[0]
+
+def _add_future_partitions(cursor, boundaries, today):
+    """Split empty day partitions ahead of the data (metadata only while the last partition is empty)"""
+    last_day = today + timedelta(days=RETENTION_CONFIG['future_partitions'])
+    added = 0
+    day = boundaries[-1] if boundaries else today
+    while day < last_day:
+        day += timedelta(days=1)
+        cursor.execute(f"ALTER PARTITION SCHEME {PARTITION_SCHEME} NEXT USED [PRIMARY]")
+        cursor.execute(f"ALTER PARTITION FUNCTION {PARTITION_FUNCTION}() SPLIT RANGE ('{day:%Y%m%d}')")
+        added += 1
+    return added
+
+def _purge_days(cursor, boundaries, cutoff):
+    """Compact and truncate every partition that ends on or before cutoff; returns (days, rows)"""
+    expired = [boundary for boundary in boundaries if boundary <= cutoff]
+    if not expired:
+        return 0, 0
+    rows = _partition_rows(cursor, len(expired))
+    if rows:
+        cursor.execute(COMPACT_DAILY, cutoff)
+        cursor.execute(f"TRUNCATE TABLE JobLogs WITH (PARTITIONS (1 TO {len(expired)}))")
+    # Merging a boundary drops the (now empty) partition to its right; the last
+    # expired boundary stays as the lower edge of the first day still kept
+    for boundary in expired[:-1]:
+        cursor.execute(f"ALTER PARTITION FUNCTION {PARTITION_FUNCTION}() MERGE RANGE ('{boundary:%Y%m%d}')")
+    return len(expired), rows
+
+def enforce_retention(dry_run=False):
+    """Purge raw JobLogs days past raw_days and keep partitions ready ahead of today
+
+    Returns a summary dict, or None when another collector holds the
+    retention lock. dry_run reports what would be purged without changing it.
+    """
+    started = time.perf_counter()
+    today = date.today()
+    cutoff = raw_cutoff(today)
+    hourly_cutoff = today - timedelta(days=RETENTION_CONFIG['hourly_rollup_days'])
+    with central_connection() as conn:
+        cursor = conn.cursor()
+        # One enforcer at a time across daemons; the others skip this round
+        cursor.execute("""
+            DECLARE @result int;
+            EXEC @result = sp_getapplock @Resource = 'SQL_Monitoring.Retention',
+                @LockMode = 'Exclusive', @LockOwner = 'Transaction', @LockTimeout = 0;
+            SELECT @result;
+        """)
+        if cursor.fetchone()[0] < 0:
+            conn.rollback()
+            return None
+
+        boundaries = _boundaries(cursor)
+        summary = {'cutoff': cutoff, 'purged_days': 0, 'purged_rows': 0,
+                   'hourly_rows': 0, 'partitions_added': 0}
+        if dry_run:
+            expired = [boundary for boundary in boundaries if cutoff and boundary <= cutoff]
+            summary.update(purged_days=len(expired),
+                           purged_rows=_partition_rows(cursor, len(expired)) if expired else 0)
+            conn.rollback()
+            return summary
+
+        if cutoff:
+            summary['purged_days'], summary['purged_rows'] = _purge_days(cursor, boundaries, cutoff)
+        cursor.execute("DELETE FROM JobRollupHourly WHERE HourStart < ?", hourly_cutoff)
+        summary['hourly_rows'] = max(cursor.rowcount, 0)
+        if cutoff:
+            cursor.execute("DELETE FROM JobAnomalies WHERE LastRun < ?", cutoff)
+        summary['partitions_added'] = _add_future_partitions(cursor, _boundaries(cursor), today)
+
+        changed = []
+        if summary['purged_rows']:
+            changed.append(JOB_LOGS)
+            # The local snapshot only holds its own window; older purges leave it intact
+            if cutoff > today - timedelta(days=SNAPSHOT_CONFIG['retention_days']):
+                changed.append(JOB_LOGS_REWRITE)
+        if summary['purged_rows'] or summary['hourly_rows']:
+            changed.append(ROLLUPS)
+        if changed:
+            bump_generations(cursor, *changed)
+        conn.commit()
+
+    summary['elapsed_seconds'] = round(time.perf_counter() - started, 2)
+    observe('retention_seconds', summary['elapsed_seconds'])
+    increment('retention_rows_purged_total', summary['purged_rows'])
+    return summary
+
+def log_summary(summary):
+    if summary is None:
+        log.info("Retention skipped: another collector is enforcing it")
+    elif summary['purged_days'] or summary['hourly_rows'] or summary['partitions_added']:
+        log.info("Retention: purged %s row(s) in %s day partition(s) before %s, %s hourly rollup row(s), "
+                 "added %s partition(s) in %.1fs", summary['purged_rows'], summary['purged_days'],
+                 summary['cutoff'], summary['hourly_rows'], summary['partitions_added'],
+                 summary.get('elapsed_seconds', 0))
+
+# ---- Deleted instances ----------------------------------------------------
+
+# An instance's collected data, keyed by its source host name (JobLogs first, by far the largest)
+INSTANCE_DATA_TABLES = ['JobLogs', 'JobAnomalies', 'JobRollupHourly', 'JobRollupDaily', 'JobBaselines']
+# Keyed by the managed name; removed together with the ManagedInstances row once the data is gone
+INSTANCE_STATE_TABLES = ['InstanceHealthSummary', 'InstanceHealth', 'CollectionWatermarks', 'CollectionLeases']
+
+def _live_name(column, excluding=None):
+    """SQL condition: column is a name an instance that isn't deleted still collects under
+
+    (e.g. the same host re-added under another instance name); rows keyed by
+    such names are never purged. excluding: an SQL expression for an instance
+    to leave out of the check.
+    """
+    other = f" AND live.ServerName <> {excluding}" if excluding else ""
+    return f"""EXISTS (SELECT 1 FROM ManagedInstances live
+                        LEFT JOIN CollectionWatermarks lw ON lw.ServerName = live.ServerName
+                        WHERE live.IsDeleted = 0{other}
+                          AND {column} IN (live.ServerName, live.HostName, lw.SourceServerName))"""
+
+_purge = {'thread': None}
+_purge_lock = threading.Lock()
+
+def soft_delete_instance(cursor, svr_name):
+    """Hide an instance immediately (caller commits); purge_deleted_instances removes its data"""
+    cursor.execute(f"""
+        UPDATE mi SET IsDeleted = 1, IsActive = 0, DeletedAt = GETDATE(), LastModified = GETDATE(),
+               PurgeRowsDone = 0,
+               PurgeRowsTotal = ISNULL((SELECT SUM(CAST(r.ExecutionCount AS bigint)) FROM JobRollupDaily r
+                                        WHERE r.ServerName IN (mi.HostName, w.SourceServerName)
+                                          AND r.RunDate >= ?
+                                          AND NOT {_live_name('r.ServerName', excluding='mi.ServerName')}), 0)
+        FROM ManagedInstances mi
+        LEFT JOIN CollectionWatermarks w ON w.ServerName = mi.ServerName
+        WHERE mi.ServerName = ?
+    """, (raw_cutoff() or date.min, svr_name))
+
+def _purge_instance(conn, svr_name, hosts, chunk_rows, deadline):
+    """Delete one instance's rows chunk by chunk, each chunk its own short transaction
+
+    Returns (rows deleted, finished).
+    """
+    cursor = conn.cursor()
+    deleted = 0
+    placeholders = ', '.join('?' for _ in hosts)
+    for table in INSTANCE_DATA_TABLES:
+        while True:
+            # Checked per chunk: an instance may be (re-)added for the same host mid-purge
+            cursor.execute(f"""
+                DELETE TOP (?) FROM {table}
+                WHERE ServerName IN ({placeholders})
+                  AND NOT {_live_name(f'{table}.ServerName')}
+            """, [chunk_rows, *hosts])
+            count = max(cursor.rowcount, 0)
+            if table == 'JobLogs' and count:
+                cursor.execute("UPDATE ManagedInstances SET PurgeRowsDone = PurgeRowsDone + ? WHERE ServerName = ?",
+                               (count, svr_name))
+            conn.commit()
+            deleted += count
+            if count < chunk_rows:
+                break
+            if deadline is not None and time.monotonic() > deadline:
+                return deleted, False
+
+    for table in INSTANCE_STATE_TABLES:
+        cursor.execute(f"DELETE FROM {table} WHERE ServerName = ?", svr_name)
+    cursor.execute("DELETE FROM ManagedInstances WHERE ServerName = ? AND IsDeleted = 1", svr_name)
+    # Dashboards and the local snapshot may still hold the instance's rows
+    bump_generations(cursor, *ALL_DATASETS)
+    conn.commit()
+    return deleted, True
+
+def purge_deleted_instances(max_seconds=None):
+    """Remove soft-deleted instances' data in small chunks; returns rows deleted
+
+    Chunks of purge_chunk_rows commit one by one, so collection and dashboard
+    reads are never blocked for long. Safe to run from several processes at once.
+    """
+    chunk_rows = RETENTION_CONFIG['purge_chunk_rows']
+    deadline = time.monotonic() + max_seconds if max_seconds else None
+    deleted = 0
+    with central_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT mi.ServerName, mi.HostName, w.SourceServerName
+            FROM ManagedInstances mi
+            LEFT JOIN CollectionWatermarks w ON w.ServerName = mi.ServerName
+            WHERE mi.IsDeleted = 1
+            ORDER BY mi.DeletedAt
+        """)
+        instances = cursor.fetchall()
+        conn.commit()
+        for svr_name, host, source_server in instances:
+            hosts = sorted({name for name in (svr_name, host, source_server) if name})
+            count, finished = _purge_instance(conn, svr_name, hosts, chunk_rows, deadline)
+            deleted += count
+            increment('instance_purge_rows_total', count)
+            if finished:
+                log.info("Purged deleted instance %s", svr_name)
+            if deadline is not None and time.monotonic() > deadline:
+                break
+    return deleted
+
+def _purge_in_background():
+    try:
+        purge_deleted_instances()
+    except Exception as e:
+        log.exception("Background instance purge failed: %s", e)
+
+def start_background_purge():
+    """Purge deleted instances on a daemon thread of this process, unless one is already running"""
+    with _purge_lock:
+        if _purge['thread'] is not None and _purge['thread'].is_alive():
+            return
+        _purge['thread'] = threading.Thread(target=_purge_in_background, name="instance-purge", daemon=True)
+        _purge['thread'].start()
+
+def get_purge_progress():
+    """Deleted instances whose data is still being purged (read uncached: progress moves without generation bumps)"""
+    with central_connection() as conn:
+        frame = pd.read_sql("""
+            SELECT ServerName, FriendlyName, DeletedAt, PurgeRowsDone, ISNULL(PurgeRowsTotal, 0) as PurgeRowsTotal
+            FROM ManagedInstances
+            WHERE IsDeleted = 1
+            ORDER BY DeletedAt
+        """, conn)
+        conn.commit()
+    return frame
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Purge JobLogs days past the retention window")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be purged")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    summary = enforce_retention(dry_run=args.dry_run)
+    if args.dry_run and summary:
+        log.info("Would purge %s row(s) in %s day partition(s) before %s",
+                 summary['purged_rows'], summary['purged_days'], summary['cutoff'])
+    else:
+        log_summary(summary)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+import os
+import json
+import shutil
+import threading
+import datetime
+import pandas as pd
+from config import SNAPSHOT_CONFIG
+from database import central_connection, get_generations, JOB_LOGS, JOB_LOGS_REWRITE
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.feather as feather
+    from pyarrow import fs
+except ImportError:  # optional dependency; callers fall back to SQL
+    pa = None
+
+# Local Arrow IPC copy of recent JobLogs, one directory per LastRun day:
+#   <path>/RunDate=YYYY-MM-DD/part-<first LogID>.arrow
+# Files are uncompressed so reads are memory-mapped rather than parsed.
+SNAPSHOT_COLUMNS = ['LogID', 'ServerName', 'JobName', 'Status', 'LastRun', 'ErrorID',
+                    'DurationSeconds', 'CPUTimeMS', 'StepCount']
+
+def _schema():
+    # Fixed types so every part file agrees (an all-NULL chunk would otherwise infer float/null)
+    return pa.schema([
+        ('LogID', pa.int64()), ('ServerName', pa.string()), ('JobName', pa.string()),
+        ('Status', pa.string()), ('LastRun', pa.timestamp('us')), ('ErrorID', pa.int32()),
+        ('DurationSeconds', pa.int32()), ('CPUTimeMS', pa.int32()), ('StepCount', pa.int32())
+    ])
+
+_refresh_lock = threading.Lock()
+
+def snapshot_available():
+    return pa is not None and SNAPSHOT_CONFIG['enabled']
+
+def _root():
+    return os.path.abspath(SNAPSHOT_CONFIG['path'])
+
+def _state_path():
+    return os.path.join(_root(), '_state.json')
+
+def _load_state():
+    try:
+        with open(_state_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _save_state(state):
+    tmp_path = _state_path() + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, _state_path())
+
+def _day_dirs():
+    """{date: directory} for every day partition on disk"""
+    days = {}
+    if os.path.isdir(_root()):
+        for name in os.listdir(_root()):
+            if name.startswith('RunDate='):
+                days[datetime.date.fromisoformat(name[len('RunDate='):])] = os.path.join(_root(), name)
+    return days
+
+def _write_parts(frame):
+    """Append a batch of JobLogs rows as one new part file per LastRun day"""
+    for run_date, day_rows in frame.groupby(frame['LastRun'].dt.date):
+        day_dir = os.path.join(_root(), f"RunDate={run_date.isoformat()}")
+        os.makedirs(day_dir, exist_ok=True)
+        part_name = f"part-{int(day_rows['LogID'].min())}.arrow"
+        part_path = os.path.join(day_dir, part_name)
+        tmp_path = os.path.join(day_dir, f".{part_name}.tmp")  # dot prefix: skipped by dataset scans
+        feather.write_feather(pa.Table.from_pandas(day_rows, schema=_schema(), preserve_index=False),
+                              tmp_path, compression='uncompressed')
+        os.replace(tmp_path, part_path)
+        if len(_part_files(day_dir)) > SNAPSHOT_CONFIG['max_parts_per_day']:
+            _compact_day(day_dir)
+
+def _part_files(day_dir):
+    return sorted(os.path.join(day_dir, name) for name in os.listdir(day_dir) if name.endswith('.arrow'))
+
+def _compact_day(day_dir):
+    """Merge a day's incremental part files into one"""
+    parts = _part_files(day_dir)
+    merged = pa.concat_tables(feather.read_table(path, memory_map=False) for path in parts)
+    part_name = f"part-{pc.min(merged['LogID']).as_py()}.arrow"
+    compacted_path = os.path.join(day_dir, part_name)
+    tmp_path = os.path.join(day_dir, f".{part_name}.tmp")
+    feather.write_feather(merged, tmp_path, compression='uncompressed')
+    for path in parts:
+        os.remove(path)
+    os.replace(tmp_path, compacted_path)
+
+def _prune(oldest_day):
+    for day, day_dir in _day_dirs().items():
+        if day < oldest_day:
+            shutil.rmtree(day_dir, ignore_errors=True)
+
+def _pull_rows(since_log_id, oldest_day):
+    """Stream JobLogs rows past the watermark into part files; returns the new watermark
+
+    A LogID watermark is safe because publishes are serialized (worker._publish),
+    so no row below an already committed LogID can commit later.
+    """
+    last_log_id = since_log_id
+    with central_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT {', '.join(SNAPSHOT_COLUMNS)}
+            FROM JobLogs
+            WHERE LogID > ? AND LastRun >= ? AND RunDateOnly >= ?
+            ORDER BY LogID
+        """, (since_log_id, oldest_day, oldest_day))
+        while True:
+            rows = cursor.fetchmany(SNAPSHOT_CONFIG['fetch_chunk_size'])
+            if not rows:
+                break
+            frame = pd.DataFrame.from_records([tuple(row) for row in rows], columns=SNAPSHOT_COLUMNS)
+            frame['LastRun'] = pd.to_datetime(frame['LastRun'])
+            _write_parts(frame)
+            last_log_id = int(frame['LogID'].iloc[-1])
+        conn.commit()
+    return last_log_id
+
+def refresh_snapshot():
+    """Bring the local snapshot up to date with JobLogs (no-op when nothing was published)
+
+    A new job_logs generation pulls only rows past the stored LogID watermark;
+    a new job_logs_rewrite generation (history deleted by a resync or an
+    instance delete) rebuilds the snapshot from scratch.
+    """
+    generations = get_generations()
+    state = _load_state()
+    oldest_day = datetime.date.today() - datetime.timedelta(days=SNAPSHOT_CONFIG['retention_days'])
+    if (state and state['job_logs'] == generations.get(JOB_LOGS)
+            and state['oldest_day'] == oldest_day.isoformat()):
+        return
+
+    with _refresh_lock:
+        state = _load_state()
+        if not state or state['job_logs_rewrite'] != generations.get(JOB_LOGS_REWRITE):
+            shutil.rmtree(_root(), ignore_errors=True)
+            state = {'last_log_id': 0}
+        elif state['job_logs'] == generations.get(JOB_LOGS) and state['oldest_day'] == oldest_day.isoformat():
+            return  # another session refreshed while we waited
+        os.makedirs(_root(), exist_ok=True)
+
+        _prune(oldest_day)
+        state['last_log_id'] = _pull_rows(state['last_log_id'], oldest_day)
+        state.update(job_logs=generations.get(JOB_LOGS),
+                     job_logs_rewrite=generations.get(JOB_LOGS_REWRITE),
+                     oldest_day=oldest_day.isoformat())
+        _save_state(state)
+
+def load_job_history(servers=None, jobs=None, days=None, columns=None):
+    """Filtered JobLogs rows from the snapshot, read through memory-mapped Arrow files"""
+    refresh_snapshot()
+    row_filter = None
+    conditions = []
+    if days is not None:
+        conditions.append(ds.field('RunDate') >= (datetime.date.today() - datetime.timedelta(days=days)).isoformat())
+    if servers is not None:
+        conditions.append(ds.field('ServerName').isin(list(servers)))
+    if jobs is not None:
+        conditions.append(ds.field('JobName').isin(list(jobs)))
+    for condition in conditions:
+        row_filter = condition if row_filter is None else row_filter & condition
+
+    # Held while reading too: files can't be replaced under an open mapping on Windows
+    with _refresh_lock:
+        if not _day_dirs():
+            return pd.DataFrame(columns=columns or SNAPSHOT_COLUMNS)
+        dataset = ds.dataset(
+            _root(), format='ipc',
+            schema=_schema().append(pa.field('RunDate', pa.string())),
+            partitioning=ds.partitioning(pa.schema([('RunDate', pa.string())]), flavor='hive'),
+            filesystem=fs.LocalFileSystem(use_mmap=True)
+        )
+        return dataset.to_table(columns=columns or SNAPSHOT_COLUMNS, filter=row_filter).to_pandas()
@@ -0,0 +1,204 @@
+-- Takes a database created from the baseline schema.sql to the collector
+-- layout the later migrations build on: source row ids, staging and
+-- watermarks, the request queue, circuit breaker state, the materialized
+-- health summary and the job rollups. Every step checks what already
+-- exists, so databases that already have these objects are left as they
+-- are. READ_COMMITTED_SNAPSHOT can't be set inside a migration's
+-- transaction; a DBA turns it on once with python -m migrations --enable-rcsi.
+IF COL_LENGTH('dbo.JobLogs', 'SourceInstanceID') IS NULL
+    ALTER TABLE [dbo].[JobLogs] ADD [SourceInstanceID] [int] NULL
+GO
+
+IF COL_LENGTH('dbo.ManagedInstances', 'CollectionIntervalMinutes') IS NULL
+    ALTER TABLE [dbo].[ManagedInstances] ADD [CollectionIntervalMinutes] [int] NULL
+GO
+
+-- Work queue for the collector daemon ("Sync Now" / resync buttons insert here)
+IF OBJECT_ID('dbo.CollectionRequests', 'U') IS NULL
+    CREATE TABLE [dbo].[CollectionRequests](
+        [RequestID] [int] IDENTITY(1,1) NOT NULL PRIMARY KEY CLUSTERED,
+        [ServerName] [nvarchar](128) NULL,
+        [FullResync] [bit] NOT NULL DEFAULT ((0)),
+        [RequestedAt] [datetime] NOT NULL DEFAULT (getdate()),
+        [StartedAt] [datetime] NULL,
+        [CompletedAt] [datetime] NULL,
+        [ResultSummary] [nvarchar](400) NULL
+    ) ON [PRIMARY]
+GO
+
+-- Rows collected before source ids existed get a negative id (sysjobhistory ids
+-- are positive) so the unique index can be built; a queued full resync then
+-- replaces them with rows keyed by their real instance_id
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE object_id = OBJECT_ID('dbo.JobLogs') AND name = 'UX_JobLogs_Source')
+BEGIN
+    UPDATE [dbo].[JobLogs] SET SourceInstanceID = -LogID WHERE SourceInstanceID IS NULL;
+    IF @@ROWCOUNT > 0
+        INSERT INTO [dbo].[CollectionRequests] (ServerName, FullResync) VALUES (NULL, 1);
+
+    CREATE UNIQUE NONCLUSTERED INDEX [UX_JobLogs_Source] ON [dbo].[JobLogs]
+    (
+        [ServerName] ASC,
+        [SourceInstanceID] ASC
+    )WITH (IGNORE_DUP_KEY = ON) ON [PRIMARY];
+END
+GO
+
+-- Per-instance circuit breaker kept by the collector
+-- (BreakerState: closed / open / half_open)
+IF OBJECT_ID('dbo.InstanceHealth', 'U') IS NULL
+    CREATE TABLE [dbo].[InstanceHealth](
+        [ServerName] [nvarchar](128) NOT NULL PRIMARY KEY CLUSTERED,
+        [BreakerState] [nvarchar](10) NOT NULL DEFAULT ('closed'),
+        [ConsecutiveFailures] [int] NOT NULL DEFAULT ((0)),
+        [LastError] [nvarchar](2000) NULL,
+        [LastFailureAt] [datetime] NULL,
+        [LastSuccessAt] [datetime] NULL,
+        [NextRetryAt] [datetime] NULL,
+        [ConnectLatencyMs] [float] NULL
+    ) ON [PRIMARY]
+GO
+
+-- Collector landing area: rows stream in here per run (RunID) and are moved
+-- into JobLogs in a single publish transaction once the run is complete
+IF OBJECT_ID('dbo.JobLogs_Staging', 'U') IS NULL
+BEGIN
+    CREATE TABLE [dbo].[JobLogs_Staging](
+        [RunID] [uniqueidentifier] NOT NULL,
+        [ManagedServer] [nvarchar](128) NOT NULL,
+        [ServerName] [nvarchar](128) NOT NULL,
+        [JobName] [nvarchar](128) NOT NULL,
+        [Status] [nvarchar](20) NOT NULL,
+        [LastRun] [datetime] NOT NULL,
+        [ErrorMessage] [nvarchar](max) NULL,
+        [DurationSeconds] [int] NULL,
+        [CPUTimeMS] [int] NULL,
+        [StepCount] [int] NULL,
+        [SourceInstanceID] [int] NULL,
+        [StagedAt] [datetime] NOT NULL DEFAULT (getdate())
+    ) ON [PRIMARY] TEXTIMAGE_ON [PRIMARY];
+
+    CREATE CLUSTERED INDEX [CX_JobLogs_Staging_Run] ON [dbo].[JobLogs_Staging]
+    (
+        [RunID] ASC,
+        [ManagedServer] ASC
+    ) ON [PRIMARY];
+END
+GO
+
+-- Per-instance high-water mark for incremental collection
+-- (LastInstanceID = highest msdb.dbo.sysjobhistory.instance_id already in JobLogs)
+IF OBJECT_ID('dbo.CollectionWatermarks', 'U') IS NULL
+    CREATE TABLE [dbo].[CollectionWatermarks](
+        [ServerName] [nvarchar](128) NOT NULL PRIMARY KEY CLUSTERED,
+        [SourceServerName] [nvarchar](128) NULL,
+        [LastInstanceID] [int] NOT NULL DEFAULT ((0)),
+        [LastCollectedAt] [datetime] NULL
+    ) ON [PRIMARY]
+GO
+
+-- The health summary view reads the table the collector refreshes after each
+-- instance's publish instead of re-aggregating JobLogs
+IF OBJECT_ID('dbo.InstanceHealthSummary', 'U') IS NULL
+BEGIN
+    CREATE TABLE [dbo].[InstanceHealthSummary](
+        [ServerName] [nvarchar](128) NOT NULL PRIMARY KEY CLUSTERED,
+        [TotalJobs] [int] NULL,
+        [FailuresLast24h] [int] NOT NULL,
+        [SuccessLast24h] [int] NOT NULL,
+        [AvgJobDuration] [float] NULL,
+        [AvgCPUUsage] [float] NULL,
+        [LastDataCollection] [datetime] NULL,
+        [LastSync] [datetime] NULL
+    ) ON [PRIMARY];
+
+    EXEC(N'CREATE OR ALTER VIEW [dbo].[v_InstanceHealthSummary] AS
+    SELECT
+        mi.ServerName,
+        mi.FriendlyName,
+        mi.IsActive,
+        mi.DateAdded,
+        ISNULL(hs.TotalJobs, 0) as TotalJobs,
+        ISNULL(hs.FailuresLast24h, 0) as FailuresLast24h,
+        ISNULL(hs.SuccessLast24h, 0) as SuccessLast24h,
+        hs.LastDataCollection,
+        hs.AvgJobDuration,
+        hs.AvgCPUUsage,
+        hs.LastSync
+    FROM ManagedInstances mi
+    LEFT JOIN InstanceHealthSummary hs ON hs.ServerName = mi.ServerName;');
+END
+GO
+
+-- Per-job rollups, maintained incrementally by the collector at publish time
+-- (sum/min/max so averages stay exact when buckets are merged)
+IF OBJECT_ID('dbo.JobRollupHourly', 'U') IS NULL
+    CREATE TABLE [dbo].[JobRollupHourly](
+        [ServerName] [nvarchar](128) NOT NULL,
+        [JobName] [nvarchar](128) NOT NULL,
+        [HourStart] [datetime] NOT NULL,
+        [ExecutionCount] [int] NOT NULL,
+        [SuccessCount] [int] NOT NULL,
+        [FailureCount] [int] NOT NULL,
+        [DurationSum] [bigint] NOT NULL,
+        [DurationMin] [int] NOT NULL,
+        [DurationMax] [int] NOT NULL,
+        [CPUSum] [bigint] NOT NULL,
+        [CPUMin] [int] NOT NULL,
+        [CPUMax] [int] NOT NULL,
+    PRIMARY KEY CLUSTERED
+    (
+        [ServerName] ASC,
+        [JobName] ASC,
+        [HourStart] ASC
+    ) ON [PRIMARY]
+    ) ON [PRIMARY]
+GO
+
+-- Trends read the daily rollup; callers filter RunDate
+IF OBJECT_ID('dbo.JobRollupDaily', 'U') IS NULL
+BEGIN
+    CREATE TABLE [dbo].[JobRollupDaily](
+        [ServerName] [nvarchar](128) NOT NULL,
+        [JobName] [nvarchar](128) NOT NULL,
+        [RunDate] [date] NOT NULL,
+        [ExecutionCount] [int] NOT NULL,
+        [SuccessCount] [int] NOT NULL,
+        [FailureCount] [int] NOT NULL,
+        [DurationSum] [bigint] NOT NULL,
+        [DurationMin] [int] NOT NULL,
+        [DurationMax] [int] NOT NULL,
+        [CPUSum] [bigint] NOT NULL,
+        [CPUMin] [int] NOT NULL,
+        [CPUMax] [int] NOT NULL,
+    PRIMARY KEY CLUSTERED
+    (
+        [ServerName] ASC,
+        [JobName] ASC,
+        [RunDate] ASC
+    ) ON [PRIMARY]
+    ) ON [PRIMARY];
+
+    CREATE NONCLUSTERED INDEX [IX_JobRollupDaily_RunDate] ON [dbo].[JobRollupDaily]
+    (
+        [RunDate] ASC
+    ) ON [PRIMARY];
+
+    EXEC(N'CREATE OR ALTER VIEW [dbo].[v_PerformanceTrends] AS
+    SELECT
+        r.ServerName,
+        mi.FriendlyName,
+        r.JobName,
+        r.RunDate,
+        r.ExecutionCount,
+        r.FailureCount,
+        r.SuccessCount,
+        CAST(r.DurationSum AS FLOAT) / r.ExecutionCount as AvgDuration,
+        r.DurationMax as MaxDuration,
+        r.DurationMin as MinDuration,
+        CAST(r.CPUSum AS FLOAT) / r.ExecutionCount as AvgCPU,
+        r.CPUMax as MaxCPU,
+        r.CPUMin as MinCPU
+    FROM JobRollupDaily r
+    INNER JOIN ManagedInstances mi ON r.ServerName = mi.HostName;');
+END
+GO
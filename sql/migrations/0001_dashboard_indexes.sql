@@ -0,0 +1,41 @@
+-- Covering indexes for the dashboard access paths on JobLogs
+
+-- v_EnhancedDashboard ROW_NUMBER() OVER (PARTITION BY ServerName, JobName ORDER BY LastRun DESC),
+-- history tab (ServerName = ? AND JobName = ? ORDER BY LastRun DESC),
+-- DELETE FROM JobLogs WHERE ServerName = ?
+CREATE NONCLUSTERED INDEX [IX_JobLogs_Server_Job_LastRun] ON [dbo].[JobLogs]
+(
+	[ServerName] ASC,
+	[JobName] ASC,
+	[LastRun] DESC
+)
+INCLUDE ([Status], [DurationSeconds], [CPUTimeMS], [StepCount], [CapturedAt])
+ON [PRIMARY]
+GO
+
+-- v_Last24HourFailures (Status = 'Failed' AND LastRun >= ...)
+CREATE NONCLUSTERED INDEX [IX_JobLogs_Failed_LastRun] ON [dbo].[JobLogs]
+(
+	[LastRun] DESC
+)
+INCLUDE ([ServerName], [JobName], [DurationSeconds], [CPUTimeMS], [StepCount])
+WHERE [Status] = N'Failed'
+ON [PRIMARY]
+GO
+
+-- MIN/MAX(LastRun) statistics and date-range scans
+CREATE NONCLUSTERED INDEX [IX_JobLogs_LastRun] ON [dbo].[JobLogs]
+(
+	[LastRun] ASC
+)
+ON [PRIMARY]
+GO
+
+-- Views join JobLogs.ServerName to ManagedInstances.HostName
+CREATE NONCLUSTERED INDEX [IX_ManagedInstances_HostName] ON [dbo].[ManagedInstances]
+(
+	[HostName] ASC
+)
+INCLUDE ([FriendlyName], [IsActive])
+ON [PRIMARY]
+GO
@@ -0,0 +1,14 @@
+-- Per-dataset change counters for the dashboard cache (database.py)
+-- Writers bump a dataset's Generation in the same transaction as the data change;
+-- readers key cached query results by the generations they depend on.
+CREATE TABLE [dbo].[DataGenerations](
+	[Dataset] [varchar](50) NOT NULL,
+	[Generation] [bigint] NOT NULL DEFAULT (0),
+	[UpdatedAt] [datetime] NOT NULL DEFAULT (GETDATE()),
+PRIMARY KEY CLUSTERED ([Dataset] ASC)
+) ON [PRIMARY]
+GO
+
+INSERT INTO [dbo].[DataGenerations] (Dataset)
+VALUES ('instances'), ('job_logs'), ('rollups'), ('health')
+GO
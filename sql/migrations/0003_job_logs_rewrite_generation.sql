@@ -0,0 +1,4 @@
+-- Bumped when JobLogs rows are deleted rather than appended (full resync, instance delete)
+-- so append-only consumers such as the local history snapshot know to rebuild.
+INSERT INTO [dbo].[DataGenerations] (Dataset) VALUES ('job_logs_rewrite')
+GO
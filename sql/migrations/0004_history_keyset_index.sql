@@ -0,0 +1,17 @@
+-- Keyset pagination for the history tab: seek on (ServerName, JobName) and read
+-- (LastRun, LogID) in descending order with no sort, however deep the page.
+-- Replaces IX_JobLogs_Server_Job_LastRun (same leading keys, so the dashboard's
+-- ROW_NUMBER() OVER (PARTITION BY ServerName, JobName ORDER BY LastRun DESC) still uses it).
+CREATE NONCLUSTERED INDEX [IX_JobLogs_Server_Job_LastRun_LogID] ON [dbo].[JobLogs]
+(
+	[ServerName] ASC,
+	[JobName] ASC,
+	[LastRun] DESC,
+	[LogID] DESC
+)
+INCLUDE ([Status], [DurationSeconds], [CPUTimeMS], [StepCount], [CapturedAt])
+ON [PRIMARY]
+GO
+
+DROP INDEX [IX_JobLogs_Server_Job_LastRun] ON [dbo].[JobLogs]
+GO
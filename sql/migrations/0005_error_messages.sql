@@ -0,0 +1,132 @@
+-- Intern job messages: JobLogs keeps an ErrorID into a dictionary of distinct
+-- (masked) messages instead of the full nvarchar(max) text on every row.
+-- The collector masks variable parts (timestamps, ids, GUIDs) and fingerprints
+-- the result with SHA-256; rows that predate this migration are interned
+-- verbatim (fingerprint = HASHBYTES of the original text).
+CREATE TABLE [dbo].[ErrorMessages](
+	[ErrorID] [int] IDENTITY(1,1) NOT NULL,
+	[Fingerprint] [binary](32) NOT NULL,
+	[MaskedMessage] [nvarchar](max) NOT NULL,
+	[SampleMessage] [nvarchar](max) NOT NULL,
+	[FirstSeenAt] [datetime] NOT NULL DEFAULT (GETDATE()),
+PRIMARY KEY CLUSTERED
+(
+	[ErrorID] ASC
+) ON [PRIMARY]
+) ON [PRIMARY] TEXTIMAGE_ON [PRIMARY]
+GO
+
+-- Concurrent collectors may race to intern the same message; the loser's row is dropped
+CREATE UNIQUE NONCLUSTERED INDEX [UX_ErrorMessages_Fingerprint] ON [dbo].[ErrorMessages]
+(
+	[Fingerprint] ASC
+)WITH (IGNORE_DUP_KEY = ON) ON [PRIMARY]
+GO
+
+ALTER TABLE [dbo].[JobLogs] ADD [ErrorID] [int] NULL
+GO
+
+ALTER TABLE [dbo].[JobLogs_Staging] ADD [ErrorID] [int] NULL
+GO
+
+-- Backfill: one dictionary row per distinct existing message
+INSERT INTO [dbo].[ErrorMessages] (Fingerprint, MaskedMessage, SampleMessage)
+SELECT d.Fingerprint, jl.ErrorMessage, jl.ErrorMessage
+FROM (
+    SELECT HASHBYTES('SHA2_256', ErrorMessage) AS Fingerprint, MIN(LogID) AS LogID
+    FROM [dbo].[JobLogs]
+    WHERE ErrorMessage <> N''
+    GROUP BY HASHBYTES('SHA2_256', ErrorMessage)
+) d
+INNER JOIN [dbo].[JobLogs] jl ON jl.LogID = d.LogID
+GO
+
+UPDATE jl SET ErrorID = e.ErrorID
+FROM [dbo].[JobLogs] jl
+INNER JOIN [dbo].[ErrorMessages] e ON e.Fingerprint = HASHBYTES('SHA2_256', jl.ErrorMessage)
+WHERE jl.ErrorMessage <> N''
+GO
+
+ALTER TABLE [dbo].[JobLogs] DROP COLUMN [ErrorMessage]
+GO
+
+ALTER TABLE [dbo].[JobLogs_Staging] DROP COLUMN [ErrorMessage]
+GO
+
+-- Reclaim the dropped LOB space
+ALTER TABLE [dbo].[JobLogs] REBUILD
+GO
+
+CREATE NONCLUSTERED INDEX [IX_JobLogs_Failed_LastRun] ON [dbo].[JobLogs]
+(
+	[LastRun] DESC
+)
+INCLUDE ([ServerName], [JobName], [DurationSeconds], [CPUTimeMS], [StepCount], [ErrorID])
+WHERE [Status] = N'Failed'
+WITH (DROP_EXISTING = ON)
+ON [PRIMARY]
+GO
+
+CREATE OR ALTER VIEW [dbo].[v_EnhancedDashboard] AS
+WITH LatestJobs AS (
+    SELECT
+        jl.*,
+        mi.FriendlyName,
+        mi.IsActive,
+        ROW_NUMBER() OVER(PARTITION BY jl.ServerName, jl.JobName ORDER BY jl.LastRun DESC) as rnk
+    FROM JobLogs jl
+    INNER JOIN ManagedInstances mi ON jl.ServerName = mi.HostName
+)
+SELECT
+    lj.LogID,
+    lj.ServerName,
+    lj.FriendlyName,
+    lj.JobName,
+    lj.Status,
+    lj.LastRun,
+    lj.ErrorID,
+    LEFT(e.MaskedMessage, 200) as ErrorPreview,  -- full text: ErrorMessages, loaded on demand
+    lj.DurationSeconds,
+    lj.CPUTimeMS,
+    lj.StepCount,
+    lj.CapturedAt,
+    lj.IsActive,
+    0 as AvgDuration,  -- Simplified for speed
+    0 as MaxDuration,
+    0 as AvgCPU
+FROM LatestJobs lj
+LEFT JOIN ErrorMessages e ON e.ErrorID = lj.ErrorID
+WHERE lj.rnk = 1;
+GO
+
+-- One row per instance, job and error fingerprint
+CREATE OR ALTER VIEW [dbo].[v_Last24HourFailures] AS
+WITH Failures AS (
+    SELECT
+        jl.ServerName,
+        mi.FriendlyName,
+        jl.JobName,
+        jl.ErrorID,
+        COUNT(*) as FailureCount,
+        MIN(jl.LastRun) as FirstFailure,
+        MAX(jl.LastRun) as LastRun,
+        AVG(ISNULL(jl.DurationSeconds, 0)) as AvgDurationSeconds
+    FROM JobLogs jl
+    INNER JOIN ManagedInstances mi ON jl.ServerName = mi.HostName
+    WHERE jl.Status = 'Failed'
+        AND jl.LastRun >= DATEADD(hour, -24, GETDATE())
+    GROUP BY jl.ServerName, mi.FriendlyName, jl.JobName, jl.ErrorID
+)
+SELECT
+    f.*,
+    LEFT(e.MaskedMessage, 200) as ErrorPreview,
+    DATEDIFF(MINUTE, f.LastRun, GETDATE()) as MinutesAgo,
+    DATEDIFF(HOUR, f.LastRun, GETDATE()) as HoursAgo
+FROM Failures f
+LEFT JOIN ErrorMessages e ON e.ErrorID = f.ErrorID;
+GO
+
+-- The local history snapshot stores JobLogs columns; make it rebuild
+UPDATE [dbo].[DataGenerations] SET Generation = Generation + 1, UpdatedAt = GETDATE()
+WHERE Dataset IN ('job_logs', 'job_logs_rewrite')
+GO
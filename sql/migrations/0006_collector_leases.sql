@@ -0,0 +1,23 @@
+-- Time-limited leases that let several collector processes (on any host) split
+-- ManagedInstances between them. A collector claims free, due rows with
+-- UPDLOCK + READPAST, so concurrent claimers skip each other's rows instead of
+-- blocking; a lease that outlives a crashed owner simply expires and is claimed
+-- again. NextDueAt replaces the daemon's in-process schedule so every shard
+-- honours the same collection interval.
+CREATE TABLE [dbo].[CollectionLeases](
+	[ServerName] [nvarchar](128) NOT NULL,
+	[Owner] [nvarchar](200) NULL,
+	[LeasedAt] [datetime] NULL,
+	[LeaseExpiresAt] [datetime] NULL,
+	[NextDueAt] [datetime] NULL,
+-- Shards add missing rows concurrently; duplicates are dropped rather than raised
+PRIMARY KEY CLUSTERED
+(
+	[ServerName] ASC
+)WITH (IGNORE_DUP_KEY = ON) ON [PRIMARY]
+) ON [PRIMARY]
+GO
+
+INSERT INTO [dbo].[CollectionLeases] (ServerName)
+SELECT ServerName FROM [dbo].[ManagedInstances]
+GO
@@ -0,0 +1,115 @@
+-- Partition JobLogs by day on RunDateOnly so retention.py can drop whole days
+-- with TRUNCATE ... WITH (PARTITIONS) instead of deleting row by row. One
+-- boundary per day from the oldest row to a week ahead; retention.py keeps
+-- splitting new days in front of the data and merging purged ones away.
+DECLARE @first date = (SELECT ISNULL(MIN(RunDateOnly), CAST(GETDATE() AS date)) FROM [dbo].[JobLogs]);
+DECLARE @last date = DATEADD(day, 7, CAST(GETDATE() AS date));
+DECLARE @boundaries nvarchar(max);
+
+WITH Days AS (
+    SELECT @first AS RunDate
+    UNION ALL
+    SELECT DATEADD(day, 1, RunDate) FROM Days WHERE RunDate < @last
+)
+SELECT @boundaries = STRING_AGG(CAST('''' + CONVERT(char(8), RunDate, 112) + '''' AS nvarchar(max)), ',')
+                     WITHIN GROUP (ORDER BY RunDate)
+FROM Days
+OPTION (MAXRECURSION 0);
+
+DECLARE @sql nvarchar(max) = N'CREATE PARTITION FUNCTION [pf_JobLogs_RunDate] (date) AS RANGE RIGHT FOR VALUES ('
+                             + @boundaries + N')';
+EXEC sp_executesql @sql;
+GO
+
+CREATE PARTITION SCHEME [ps_JobLogs_RunDate] AS PARTITION [pf_JobLogs_RunDate] ALL TO ([PRIMARY])
+GO
+
+-- Nonclustered indexes are dropped first so moving the clustered index rebuilds them once, not twice
+DROP INDEX [UX_JobLogs_Source] ON [dbo].[JobLogs]
+DROP INDEX [IX_JobLogs_Server_Job_LastRun_LogID] ON [dbo].[JobLogs]
+DROP INDEX [IX_JobLogs_Failed_LastRun] ON [dbo].[JobLogs]
+DROP INDEX [IX_JobLogs_LastRun] ON [dbo].[JobLogs]
+GO
+
+-- The primary key was created unnamed in schema.sql
+DECLARE @pk sysname = (SELECT name FROM sys.key_constraints
+                       WHERE parent_object_id = OBJECT_ID('dbo.JobLogs') AND type = 'PK');
+DECLARE @sql nvarchar(max) = N'ALTER TABLE [dbo].[JobLogs] DROP CONSTRAINT ' + QUOTENAME(@pk);
+EXEC sp_executesql @sql;
+GO
+
+-- Partition truncation needs every index aligned, so unique keys carry RunDateOnly.
+-- LogID stays the leading key: the snapshot and keyset readers still seek on it.
+-- A unique clustered index rather than a primary key: RunDateOnly is a computed
+-- column without ISNULL, which SQL Server treats as nullable (a PK would fail, Msg 8111).
+CREATE UNIQUE CLUSTERED INDEX [CX_JobLogs] ON [dbo].[JobLogs]
+(
+	[LogID] ASC,
+	[RunDateOnly] ASC
+) ON [ps_JobLogs_RunDate]([RunDateOnly])
+GO
+
+-- A source row's LastRun never changes, so adding RunDateOnly keeps the same duplicates out
+CREATE UNIQUE NONCLUSTERED INDEX [UX_JobLogs_Source] ON [dbo].[JobLogs]
+(
+	[ServerName] ASC,
+	[SourceInstanceID] ASC,
+	[RunDateOnly] ASC
+)WITH (IGNORE_DUP_KEY = ON) ON [ps_JobLogs_RunDate]([RunDateOnly])
+GO
+
+CREATE NONCLUSTERED INDEX [IX_JobLogs_Server_Job_LastRun_LogID] ON [dbo].[JobLogs]
+(
+	[ServerName] ASC,
+	[JobName] ASC,
+	[LastRun] DESC,
+	[LogID] DESC
+)
+INCLUDE ([Status], [DurationSeconds], [CPUTimeMS], [StepCount], [CapturedAt])
+ON [ps_JobLogs_RunDate]([RunDateOnly])
+GO
+
+CREATE NONCLUSTERED INDEX [IX_JobLogs_Failed_LastRun] ON [dbo].[JobLogs]
+(
+	[LastRun] DESC
+)
+INCLUDE ([ServerName], [JobName], [DurationSeconds], [CPUTimeMS], [StepCount], [ErrorID])
+WHERE [Status] = N'Failed'
+ON [ps_JobLogs_RunDate]([RunDateOnly])
+GO
+
+CREATE NONCLUSTERED INDEX [IX_JobLogs_LastRun] ON [dbo].[JobLogs]
+(
+	[LastRun] ASC
+)
+ON [ps_JobLogs_RunDate]([RunDateOnly])
+GO
+
+-- Aligned indexes are ordered within each day, so date-bounded readers also
+-- filter on RunDateOnly to touch only the partitions they need
+CREATE OR ALTER VIEW [dbo].[v_Last24HourFailures] AS
+WITH Failures AS (
+    SELECT
+        jl.ServerName,
+        mi.FriendlyName,
+        jl.JobName,
+        jl.ErrorID,
+        COUNT(*) as FailureCount,
+        MIN(jl.LastRun) as FirstFailure,
+        MAX(jl.LastRun) as LastRun,
+        AVG(ISNULL(jl.DurationSeconds, 0)) as AvgDurationSeconds
+    FROM JobLogs jl
+    INNER JOIN ManagedInstances mi ON jl.ServerName = mi.HostName
+    WHERE jl.Status = 'Failed'
+        AND jl.LastRun >= DATEADD(hour, -24, GETDATE())
+        AND jl.RunDateOnly >= CAST(DATEADD(hour, -24, GETDATE()) AS date)
+    GROUP BY jl.ServerName, mi.FriendlyName, jl.JobName, jl.ErrorID
+)
+SELECT
+    f.*,
+    LEFT(e.MaskedMessage, 200) as ErrorPreview,
+    DATEDIFF(MINUTE, f.LastRun, GETDATE()) as MinutesAgo,
+    DATEDIFF(HOUR, f.LastRun, GETDATE()) as HoursAgo
+FROM Failures f
+LEFT JOIN ErrorMessages e ON e.ErrorID = f.ErrorID;
+GO
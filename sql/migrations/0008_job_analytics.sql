@@ -0,0 +1,54 @@
+-- Per-job baselines of successful runs (analytics.py), recomputed for the jobs
+-- a collection touched when it publishes. Reference stats come from the
+-- baseline window; Recent* from the last few days, to spot sustained shifts.
+CREATE TABLE [dbo].[JobBaselines](
+	[ServerName] [nvarchar](128) NOT NULL,
+	[JobName] [nvarchar](128) NOT NULL,
+	[SampleCount] [int] NOT NULL,
+	[DurationMedian] [float] NULL,
+	[DurationP95] [float] NULL,
+	[DurationMAD] [float] NULL,
+	[CPUMedian] [float] NULL,
+	[CPUP95] [float] NULL,
+	[CPUMAD] [float] NULL,
+	[RecentCount] [int] NOT NULL,
+	[RecentDurationMedian] [float] NULL,
+	[RecentCPUMedian] [float] NULL,
+	[IsRegression] [bit] NOT NULL,
+	[UpdatedAt] [datetime] NOT NULL DEFAULT (GETDATE()),
+PRIMARY KEY CLUSTERED
+(
+	[ServerName] ASC,
+	[JobName] ASC
+) ON [PRIMARY]
+) ON [PRIMARY]
+GO
+
+-- Runs flagged at publish time, one row per run (its most deviant metric).
+-- A full resync re-flags the same runs; duplicates are dropped.
+CREATE TABLE [dbo].[JobAnomalies](
+	[ServerName] [nvarchar](128) NOT NULL,
+	[SourceInstanceID] [int] NOT NULL,
+	[JobName] [nvarchar](128) NOT NULL,
+	[LastRun] [datetime] NOT NULL,
+	[Flag] [nvarchar](20) NOT NULL,      -- 'anomaly' or 'regression'
+	[Metric] [nvarchar](20) NOT NULL,    -- 'duration' or 'cpu'
+	[Value] [float] NOT NULL,
+	[BaselineMedian] [float] NOT NULL,
+	[Score] [float] NOT NULL,            -- robust z-score against the baseline
+	[FlaggedAt] [datetime] NOT NULL DEFAULT (GETDATE()),
+PRIMARY KEY CLUSTERED
+(
+	[ServerName] ASC,
+	[SourceInstanceID] ASC
+)WITH (IGNORE_DUP_KEY = ON) ON [PRIMARY]
+) ON [PRIMARY]
+GO
+
+CREATE NONCLUSTERED INDEX [IX_JobAnomalies_LastRun] ON [dbo].[JobAnomalies]
+(
+	[LastRun] DESC
+)
+INCLUDE ([JobName], [Flag], [Metric], [Value], [BaselineMedian], [Score])
+ON [PRIMARY]
+GO
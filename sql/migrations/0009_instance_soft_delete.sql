@@ -0,0 +1,42 @@
+-- Deleting an instance hides it at once (IsDeleted) and leaves its history to
+-- retention.purge_deleted_instances, which removes it in small committed
+-- chunks and finally drops the ManagedInstances row. PurgeRows* feed the
+-- management tab's progress bar (the total is estimated from the daily rollups).
+ALTER TABLE [dbo].[ManagedInstances] ADD
+	[IsDeleted] [bit] NOT NULL CONSTRAINT [DF_ManagedInstances_IsDeleted] DEFAULT (0),
+	[DeletedAt] [datetime] NULL,
+	[PurgeRowsTotal] [bigint] NULL,
+	[PurgeRowsDone] [bigint] NOT NULL CONSTRAINT [DF_ManagedInstances_PurgeRowsDone] DEFAULT (0)
+GO
+
+-- Should a purge chunk ever escalate, lock one day partition rather than the whole table
+ALTER TABLE [dbo].[JobLogs] SET (LOCK_ESCALATION = AUTO)
+GO
+
+CREATE OR ALTER VIEW [dbo].[v_Last24HourFailures] AS
+WITH Failures AS (
+    SELECT
+        jl.ServerName,
+        mi.FriendlyName,
+        jl.JobName,
+        jl.ErrorID,
+        COUNT(*) as FailureCount,
+        MIN(jl.LastRun) as FirstFailure,
+        MAX(jl.LastRun) as LastRun,
+        AVG(ISNULL(jl.DurationSeconds, 0)) as AvgDurationSeconds
+    FROM JobLogs jl
+    INNER JOIN ManagedInstances mi ON jl.ServerName = mi.HostName
+    WHERE jl.Status = 'Failed'
+        AND mi.IsDeleted = 0
+        AND jl.LastRun >= DATEADD(hour, -24, GETDATE())
+        AND jl.RunDateOnly >= CAST(DATEADD(hour, -24, GETDATE()) AS date)
+    GROUP BY jl.ServerName, mi.FriendlyName, jl.JobName, jl.ErrorID
+)
+SELECT
+    f.*,
+    LEFT(e.MaskedMessage, 200) as ErrorPreview,
+    DATEDIFF(MINUTE, f.LastRun, GETDATE()) as MinutesAgo,
+    DATEDIFF(HOUR, f.LastRun, GETDATE()) as HoursAgo
+FROM Failures f
+LEFT JOIN ErrorMessages e ON e.ErrorID = f.ErrorID;
+GO
@@ -1,29 +1,62 @@
-SELECT 
+-- Parameters (bound by worker.py, in order):
+--   1. last sysjobhistory.instance_id already collected (0 = none)
+--   2. lookback window in days (0 = no date limit)
+SET NOCOUNT ON;
+
+DECLARE @SinceInstanceID int = ?;
+DECLARE @LookbackDays int = ?;
+DECLARE @SinceRunDate int = CASE WHEN @LookbackDays > 0
+    THEN CONVERT(int, CONVERT(char(8), DATEADD(day, -@LookbackDays, GETDATE()), 112))
+    ELSE 0 END;
+
+-- Job outcome rows past the watermark (clustered seek on instance_id)
+WITH Outcomes AS (
+    SELECT jh.instance_id, jh.job_id, jh.run_status, jh.run_date, jh.run_time,
+           jh.run_duration, jh.message
+    FROM msdb.dbo.sysjobhistory jh
+    WHERE jh.instance_id > @SinceInstanceID
+      AND jh.step_id = 0
+      AND jh.run_date >= @SinceRunDate
+),
+-- Step counts in one grouped pass instead of a subquery per outcome row
+Steps AS (
+    SELECT jh.job_id, jh.run_date, jh.run_time, COUNT(*) as StepCount
+    FROM msdb.dbo.sysjobhistory jh
+    WHERE jh.step_id > 0
+      AND jh.run_date >= (SELECT ISNULL(MIN(o.run_date), 99991231) FROM Outcomes o)
+    GROUP BY jh.job_id, jh.run_date, jh.run_time
+)
+SELECT
     @@SERVERNAME as ServerName,
     j.name as JobName,
-    CASE jh.run_status 
-        WHEN 1 THEN 'Succeeded' 
-        WHEN 0 THEN 'Failed' 
+    CASE o.run_status
+        WHEN 1 THEN 'Succeeded'
+        WHEN 0 THEN 'Failed'
         WHEN 2 THEN 'Retry'
         WHEN 3 THEN 'Canceled'
-        ELSE 'Other' 
+        ELSE 'Other'
     END as Status,
-    msdb.dbo.agent_datetime(jh.run_date, jh.run_time) as LastRun,
-    ISNULL(jh.message, '') as ErrorMessage,
-    jh.run_duration as DurationRaw,
-    CASE 
-        WHEN jh.run_status = 1 AND jh.run_duration > 0 
-        THEN jh.run_duration * 10
-        ELSE 0 
+    -- Inline equivalent of msdb.dbo.agent_datetime (avoids a scalar UDF call per row)
+    DATETIMEFROMPARTS(
+        o.run_date / 10000, o.run_date / 100 % 100, o.run_date % 100,
+        o.run_time / 10000, o.run_time / 100 % 100, o.run_time % 100, 0
+    ) as LastRun,
+    ISNULL(o.message, '') as ErrorMessage,
+    -- run_duration is HHMMSS packed into an int; convert to seconds here
+    (o.run_duration / 10000) * 3600
+        + (o.run_duration / 100 % 100) * 60
+        + (o.run_duration % 100) as DurationSeconds,
+    CASE
+        WHEN o.run_status = 1 AND o.run_duration > 0
+        THEN o.run_duration * 10
+        ELSE 0
     END as CPUTimeMS,
-    (SELECT COUNT(*) 
-     FROM msdb.dbo.sysjobhistory jh2 
-     WHERE jh2.job_id = j.job_id 
-       AND jh2.run_date = jh.run_date 
-       AND jh2.run_time = jh.run_time
-       AND jh2.step_id > 0) as StepCount
-FROM msdb.dbo.sysjobs j
-INNER JOIN msdb.dbo.sysjobhistory jh 
-    ON j.job_id = jh.job_id
-WHERE jh.step_id = 0
-ORDER BY jh.run_date DESC, jh.run_time DESC;
\ No newline at end of file
+    ISNULL(s.StepCount, 0) as StepCount,
+    o.instance_id as HistoryID
+FROM Outcomes o
+INNER JOIN msdb.dbo.sysjobs j
+    ON j.job_id = o.job_id
+LEFT JOIN Steps s
+    ON s.job_id = o.job_id
+   AND s.run_date = o.run_date
+   AND s.run_time = o.run_time;
\ No newline at end of file
@@ -1,3 +1,6 @@
+-- Baseline schema. Later changes live in sql/migrations/ and are applied on
+-- startup by migrations.py (python -m migrations [--report]).
+
 CREATE DATABASE [SQL_Monitoring];
 
 USE [SQL_Monitoring];
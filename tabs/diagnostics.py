@@ -0,0 +1,78 @@
+import streamlit as st
+import pandas as pd
+import instrumentation
+from database import get_pool_stats, record_pool_gauges
+
+def _cache_hit_rate(counters):
+    """Hit % per query label from the cache_requests_total counters"""
+    requests = counters[counters['Metric'] == 'cache_requests_total']
+    if requests.empty:
+        return pd.DataFrame()
+    parts = requests['Labels'].str.extract(r'cache=(?P<Cache>\w+), query=(?P<Query>.+)')
+    totals = parts.assign(Value=requests['Value']).pivot_table(
+        index='Query', columns='Cache', values='Value', aggfunc='sum', fill_value=0)
+    for column in ('hit', 'miss'):
+        if column not in totals:
+            totals[column] = 0
+    totals['Hit %'] = (100 * totals['hit'] / (totals['hit'] + totals['miss'])).round(1)
+    return totals.reset_index().rename(columns={'hit': 'Hits', 'miss': 'Misses'})
+
+def _render_histograms(rows, prefixes):
+    frame = pd.DataFrame(rows)
+    if not frame.empty:
+        frame = frame[frame['Metric'].map(lambda metric: metric.startswith(prefixes))]
+    if frame.empty:
+        st.info("No samples recorded yet")
+        return
+    st.dataframe(frame.sort_values('Total (s)', ascending=False), use_container_width=True, hide_index=True)
+
+def render():
+    st.title("🩺 Diagnostics")
+    st.caption("Timings recorded by this dashboard process since it started; the collector daemon's "
+               "come from its exported metrics file")
+
+    stats = get_pool_stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("🔌 Pool Connections", f"{stats['in_use']} / {stats['size']}", help=f"In use / open (max {stats['max_size']})")
+    col2.metric("⏱️ Avg Acquire Wait", f"{stats['wait_seconds_avg'] * 1000:.1f} ms")
+    col3.metric("🔁 Reconnects", stats['reconnects'])
+    col4.metric("⌛ Pool Timeouts", stats['timeouts'])
+
+    counters = pd.DataFrame(instrumentation.counter_rows(), columns=['Metric', 'Labels', 'Value'])
+    histograms = instrumentation.histogram_rows()
+
+    st.subheader("🖥️ Page Renders")
+    _render_histograms(histograms, ('render_seconds', 'rerun_seconds'))
+
+    st.subheader("🗄️ Queries and Cache")
+    hit_rate = _cache_hit_rate(counters)
+    if not hit_rate.empty:
+        st.dataframe(hit_rate, use_container_width=True, hide_index=True)
+    _render_histograms(histograms, ('db_query_seconds', 'fetch_seconds', 'bootstrap_seconds',
+                                    'pool_acquire_wait_seconds'))
+
+    st.subheader("📥 Collector")
+    processes = instrumentation.exported_processes('collector')
+    exported = None
+    if processes:
+        # Each running daemon exports collector-<pid>; the last one-off run left collector
+        process = st.selectbox("Collector process", options=processes, key="diag_collector") \
+            if len(processes) > 1 else processes[0]
+        exported = instrumentation.read_textfile(process)
+    if exported is None:
+        st.info("No collector metrics exported yet (python -m worker writes them after each run)")
+    else:
+        collector_histograms, collector_values = exported
+        _render_histograms(collector_histograms, ('collector_',))
+        with st.expander("Collector counters"):
+            st.dataframe(pd.DataFrame(collector_values), use_container_width=True, hide_index=True)
+
+    with st.expander("All counters and gauges"):
+        st.dataframe(counters, use_container_width=True, hide_index=True)
+
+    record_pool_gauges()
+    st.download_button("⬇️ Prometheus metrics", instrumentation.prometheus_text(),
+                       file_name="dashboard.prom", mime="text/plain")
+    path = instrumentation.textfile_path()
+    if path:
+        st.caption(f"Also written to `{path}` for node_exporter's textfile collector")
@@ -1,31 +1,64 @@
 import streamlit as st
-from database import get_failures_24h
+from database import bootstrap, get_error_message
+
+def render_error_details(rows, key):
+    """Pick a failure to load its full message (nothing is fetched until one is picked)"""
+    rows = rows[rows['ErrorID'].notna()]
+    if rows.empty:
+        return
+    labels = {
+        idx: f"{row['FriendlyName']} · {row['JobName']} · {(row['ErrorPreview'] or '')[:80]}"
+        for idx, row in rows.iterrows()
+    }
+    choice = st.selectbox(
+        "🔍 Full error text",
+        options=list(labels),
+        format_func=labels.get,
+        index=None,
+        placeholder="Select a failure to load its full message",
+        key=key
+    )
+    if choice is None:
+        return
+    message = get_error_message(rows.at[choice, 'ErrorID'])
+    if message.empty:
+        st.warning("Message text not found.")
+        return
+    st.code(message['SampleMessage'].iloc[0], language=None)
+    st.caption(f"First seen {message['FirstSeenAt'].iloc[0]:%Y-%m-%d %H:%M} · "
+               f"grouped as: {message['MaskedMessage'].iloc[0][:200]}")
 
 def render():
     st.title("⚠️ Last 24 Hours - Failures")
     
-    failures_24h = get_failures_24h()
+    failures_24h = bootstrap('failures')['failures_24h']  # already fetched by app.py this rerun
     
     if failures_24h.empty:
         st.success("🎉 No failures in the last 24 hours!")
         return
     
-    col1, col2, col3 = st.columns(3)
-    col1.metric("Total Failures", len(failures_24h))
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Total Failures", int(failures_24h['FailureCount'].sum()))
     col2.metric("Instances Affected", failures_24h['FriendlyName'].nunique())
     col3.metric("Jobs Affected", failures_24h['JobName'].nunique())
+    col4.metric("Distinct Errors", failures_24h['ErrorID'].nunique())
     
     st.divider()
     
+    # One row per instance, job and error fingerprint
+    failures_24h = failures_24h.sort_values('LastRun', ascending=False).reset_index(drop=True)
     st.dataframe(
         failures_24h[[
-            'FriendlyName', 'JobName', 'LastRun', 'ErrorMessage'
+            'FriendlyName', 'JobName', 'FailureCount', 'LastRun', 'ErrorPreview'
         ]].rename(columns={
             'FriendlyName': 'Instance',
             'JobName': 'Job Name',
-            'LastRun': 'Failed At',
-            'ErrorMessage': 'Error'
+            'FailureCount': 'Failures',
+            'LastRun': 'Last Failed At',
+            'ErrorPreview': 'Error'
         }),
         use_container_width=True,
         hide_index=True
-    )
\ No newline at end of file
+    )
+    
+    render_error_details(failures_24h, key="failures_error_details")
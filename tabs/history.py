@@ -1,53 +1,137 @@
 import streamlit as st
 import pandas as pd
+from datetime import date, timedelta
 import plotly.graph_objects as go
-from database import fetch_data
+from config import CHART_CONFIG, SNAPSHOT_CONFIG
+from database import fetch_data, get_job_history_page, INSTANCES, JOB_LOGS, ROLLUPS
+from downsample import downsample
+from snapshot import snapshot_available, load_job_history
+
+CHART_COLUMNS = ['LastRun', 'Status', 'DurationSeconds']
+HISTORY_WINDOWS = {"7 Days": 7, "30 Days": 30, "90 Days": 90, "6 Months": 180}
+RUN_STATUSES = ['Succeeded', 'Failed', 'Retry', 'Canceled', 'Other']
+PAGE_SIZE = 50
+
+def _load_jobs(server):
+    # The daily rollup has one row per job per day, so this stays cheap for years of history
+    return fetch_data(
+        "SELECT DISTINCT JobName FROM JobRollupDaily WHERE ServerName = ? ORDER BY JobName",
+        params=[server],
+        datasets=(ROLLUPS,)
+    )
+
+def _load_job_runs(server, job, days):
+    """Every run of a job in the window, oldest first (chart input)"""
+    if snapshot_available() and days <= SNAPSHOT_CONFIG['retention_days']:
+        runs = load_job_history(servers=[server], jobs=[job], days=days, columns=CHART_COLUMNS)
+        return runs.sort_values('LastRun').reset_index(drop=True)
+    return fetch_data("""
+        SELECT LastRun, Status, DurationSeconds
+        FROM JobLogs WHERE ServerName = ? AND JobName = ?
+          AND LastRun >= DATEADD(day, -?, GETDATE())
+        ORDER BY LastRun
+    """, params=[server, job, days], datasets=(JOB_LOGS,))
+
+def _render_run_pages(server, job):
+    """Paged run table; session state keeps the keyset cursor of every page visited"""
+    col1, col2 = st.columns(2)
+    with col1:
+        date_range = st.date_input(
+            "Date Range",
+            value=(date.today() - timedelta(days=365), date.today()),
+            key="history_dates"
+        )
+    with col2:
+        statuses = st.multiselect("Status", options=RUN_STATUSES, default=RUN_STATUSES, key="history_statuses")
+    if len(date_range) != 2:
+        return  # second date not picked yet
+    start_date, end_date = date_range
+
+    # A page is identified by the cursor it starts after; new filters start over at page 1
+    filters = (server, job, start_date, end_date, tuple(statuses))
+    if st.session_state.get('history_filters') != filters:
+        st.session_state.history_filters = filters
+        st.session_state.history_cursors = [None]
+    cursors = st.session_state.history_cursors
+
+    page = get_job_history_page(server, job, start_date, end_date, statuses,
+                                before=cursors[-1], page_size=PAGE_SIZE)
+    has_older = len(page) > PAGE_SIZE
+    page = page.head(PAGE_SIZE)
+
+    if page.empty:
+        st.info("No runs match these filters.")
+        return
+
+    st.subheader(f"📋 Executions: {job} (page {len(cursors)})")
+    st.dataframe(page.drop(columns=['LogID', 'ErrorID']), use_container_width=True, hide_index=True)
+
+    nav_newer, nav_caption, nav_older = st.columns([1, 2, 1])
+    with nav_newer:
+        if st.button("⬅️ Newer", disabled=len(cursors) == 1, use_container_width=True, key="history_newer"):
+            cursors.pop()
+            st.rerun()
+    with nav_caption:
+        st.caption(f"{page['LastRun'].iloc[0]:%Y-%m-%d %H:%M} → {page['LastRun'].iloc[-1]:%Y-%m-%d %H:%M}")
+    with nav_older:
+        if st.button("Older ➡️", disabled=not has_older, use_container_width=True, key="history_older"):
+            last = page.iloc[-1]
+            cursors.append((last['LastRun'].to_pydatetime(), int(last['LogID'])))
+            st.rerun()
 
 def render():
     st.title("📈 Job Execution History")
     
-    instances_list = fetch_data(
-        "SELECT DISTINCT ServerName, FriendlyName FROM ManagedInstances WHERE IsActive = 1"
-    )
+    # JobLogs / JobRollupDaily.ServerName hold the source @@SERVERNAME, i.e. ManagedInstances.HostName
+    instances_list = fetch_data("""
+        SELECT DISTINCT HostName, FriendlyName FROM ManagedInstances
+        WHERE IsActive = 1 AND HostName IS NOT NULL
+        ORDER BY FriendlyName
+    """, datasets=(INSTANCES,))
     
     if instances_list.empty:
         st.warning("⚠️ No active instances configured.")
         return
 
+    friendly_names = dict(zip(instances_list['HostName'], instances_list['FriendlyName']))
     col1, col2 = st.columns(2)
     with col1:
         selected_instance = st.selectbox(
             "Select Instance",
-            options=instances_list['ServerName'].tolist(),
-            format_func=lambda x: instances_list[instances_list['ServerName']==x]['FriendlyName'].iloc[0]
+            options=instances_list['HostName'].tolist(),
+            format_func=lambda x: friendly_names[x],
+            key="history_instance"
         )
     
     with col2:
-        jobs_list = fetch_data(
-            "SELECT DISTINCT JobName FROM JobLogs WHERE ServerName = ? ORDER BY JobName",
-            params=[selected_instance]
-        )
+        jobs_list = _load_jobs(selected_instance)
         selected_job = st.selectbox("Select Job", options=jobs_list['JobName'].tolist()) if not jobs_list.empty else None
 
     if selected_instance and selected_job:
-        job_history = fetch_data("""
-            SELECT TOP 50 LastRun, Status, DurationSeconds, CPUTimeMS, ErrorMessage
-            FROM JobLogs WHERE ServerName = ? AND JobName = ?
-            ORDER BY LastRun DESC
-        """, params=[selected_instance, selected_job])
+        window = st.radio("Window", options=list(HISTORY_WINDOWS), index=1, horizontal=True, key="history_window")
+        job_runs = _load_job_runs(selected_instance, selected_job, HISTORY_WINDOWS[window])
         
-        if not job_history.empty:
-            st.subheader(f"⏱️ Last 50 Executions: {selected_job}")
+        if not job_runs.empty:
+            st.subheader(f"⏱️ Executions ({window}): {selected_job}")
+            # Bounded bar count; failed runs are always drawn
+            chart_runs = downsample(
+                job_runs, 'LastRun', 'DurationSeconds',
+                max_points=CHART_CONFIG['max_points_per_series'],
+                keep=job_runs['Status'] == 'Failed',
+                method=CHART_CONFIG['method']
+            )
+            if len(chart_runs) < len(job_runs):
+                st.caption(f"ℹ️ Showing {len(chart_runs):,} of {len(job_runs):,} runs (failures always shown)")
             # Map colors for the chart
-            job_history['StatusColor'] = job_history['Status'].map({
-                'Succeeded': 'green', 'Failed': 'red', 'Other': 'gray'
-            })
+            status_colors = chart_runs['Status'].map({
+                'Succeeded': 'green', 'Failed': 'red'
+            }).fillna('gray')
             
             fig = go.Figure(go.Bar(
-                x=job_history['LastRun'],
-                y=job_history['DurationSeconds'],
-                marker_color=job_history['StatusColor']
+                x=chart_runs['LastRun'],
+                y=chart_runs['DurationSeconds'],
+                marker_color=status_colors
             ))
             st.plotly_chart(fig, use_container_width=True)
-            
-            st.dataframe(job_history.drop(columns=['StatusColor']), use_container_width=True, hide_index=True)
\ No newline at end of file
+        
+        _render_run_pages(selected_instance, selected_job)
\ No newline at end of file
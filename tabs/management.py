@@ -1,24 +1,171 @@
 import streamlit as st
-from database import get_instances, get_central_conn, clear_all_caches, fetch_static_data
+import pandas as pd
+from database import (get_instances, central_connection, invalidate, fetch_data, get_partition_sizes,
+                      INSTANCES, JOB_LOGS, ROLLUPS)
+from worker import queue_collection
+from retention import raw_cutoff, soft_delete_instance, start_background_purge, get_purge_progress
+from config import RETENTION_CONFIG
+
+def _breaker_caption(row):
+    """Collector circuit breaker status line for an instance (None when healthy)"""
+    if row['BreakerState'] == 'open':
+        retry_at = row['NextRetryAt'].strftime('%H:%M') if pd.notna(row['NextRetryAt']) else '?'
+        return f"🔴 Collection paused after {row['ConsecutiveFailures']} failures - retry at {retry_at}"
+    if row['BreakerState'] == 'half_open':
+        return "🟡 Probing connection (half-open)"
+    if row['ConsecutiveFailures'] > 0:
+        return f"🟠 {row['ConsecutiveFailures']} consecutive collection failure(s)"
+    return None
+
+EDIT_COLUMNS = ['ServerName', 'FriendlyName', 'HostName', 'IsActive']
+
+def _text(value):
+    return value.strip() if isinstance(value, str) else ''
+
+def diff_instances(original, edited, purging=()):
+    """(adds, updates, deletes, errors) between the instance list and its bulk-edit copy
+
+    Existing rows keep their index in the editor; rows it removed or marked
+    Delete are deletes. purging: names of deleted instances not purged yet.
+    """
+    existing = edited[edited.index.isin(original.index)]
+    added = edited[~edited.index.isin(original.index)]
+    marked = existing['Delete'].fillna(False).astype(bool)
+    deletes = [name for idx, name in original['ServerName'].items()
+               if idx not in existing.index or marked[idx]]
+
+    adds, updates, errors = [], [], []
+    for idx, row in existing[~marked].iterrows():
+        before = original.loc[idx]
+        if _text(row['ServerName']) != before['ServerName']:
+            errors.append(f"{before['ServerName']}: instance names can't be changed - delete it and add a new row")
+            continue
+        if not _text(row['FriendlyName']):
+            errors.append(f"{before['ServerName']}: name is required")
+            continue
+        after = (_text(row['FriendlyName']), _text(row['HostName']) or None, bool(row['IsActive']))
+        if after != (before['FriendlyName'], _text(before['HostName']) or None, bool(before['IsActive'])):
+            updates.append((after[0], after[1], int(after[2]), before['ServerName']))
+
+    taken = set(original['ServerName']) | set(purging)
+    for _, row in added.iterrows():
+        svr_name, label = _text(row['ServerName']), _text(row['FriendlyName'])
+        if not svr_name and not label:
+            continue  # blank row left in the editor
+        if not svr_name or not label:
+            errors.append(f"New row {svr_name or label}: instance name and name are both required")
+        elif svr_name in taken:
+            errors.append(f"{svr_name}: already exists" + (" (its deleted data is still being purged)"
+                                                           if svr_name in purging else ""))
+        else:
+            taken.add(svr_name)
+            adds.append((svr_name, label, 1 if pd.isna(row['IsActive']) or row['IsActive'] else 0,
+                         _text(row['HostName']) or None))
+    return adds, updates, deletes, errors
+
+def apply_instance_changes(adds, updates, deletes):
+    """Apply a bulk edit in one transaction with one invalidation; deleted instances' data is purged later"""
+    with central_connection() as conn:
+        cursor = conn.cursor()
+        if adds:
+            cursor.executemany(
+                "INSERT INTO ManagedInstances (ServerName, FriendlyName, IsActive, HostName) VALUES (?,?,?,?)", adds)
+        if updates:
+            cursor.executemany(
+                "UPDATE ManagedInstances SET FriendlyName = ?, HostName = ?, IsActive = ?, LastModified = GETDATE() "
+                "WHERE ServerName = ?", updates)
+        for svr_name in deletes:
+            soft_delete_instance(cursor, svr_name)
+        invalidate(INSTANCES, cursor=cursor)
+        conn.commit()
+    if deletes:
+        start_background_purge()
+
+def render_bulk_edit(instances, purging):
+    """Stage toggles, adds and deletes in a grid and apply them together"""
+    st.caption("Edit cells, add rows at the bottom and tick Delete (or remove rows) - nothing is saved until you apply")
+    original = instances[EDIT_COLUMNS].assign(Delete=False)
+    edited = st.data_editor(
+        original,
+        key="bulk_instances",
+        num_rows="dynamic",
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            'ServerName': st.column_config.TextColumn("Instance Name", required=True),
+            'FriendlyName': st.column_config.TextColumn("Name", required=True),
+            'HostName': st.column_config.TextColumn("Host Name"),
+            'IsActive': st.column_config.CheckboxColumn("Active", default=True),
+            'Delete': st.column_config.CheckboxColumn("🗑️ Delete", default=False),
+        }
+    )
+    adds, updates, deletes, errors = diff_instances(original, edited, purging)
+    for error in errors:
+        st.error(f"❌ {error}")
+    if not (adds or updates or deletes):
+        st.info("No pending changes")
+        return
+
+    st.write(f"**Pending:** ➕ {len(adds)} to add · ✏️ {len(updates)} to update · 🗑️ {len(deletes)} to delete")
+    if deletes:
+        st.warning("⚠️ Deleting removes all collected history of: " + ", ".join(deletes))
+    if st.button("💾 Apply changes", type="primary", disabled=bool(errors)):
+        try:
+            apply_instance_changes(adds, updates, deletes)
+            st.session_state.pop("bulk_instances", None)
+            st.success(f"Applied {len(adds) + len(updates) + len(deletes)} change(s)")
+            st.rerun()
+        except Exception as e:
+            st.error(f"Failed to apply changes: {str(e)}")
+
+def render_purge_progress(progress):
+    """Deleted instances whose history is still being removed"""
+    st.subheader("🗑️ Deleting Instances")
+    st.caption("History is removed in small batches so collection and dashboards aren't blocked")
+    for _, row in progress.iterrows():
+        total, done = int(row['PurgeRowsTotal']), int(row['PurgeRowsDone'])
+        st.progress(min(done / total, 1.0) if total else 1.0,
+                    text=f"**{row['FriendlyName']}** ({row['ServerName']}) - {done:,} of ~{total:,} job runs removed")
+    if st.button("🔄 Refresh progress"):
+        start_background_purge()  # resumes a purge interrupted by a restart
+        st.rerun()
+    st.divider()
 
 def render():
     st.title("⚙️ Instance Management")
     
     instances = get_instances()
+    try:
+        progress = get_purge_progress()
+    except Exception as e:
+        progress = pd.DataFrame(columns=['ServerName'])
+        st.error(f"Error loading purge progress: {str(e)}")
+    if not progress.empty:
+        render_purge_progress(progress)
     
     if instances.empty:
         st.info("📋 No instances configured yet. Use the sidebar to add your first SQL Server instance.")
         return
+
+    if st.toggle("✏️ Bulk edit", key="bulk_edit_mode"):
+        render_bulk_edit(instances, set(progress['ServerName']))
+        return
     
     st.caption("Toggle switches to activate/deactivate monitoring for each instance")
     
     for idx, row in instances.iterrows():
         with st.container():
-            col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+            col1, col2, col3, col4, col5 = st.columns([3, 2, 1, 1, 1])
             
             with col1:
                 st.write(f"**{row['FriendlyName']}**")
                 st.caption(f"Added: {row['DateAdded'].strftime('%Y-%m-%d')}")
+                breaker_caption = _breaker_caption(row)
+                if breaker_caption:
+                    st.caption(breaker_caption)
+                    if row['LastError']:
+                        with st.expander("Last collection error"):
+                            st.write(row['LastError'])
             
             with col2:
                 st.code(row['ServerName'], language=None)
@@ -33,28 +180,31 @@ def render():
                 
                 if is_active != bool(row['IsActive']):
                     try:
-                        conn = get_central_conn()
-                        cursor = conn.cursor()
-                        cursor.execute(
-                            "UPDATE ManagedInstances SET IsActive = ?, LastModified = GETDATE() WHERE ServerName = ?",
-                            (1 if is_active else 0, row['ServerName'])
-                        )
-                        conn.commit()
-                        clear_all_caches()
+                        with central_connection() as conn:
+                            cursor = conn.cursor()
+                            cursor.execute(
+                                "UPDATE ManagedInstances SET IsActive = ?, LastModified = GETDATE() WHERE ServerName = ?",
+                                (1 if is_active else 0, row['ServerName'])
+                            )
+                            conn.commit()
+                        invalidate(INSTANCES)
                         st.success(f"Updated {row['FriendlyName']}")
                         st.rerun()
                     except Exception as e:
                         st.error(f"Failed to update: {str(e)}")
             
             with col4:
+                if st.button("🔁", key=f"resync_{idx}_{row['ServerName']}", help="Full resync (reload all history)"):
+                    try:
+                        queue_collection(row['ServerName'], full_resync=True)
+                        st.success(f"Resync of {row['FriendlyName']} queued")
+                    except Exception as e:
+                        st.error(f"Failed to queue resync: {str(e)}")
+
+            with col5:
                 if st.button("🗑️", key=f"del_{idx}_{row['ServerName']}", help="Delete instance"):
                     try:
-                        conn = get_central_conn()
-                        cursor = conn.cursor()
-                        cursor.execute("DELETE FROM JobLogs WHERE ServerName = ?", row['ServerName'])
-                        cursor.execute("DELETE FROM ManagedInstances WHERE ServerName = ?", row['ServerName'])
-                        conn.commit()
-                        clear_all_caches()
+                        apply_instance_changes([], [], [row['ServerName']])
                         st.success(f"Deleted {row['FriendlyName']}")
                         st.rerun()
                     except Exception as e:
@@ -66,14 +216,15 @@ def render():
     
     st.write("**Database Statistics**")
     try:
-        stats = fetch_static_data("""
+        # Row count from partition metadata; MIN/MAX are index seeks
+        stats = fetch_data("""
             SELECT 
-                COUNT(*) as TotalRecords,
-                MIN(LastRun) as OldestRecord,
-                MAX(LastRun) as NewestRecord,
-                COUNT(DISTINCT ServerName) as UniqueServers
-            FROM JobLogs
-        """)
+                (SELECT SUM(row_count) FROM sys.dm_db_partition_stats
+                 WHERE object_id = OBJECT_ID('dbo.JobLogs') AND index_id = 1) as TotalRecords,
+                (SELECT MIN(LastRun) FROM JobLogs) as OldestRecord,
+                (SELECT MAX(LastRun) FROM JobLogs) as NewestRecord,
+                (SELECT COUNT(DISTINCT ServerName) FROM JobRollupDaily) as UniqueServers
+        """, datasets=(JOB_LOGS, ROLLUPS))
         
         if not stats.empty and stats['TotalRecords'].iloc[0] > 0:
             st.metric("Total Records", f"{stats['TotalRecords'].iloc[0]:,}")
@@ -84,3 +235,23 @@ def render():
             st.info("No job logs in database yet")
     except Exception as e:
         st.error(f"Error loading stats: {str(e)}")
+
+    st.write("**JobLogs Partitions**")
+    partitions = get_partition_sizes()
+    if partitions.empty:
+        st.info("Partition sizes unavailable (needs VIEW DATABASE STATE)")
+        return
+    stored = partitions[partitions['Rows'] > 0]
+    cutoff = raw_cutoff()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("📅 Days Stored", len(stored))
+    col2.metric("💾 Size", f"{partitions['UsedMB'].sum():,.1f} MB")
+    col3.metric("🧹 Raw Retention", f"{RETENTION_CONFIG['raw_days']} days" if cutoff else "Keep all")
+    if cutoff:
+        st.caption(f"Runs before {cutoff:%Y-%m-%d} are kept only as daily rollups. The collector daemon "
+                   f"truncates expired day partitions every {RETENTION_CONFIG['check_minutes']} minutes "
+                   "(or run `python -m retention`).")
+    if not stored.empty:
+        st.bar_chart(stored.set_index('RangeStart')['UsedMB'])
+    with st.expander("Per-partition sizes"):
+        st.dataframe(partitions, use_container_width=True, hide_index=True)
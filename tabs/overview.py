@@ -1,12 +1,53 @@
 import streamlit as st
 import plotly.express as px
-from database import get_dashboard_data, get_health_summary
+from database import bootstrap
+from tabs.failures import render_error_details
+
+def render_performance_flags(flagged_runs, regressions):
+    """Regressed jobs and runs flagged against their baselines (analytics.py) in the last 24h"""
+    if flagged_runs.empty and regressions.empty:
+        return
+    st.divider()
+    st.subheader("🐢 Performance Flags")
+    col1, col2 = st.columns(2)
+    col1.metric("📈 Regressed Jobs", len(regressions),
+                help="Recent median duration or CPU well above the job's baseline")
+    col2.metric("⚡ Flagged Runs (24h)", len(flagged_runs),
+                help="Single runs far outside their job's usual range (robust z-score)")
+
+    if not regressions.empty:
+        st.dataframe(
+            regressions[['FriendlyName', 'JobName', 'DurationMedian', 'RecentDurationMedian', 'RecentCount']].rename(columns={
+                'FriendlyName': 'Instance',
+                'JobName': 'Job Name',
+                'DurationMedian': 'Baseline Median (s)',
+                'RecentDurationMedian': 'Recent Median (s)',
+                'RecentCount': 'Recent Runs'
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
+    if not flagged_runs.empty:
+        flagged = flagged_runs.copy()
+        flagged['Flag'] = flagged['Flag'].map({'anomaly': '⚡ Anomaly', 'regression': '🐢 Regression'})
+        st.dataframe(
+            flagged[['FriendlyName', 'JobName', 'LastRun', 'Flag', 'Metric', 'Value', 'BaselineMedian', 'Score']].rename(columns={
+                'FriendlyName': 'Instance',
+                'JobName': 'Job Name',
+                'LastRun': 'Run At',
+                'BaselineMedian': 'Baseline Median',
+                'Score': 'Z-Score'
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
 
 def render():
     st.title("🎯 Overview")
     
-    dashboard_df = get_dashboard_data()
-    health_summary = get_health_summary()
+    data = bootstrap('overview')  # already fetched by app.py this rerun
+    dashboard_df = data['dashboard']
+    health_summary = data['health_summary']
     
     if dashboard_df.empty:
         st.warning("⚠️ No job data available. Please add instances and run a sync.")
@@ -14,14 +55,15 @@ def render():
         return
 
     col1, col2, col3, col4 = st.columns(4)
-    total_jobs = len(dashboard_df)
-    failed_jobs = len(dashboard_df[dashboard_df['Status'] == 'Failed'])
+    kpis = data['kpis'].iloc[0]
+    total_jobs = int(kpis['TotalJobs'])
+    failed_jobs = int(kpis['FailedJobs'])
     success_rate = ((total_jobs - failed_jobs) / total_jobs * 100) if total_jobs > 0 else 0
     
     col1.metric("📦 Total Jobs", total_jobs)
     col2.metric("❌ Failed Jobs", failed_jobs, delta=f"-{failed_jobs}", delta_color="inverse")
     col3.metric("✅ Success Rate", f"{success_rate:.1f}%")
-    col4.metric("🖥️ Active Instances", len(health_summary))
+    col4.metric("🖥️ Active Instances", int(kpis['ActiveInstances']))
 
     st.divider()
     
@@ -67,6 +109,8 @@ def render():
         fig.update_layout(height=300, showlegend=False, margin=dict(t=0, b=0, l=0, r=0))
         st.plotly_chart(fig, use_container_width=True)
     
+    render_performance_flags(data['flagged_runs'], data['regressions'])
+
     st.divider()
     
     st.subheader("🚨 Critical Jobs Requiring Attention")
@@ -74,20 +118,20 @@ def render():
     
     if not failed_df.empty:
         failed_df['DurationSeconds'] = failed_df['DurationSeconds'].fillna(0)
-        failed_df['ErrorMessage'] = failed_df['ErrorMessage'].fillna('No error message')
+        failed_df['ErrorPreview'] = failed_df['ErrorPreview'].fillna('No error message')
         
         display_df = failed_df.head(50)
         
         st.dataframe(
             display_df[[
                 'FriendlyName', 'JobName', 'LastRun', 
-                'DurationSeconds', 'ErrorMessage'
+                'DurationSeconds', 'ErrorPreview'
             ]].rename(columns={
                 'FriendlyName': 'Instance',
                 'JobName': 'Job Name',
                 'LastRun': 'Failed At',
                 'DurationSeconds': 'Duration(s)',
-                'ErrorMessage': 'Error Details'
+                'ErrorPreview': 'Error Details'
             }),
             use_container_width=True,
             hide_index=True,
@@ -96,6 +140,8 @@ def render():
             }
         )
         
+        render_error_details(display_df, key="overview_error_details")
+        
         if len(failed_df) > 50:
             st.caption(f"Showing 50 of {len(failed_df)} failed jobs. Go to '24-Hour Failures' tab for full list.")
     else:
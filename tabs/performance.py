@@ -1,89 +1,140 @@
 import streamlit as st
 import plotly.express as px
-from database import get_performance_trends
+from config import CHART_CONFIG
+from database import (get_performance_instances, get_job_performance_summary, get_job_duration_trends,
+                      get_job_baselines, get_job_anomalies)
+from downsample import downsample
+
+TREND_WINDOWS = {"30 Days": 30, "90 Days": 90, "6 Months": 180, "1 Year": 365}
 
 def render():
     st.title("⚡ Performance Analytics")
     
-    perf_trends = get_performance_trends()
+    window = st.radio("Window", options=list(TREND_WINDOWS), horizontal=True, key="perf_window")
+    days = TREND_WINDOWS[window]
+    perf_instances = get_performance_instances(days)
     
-    if perf_trends.empty:
+    if perf_instances.empty:
         st.warning("⚠️ No performance data available.")
         return
 
-    all_instances = perf_trends['FriendlyName'].unique().tolist()
+    friendly_names = dict(zip(perf_instances['HostName'], perf_instances['FriendlyName']))
     
     selected_instance = st.selectbox(
         "Select Instance",
-        options=all_instances,
+        options=perf_instances['HostName'].tolist(),
+        format_func=lambda x: friendly_names[x],
         key="perf_selector"
     )
     
     if not selected_instance:
         return
     
-    filtered = perf_trends[perf_trends['FriendlyName'] == selected_instance]
+    summary = get_job_performance_summary(selected_instance, days)
     st.divider()
 
-    st.subheader("📊 Average Duration Trends (30 Days)")
+    st.subheader(f"📊 Average Duration Trends ({window})")
     
-    unique_jobs = filtered['JobName'].nunique()
-    if unique_jobs > 15:
-        st.info(f"ℹ️ {unique_jobs} jobs found. Showing top 15 by max duration for better performance.")
-        top_jobs = (filtered.groupby('JobName')['MaxDuration']
-                   .max()
-                   .sort_values(ascending=False)
-                   .head(15)
-                   .index.tolist())
-        filtered_chart = filtered[filtered['JobName'].isin(top_jobs)]
+    trends = get_job_duration_trends(selected_instance, days)
+    if trends.empty:
+        st.info("No duration data in this window.")
     else:
-        filtered_chart = filtered
-    
-    if len(filtered_chart) < 1000:
+        # The chart's point budget is split between its jobs; days with failures always stay
+        per_job = max(4, min(CHART_CONFIG['max_points_per_series'],
+                             CHART_CONFIG['max_points_per_chart'] // trends['JobName'].nunique()))
+        filtered_chart = downsample(
+            trends, 'RunDate', 'AvgDuration',
+            max_points=per_job,
+            by='JobName',
+            keep=trends['FailureCount'] > 0,
+            method=CHART_CONFIG['method']
+        )
+        if len(filtered_chart) < len(trends):
+            st.caption(f"ℹ️ Showing {len(filtered_chart):,} of {len(trends):,} points across {len(summary)} jobs")
+        
         fig_duration = px.line(
             filtered_chart,
             x='RunDate',
             y='AvgDuration',
             color='JobName',
-            facet_col='FriendlyName',
-            facet_col_wrap=2,
-            title='Job Duration Trends by Instance',
-            labels={'AvgDuration': 'Average Duration (seconds)'}
+            title=f'Job Duration Trends - {friendly_names[selected_instance]}',
+            labels={'AvgDuration': 'Average Duration (seconds)'},
+            render_mode='webgl'
         )
         fig_duration.update_layout(height=500, showlegend=True)
         fig_duration.update_xaxes(title_text='Date')
         st.plotly_chart(fig_duration, use_container_width=True, key="duration_chart")
-    else:
-        st.warning("Too much data to display chart. Please select fewer instances or jobs.")
 
     st.divider()
     
     st.subheader("🐌 Top 10 Slowest Jobs")
     
-    top_slow = (filtered.groupby('JobName')['MaxDuration']
-               .max()
-               .sort_values(ascending=False)
-               .head(10))
+    # summary arrives ordered by MaxDuration DESC
+    top_slow = summary[['JobName', 'MaxDuration']].head(10)
+    baselines = get_job_baselines(selected_instance)
+    if not baselines.empty:
+        top_slow = top_slow.merge(baselines[['JobName', 'DurationMedian', 'DurationP95', 'IsRegression']],
+                                  on='JobName', how='left')
+        top_slow['IsRegression'] = top_slow['IsRegression'].map({True: '🐢 Regressed'}).fillna('')
     
     st.dataframe(
-        top_slow.reset_index().rename(columns={
+        top_slow.rename(columns={
             'JobName': 'Job Name',
-            'MaxDuration': 'Max Duration (seconds)'
+            'MaxDuration': 'Max Duration (seconds)',
+            'DurationMedian': 'Baseline Median (s)',
+            'DurationP95': 'Baseline p95 (s)',
+            'IsRegression': 'Trend'
         }),
         use_container_width=True,
         hide_index=True
     )
     
     st.divider()
+
+    st.subheader("🐢 Regressions & Anomalies")
+    st.caption("Successful runs compared with each job's rolling median and MAD; flagged as they are collected")
+
+    regressed = baselines[baselines['IsRegression'].astype(bool)] if not baselines.empty else baselines
+    if not regressed.empty:
+        regressed = regressed.assign(Slowdown=(regressed['RecentDurationMedian'] / regressed['DurationMedian']).round(2))
+        st.dataframe(
+            regressed[['JobName', 'DurationMedian', 'RecentDurationMedian', 'Slowdown', 'CPUMedian', 'RecentCPUMedian']]
+            .sort_values('Slowdown', ascending=False)
+            .rename(columns={
+                'JobName': 'Job Name',
+                'DurationMedian': 'Baseline Median (s)',
+                'RecentDurationMedian': 'Recent Median (s)',
+                'Slowdown': 'Slowdown (x)',
+                'CPUMedian': 'Baseline CPU (ms)',
+                'RecentCPUMedian': 'Recent CPU (ms)'
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
+
+    anomalies = get_job_anomalies(selected_instance, days)
+    if not anomalies.empty:
+        anomalies = anomalies.assign(Flag=anomalies['Flag'].map({'anomaly': '⚡ Anomaly', 'regression': '🐢 Regression'}))
+        st.dataframe(
+            anomalies.rename(columns={
+                'JobName': 'Job Name',
+                'LastRun': 'Run At',
+                'BaselineMedian': 'Baseline Median',
+                'Score': 'Z-Score'
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
+
+    if regressed.empty and anomalies.empty:
+        st.success("✅ No regressions or anomalous runs in this window")
     
-    st.subheader("❌ Jobs with Failures")
+    st.divider()
     
-    summary = filtered.groupby('JobName').agg({
-        'ExecutionCount': 'sum',
-        'FailureCount': 'sum'
-    }).reset_index()
+    st.subheader("❌ Jobs with Failures")
     
-    failed_jobs = summary[summary['FailureCount'] > 0].sort_values('FailureCount', ascending=False)
+    failed_jobs = (summary[summary['FailureCount'] > 0][['JobName', 'ExecutionCount', 'FailureCount']]
+                   .sort_values('FailureCount', ascending=False))
     
     if not failed_jobs.empty:
         st.dataframe(
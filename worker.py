@@ -1,96 +1,1088 @@
+import os
+import re
+import sys
+import math
+import time
+import hashlib
+import functools
+import uuid
+import queue
+import logging
+import argparse
+import socket
+import threading
+import multiprocessing
 import pyodbc
-from config import DB_CONFIG
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from config import DB_CONFIG, COLLECTOR_CONFIG, RETENTION_CONFIG, ANALYTICS_CONFIG
+from migrations import apply_migrations, read_committed_snapshot_enabled, RCSI_OFF_MESSAGE
+from retention import raw_cutoff, enforce_retention, log_summary, purge_deleted_instances
+from analytics import refresh_for_run
+from database import (central_connection, get_pool, bump_generations, record_pool_gauges,
+                      JOB_LOGS, JOB_LOGS_REWRITE, ROLLUPS, HEALTH)
+from instrumentation import (timer, observe, increment, set_process, export, remove_export,
+                             snapshot as metrics_snapshot, merge as merge_metrics, reset as reset_metrics)
 
-def parse_sql_duration(duration_hhmmss):
-    """Convert SQL Server duration format (HHMMSS) to seconds"""
-    if not duration_hhmmss or duration_hhmmss == 0:
-        return 0
-    
-    duration_str = str(duration_hhmmss).zfill(6)
-    hours = int(duration_str[:-4] or 0)
-    minutes = int(duration_str[-4:-2])
-    seconds = int(duration_str[-2:])
-    
-    return hours * 3600 + minutes * 60 + seconds
-
-def run_collection():
-    """Enhanced collection with error handling and performance metrics"""
-    central_conn = pyodbc.connect(
+log = logging.getLogger("collector")
+
+BREAKER_CLOSED = 'closed'
+BREAKER_OPEN = 'open'
+BREAKER_HALF_OPEN = 'half_open'
+
+STAGE_JOB_LOGS = """
+    INSERT INTO JobLogs_Staging
+    (RunID, ManagedServer, ServerName, JobName, Status, LastRun, ErrorID,
+     DurationSeconds, CPUTimeMS, StepCount, SourceInstanceID)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Explicit parameter types for fast_executemany (pyodbc otherwise re-derives them per batch)
+STAGING_INPUT_SIZES = [
+    (pyodbc.SQL_WVARCHAR, 36, 0),        # RunID
+    (pyodbc.SQL_WVARCHAR, 128, 0),       # ManagedServer
+    (pyodbc.SQL_WVARCHAR, 128, 0),       # ServerName
+    (pyodbc.SQL_WVARCHAR, 128, 0),       # JobName
+    (pyodbc.SQL_WVARCHAR, 20, 0),        # Status
+    (pyodbc.SQL_TYPE_TIMESTAMP, 23, 3),  # LastRun
+    (pyodbc.SQL_INTEGER, 0, 0),          # ErrorID
+    (pyodbc.SQL_INTEGER, 0, 0),          # DurationSeconds
+    (pyodbc.SQL_INTEGER, 0, 0),          # CPUTimeMS
+    (pyodbc.SQL_INTEGER, 0, 0),          # StepCount
+    (pyodbc.SQL_INTEGER, 0, 0),          # SourceInstanceID
+]
+
+def _rollup_merge_sql(table, bucket_col, bucket_expr):
+    """MERGE that folds a run's staged rows into a per-job rollup table"""
+    return f"""
+        MERGE {table} AS t
+        USING (
+            SELECT ServerName, JobName, {bucket_expr} AS {bucket_col},
+                   COUNT(*) AS ExecutionCount,
+                   SUM(CASE WHEN Status = 'Succeeded' THEN 1 ELSE 0 END) AS SuccessCount,
+                   SUM(CASE WHEN Status = 'Failed' THEN 1 ELSE 0 END) AS FailureCount,
+                   SUM(CAST(ISNULL(DurationSeconds, 0) AS bigint)) AS DurationSum,
+                   MIN(ISNULL(DurationSeconds, 0)) AS DurationMin,
+                   MAX(ISNULL(DurationSeconds, 0)) AS DurationMax,
+                   SUM(CAST(ISNULL(CPUTimeMS, 0) AS bigint)) AS CPUSum,
+                   MIN(ISNULL(CPUTimeMS, 0)) AS CPUMin,
+                   MAX(ISNULL(CPUTimeMS, 0)) AS CPUMax
+            FROM JobLogs_Staging
+            WHERE RunID = ?
+            GROUP BY ServerName, JobName, {bucket_expr}
+        ) AS s
+            ON t.ServerName = s.ServerName AND t.JobName = s.JobName AND t.{bucket_col} = s.{bucket_col}
+        WHEN MATCHED THEN UPDATE SET
+            ExecutionCount = t.ExecutionCount + s.ExecutionCount,
+            SuccessCount = t.SuccessCount + s.SuccessCount,
+            FailureCount = t.FailureCount + s.FailureCount,
+            DurationSum = t.DurationSum + s.DurationSum,
+            DurationMin = CASE WHEN s.DurationMin < t.DurationMin THEN s.DurationMin ELSE t.DurationMin END,
+            DurationMax = CASE WHEN s.DurationMax > t.DurationMax THEN s.DurationMax ELSE t.DurationMax END,
+            CPUSum = t.CPUSum + s.CPUSum,
+            CPUMin = CASE WHEN s.CPUMin < t.CPUMin THEN s.CPUMin ELSE t.CPUMin END,
+            CPUMax = CASE WHEN s.CPUMax > t.CPUMax THEN s.CPUMax ELSE t.CPUMax END
+        WHEN NOT MATCHED THEN
+            INSERT (ServerName, JobName, {bucket_col}, ExecutionCount, SuccessCount, FailureCount,
+                    DurationSum, DurationMin, DurationMax, CPUSum, CPUMin, CPUMax)
+            VALUES (s.ServerName, s.JobName, s.{bucket_col}, s.ExecutionCount, s.SuccessCount,
+                    s.FailureCount, s.DurationSum, s.DurationMin, s.DurationMax,
+                    s.CPUSum, s.CPUMin, s.CPUMax);
+    """
+
+# Per-job rollups maintained incrementally at publish time (replace re-aggregating JobLogs)
+ROLLUP_MERGES = [
+    _rollup_merge_sql('JobRollupHourly', 'HourStart', "DATEADD(hour, DATEDIFF(hour, 0, LastRun), 0)"),
+    _rollup_merge_sql('JobRollupDaily', 'RunDate', "CAST(LastRun AS date)"),
+]
+
+# Positions within a staging parameter tuple
+_SOURCE_SERVER_COL = 2
+_ERROR_COL = 6
+_HISTORY_ID_COL = 10
+
+# Variable parts of agent messages, masked before fingerprinting so repeats of
+# the same error share one ErrorMessages row
+_ERROR_MASKS = [
+    (re.compile(r'\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b'), '<guid>'),
+    (re.compile(r'\b\d{4}-\d{2}-\d{2}(?:[ T]\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?'), '<datetime>'),
+    (re.compile(r'\b\d{1,2}/\d{1,2}/\d{2,4}(?: \d{1,2}:\d{2}(?::\d{2})?(?: ?[AP]M)?)?'), '<datetime>'),
+    (re.compile(r'\b\d{1,2}:\d{2}:\d{2}(?:\.\d+)?(?: ?[AP]M)?'), '<time>'),
+    (re.compile(r'\b0x[0-9a-fA-F]+\b'), '<hex>'),
+    (re.compile(r'\b\d{6,}\b'), '<n>'),  # ids, row counts; short numbers (error codes) stay
+]
+
+# Fingerprint -> ErrorMessages.ErrorID; entries never change once assigned
+_error_ids = {}
+
+def _remote_conn_str(svr_name):
+    """Connection string for a monitored instance's msdb"""
+    return (
         f"DRIVER={DB_CONFIG['driver']};"
-        f"SERVER={DB_CONFIG['server']};"
-        f"DATABASE={DB_CONFIG['database']};"
+        f"SERVER={svr_name};"
+        f"DATABASE=msdb;"
         f"Trusted_Connection=yes;"
     )
-    cursor = central_conn.cursor()
-    
-    cursor.execute("SELECT ServerName, FriendlyName FROM ManagedInstances WHERE IsActive = 1")
-    instances = cursor.fetchall()
-    cursor.execute("TRUNCATE TABLE JobLogs")
-    
+
+def _stream_rows(cursor, chunk_size, svr_name):
+    """Yield a result set in fetchmany chunks (fetch stage)"""
+    while True:
+        with timer('collector_phase_seconds', phase='fetch', instance=svr_name):
+            chunk = cursor.fetchmany(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+@functools.lru_cache(maxsize=4096)
+def _fingerprint_error(message):
+    """(sha256 of the masked text, masked text) for an agent message"""
+    masked = message
+    for pattern, token in _ERROR_MASKS:
+        masked = pattern.sub(token, masked)
+    return hashlib.sha256(masked.encode('utf-8')).digest(), masked
+
+def _to_staging_params(chunk, run_id, svr_name):
+    """Shape pull_jobs.sql rows into JobLogs_Staging insert parameters (transform stage)
+
+    The message is replaced by its fingerprint; returns the parameters plus
+    {fingerprint: (masked text, sample text)} for the writer to intern.
+    """
+    params, messages = [], {}
+    for row in chunk:
+        row = tuple(row)
+        fingerprint = None
+        if row[4]:
+            fingerprint, masked = _fingerprint_error(row[4])
+            messages.setdefault(fingerprint, (masked, row[4]))
+        params.append((run_id, svr_name) + row[:4] + (fingerprint,) + row[5:])
+    return params, messages
+
+def _put(out_queue, item, stop):
+    """Blocking put that gives up once the writer has stopped listening"""
+    while not stop.is_set():
+        try:
+            out_queue.put(item, timeout=1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _fetch_instance(run_id, svr_name, job_query, since_id, lookback_days, chunk_size,
+                    out_queue, stop, connect_timeout, instance_timeout):
+    """Stream job history newer than since_id from one instance into out_queue
+
+    Runs on a pool thread and only reads; the bounded queue applies back-pressure
+    so at most a few chunks per instance are ever held in memory. The
+    connection timeout bounds each statement; deadline bounds the whole
+    instance, however slowly its rows stream in.
+    """
+    started = time.perf_counter()
+    deadline = started + instance_timeout
+    try:
+        with pyodbc.connect(_remote_conn_str(svr_name), timeout=connect_timeout) as remote_conn:
+            connect_seconds = time.perf_counter() - started
+            observe('collector_phase_seconds', connect_seconds, phase='connect', instance=svr_name)
+            remote_conn.timeout = instance_timeout
+            with timer('collector_phase_seconds', phase='query', instance=svr_name):
+                cursor = remote_conn.cursor().execute(job_query, since_id, lookback_days)
+            for chunk in _stream_rows(cursor, chunk_size, svr_name):
+                if time.perf_counter() > deadline:
+                    raise TimeoutError(f"instance exceeded {instance_timeout}s")
+                with timer('collector_phase_seconds', phase='transform', instance=svr_name):
+                    params = _to_staging_params(chunk, run_id, svr_name)
+                # Time blocked here is back-pressure from the writer
+                with timer('collector_phase_seconds', phase='queue_wait', instance=svr_name):
+                    if not _put(out_queue, ('rows', svr_name, params), stop):
+                        return
+        _put(out_queue, ('done', svr_name, (time.perf_counter() - started, connect_seconds)), stop)
+    except Exception as e:
+        _put(out_queue, ('error', svr_name, e), stop)
+
+def _describe_error(label, e):
+    """Collection error text in the collection_results['failed'] format"""
+    if isinstance(e, TimeoutError):
+        return f"Timed out on {label}: {str(e)}"
+    if isinstance(e, pyodbc.Error):
+        return f"Database error on {label}: {str(e)}"
+    return f"Error reaching {label}: {str(e)}"
+
+def _lookup_error_ids(cursor, fingerprints):
+    for start in range(0, len(fingerprints), 500):
+        batch = fingerprints[start:start + 500]
+        cursor.execute(
+            f"SELECT Fingerprint, ErrorID FROM ErrorMessages WHERE Fingerprint IN ({', '.join('?' for _ in batch)})",
+            batch
+        )
+        _error_ids.update((bytes(fingerprint), error_id) for fingerprint, error_id in cursor.fetchall())
+
+def _intern_errors(conn, cursor, messages):
+    """Make sure every fingerprint has an ErrorMessages row and its ErrorID is cached
+
+    New rows are committed before their ids are read back, so a staging
+    rollback can't leave ids in _error_ids that never existed.
+    """
+    missing = [fingerprint for fingerprint in messages if fingerprint not in _error_ids]
+    if missing:
+        _lookup_error_ids(cursor, missing)
+        missing = [fingerprint for fingerprint in missing if fingerprint not in _error_ids]
+    if missing:
+        # UX_ErrorMessages_Fingerprint ignores duplicates from a concurrent collector
+        cursor.setinputsizes([(pyodbc.SQL_BINARY, 32, 0), (pyodbc.SQL_WLONGVARCHAR, 0, 0),
+                              (pyodbc.SQL_WLONGVARCHAR, 0, 0)])
+        cursor.executemany(
+            "INSERT INTO ErrorMessages (Fingerprint, MaskedMessage, SampleMessage) VALUES (?, ?, ?)",
+            [(fingerprint,) + messages[fingerprint] for fingerprint in missing]
+        )
+        conn.commit()
+        _lookup_error_ids(cursor, missing)
+
+def _stage_job_logs(conn, cursor, payload, batch_size):
+    """Bulk insert staging parameter tuples, batch_size rows per round trip (write stage)"""
+    params, messages = payload
+    with timer('collector_intern_seconds'):
+        _intern_errors(conn, cursor, messages)
+    rows = [row[:_ERROR_COL] + (_error_ids.get(row[_ERROR_COL]),) + row[_ERROR_COL + 1:]
+            for row in params]
+    inserted = 0
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        cursor.setinputsizes(STAGING_INPUT_SIZES)
+        cursor.executemany(STAGE_JOB_LOGS, batch)
+        inserted += len(batch)
+    return inserted
+
+def _discard_staged(cursor, run_id, svr_name=None):
+    """Drop staged rows for a run (or just one of its instances)"""
+    if svr_name is None:
+        cursor.execute("DELETE FROM JobLogs_Staging WHERE RunID = ?", run_id)
+    else:
+        cursor.execute("DELETE FROM JobLogs_Staging WHERE RunID = ? AND ManagedServer = ?",
+                       (run_id, svr_name))
+
+def _discard_instance(conn, cursor, run_id, svr_name):
+    """Roll back a failed instance's open chunk and drop what it staged
+
+    Returns False when the central connection itself is gone; the pool then
+    discards it and the staged rows age out with the daily staging cleanup.
+    """
+    try:
+        conn.rollback()
+        _discard_staged(cursor, run_id, svr_name)
+        conn.commit()
+        return True
+    except pyodbc.Error:
+        return False
+
+def _publish(cursor, run_id, completed, full_resync):
+    """Move a run's staged rows into JobLogs (caller commits once, atomically)
+
+    completed maps ManagedInstances.ServerName -> (source_server, last_id).
+    Returns the number of rows that became visible in JobLogs. The touched
+    jobs' baselines and run flags (analytics.py) commit with them.
+    """
+    # One publish at a time: LogIDs are handed out at insert time, so concurrent
+    # publishes could commit lower LogIDs after higher ones were already read by
+    # the snapshot's LogID watermark (snapshot.py) and those rows would be skipped
+    cursor.execute("""
+        DECLARE @result int;
+        EXEC @result = sp_getapplock @Resource = 'SQL_Monitoring.Publish',
+            @LockMode = 'Exclusive', @LockOwner = 'Transaction', @LockTimeout = 120000;
+        SELECT @result;
+    """)
+    if cursor.fetchone()[0] < 0:
+        raise RuntimeError("Timed out waiting for another collector's publish")
+
+    if full_resync:
+        cutoff = raw_cutoff()
+        for svr_name in completed:
+            _clear_instance_history(cursor, svr_name, rollups_kept_before=cutoff)
+        if cutoff:
+            # Days past raw retention already live on in the rollups kept above
+            cursor.execute("DELETE FROM JobLogs_Staging WHERE RunID = ? AND LastRun < ?", (run_id, cutoff))
+
+    # Rows JobLogs already has would be skipped by the insert but still counted by the rollups
+    cursor.execute("""
+        DELETE s FROM JobLogs_Staging s
+        WHERE s.RunID = ?
+          AND EXISTS (SELECT 1 FROM JobLogs jl
+                      WHERE jl.ServerName = s.ServerName
+                        AND jl.SourceInstanceID = s.SourceInstanceID)
+    """, run_id)
+    for rollup_sql in ROLLUP_MERGES:
+        cursor.execute(rollup_sql, run_id)
+
+    cursor.execute("""
+        INSERT INTO JobLogs
+        (ServerName, JobName, Status, LastRun, ErrorID,
+         DurationSeconds, CPUTimeMS, StepCount, SourceInstanceID)
+        SELECT ServerName, JobName, Status, LastRun, ErrorID,
+               DurationSeconds, CPUTimeMS, StepCount, SourceInstanceID
+        FROM JobLogs_Staging
+        WHERE RunID = ?
+    """, run_id)
+    published = max(cursor.rowcount, 0)
+
+    if published and ANALYTICS_CONFIG['enabled']:
+        # Baselines catch up on the job's next run; never hold back the rows themselves.
+        # The savepoint undoes a half-done refresh (baselines deleted, not yet re-inserted).
+        cursor.execute("SAVE TRANSACTION analytics")
+        try:
+            with timer('collector_analytics_seconds'):
+                increment('collector_runs_flagged_total', refresh_for_run(cursor, run_id))
+        except Exception as e:
+            cursor.execute("SELECT XACT_STATE()")
+            if cursor.fetchone()[0] != 1:
+                # Doomed or already rolled back (e.g. deadlock victim): carrying on would commit
+                # the watermark without the rows, so fail the whole publish instead
+                raise
+            cursor.execute("ROLLBACK TRANSACTION analytics")
+            log.warning("Baseline refresh failed for run %s: %s", run_id, e)
+
+    for svr_name, (source_server, last_id) in completed.items():
+        _save_watermark(cursor, svr_name, source_server, last_id)
+        _refresh_health_summary(cursor, run_id, svr_name)
+    _discard_staged(cursor, run_id)
+
+    # Dashboard caches keyed on these generations refresh once this commits
+    if full_resync:
+        bump_generations(cursor, JOB_LOGS, JOB_LOGS_REWRITE, ROLLUPS, HEALTH)
+    elif published:
+        bump_generations(cursor, JOB_LOGS, ROLLUPS, HEALTH)
+    elif completed:
+        bump_generations(cursor, HEALTH)
+    return published
+
+def _refresh_health_summary(cursor, run_id, svr_name):
+    """Recompute an instance's InstanceHealthSummary row from the hourly rollup
+
+    Runs inside the publish transaction after the rollups and watermark are
+    updated. 24 h / 7 day windows are resolved at hour granularity.
+    """
+    cursor.execute("""
+        WITH Week AS (
+            SELECT COUNT(DISTINCT r.JobName) AS TotalJobs,
+                   SUM(CASE WHEN r.HourStart >= DATEADD(hour, -24, GETDATE())
+                            THEN r.FailureCount ELSE 0 END) AS FailuresLast24h,
+                   SUM(CASE WHEN r.HourStart >= DATEADD(hour, -24, GETDATE())
+                            THEN r.SuccessCount ELSE 0 END) AS SuccessLast24h,
+                   CAST(SUM(r.DurationSum) AS FLOAT) / NULLIF(SUM(r.ExecutionCount), 0) AS AvgJobDuration,
+                   CAST(SUM(r.CPUSum) AS FLOAT) / NULLIF(SUM(r.ExecutionCount), 0) AS AvgCPUUsage
+            FROM JobRollupHourly r
+            WHERE r.ServerName = (SELECT SourceServerName FROM CollectionWatermarks WHERE ServerName = ?)
+              AND r.HourStart >= DATEADD(day, -7, GETDATE())
+        )
+        MERGE InstanceHealthSummary AS t
+        USING (
+            SELECT ? AS ServerName, w.TotalJobs, ISNULL(w.FailuresLast24h, 0) AS FailuresLast24h,
+                   ISNULL(w.SuccessLast24h, 0) AS SuccessLast24h, w.AvgJobDuration, w.AvgCPUUsage,
+                   (SELECT MAX(LastRun) FROM JobLogs_Staging
+                    WHERE RunID = ? AND ManagedServer = ?) AS NewestRun
+            FROM Week w
+        ) AS s
+            ON t.ServerName = s.ServerName
+        WHEN MATCHED THEN UPDATE SET
+            TotalJobs = s.TotalJobs,
+            FailuresLast24h = s.FailuresLast24h,
+            SuccessLast24h = s.SuccessLast24h,
+            AvgJobDuration = s.AvgJobDuration,
+            AvgCPUUsage = s.AvgCPUUsage,
+            LastDataCollection = CASE WHEN t.LastDataCollection IS NULL OR s.NewestRun > t.LastDataCollection
+                                      THEN s.NewestRun ELSE t.LastDataCollection END,
+            LastSync = GETDATE()
+        WHEN NOT MATCHED THEN
+            INSERT (ServerName, TotalJobs, FailuresLast24h, SuccessLast24h,
+                    AvgJobDuration, AvgCPUUsage, LastDataCollection, LastSync)
+            VALUES (s.ServerName, s.TotalJobs, s.FailuresLast24h, s.SuccessLast24h,
+                    s.AvgJobDuration, s.AvgCPUUsage, s.NewestRun, GETDATE());
+    """, (svr_name, svr_name, run_id, svr_name))
+
+def get_watermarks(cursor):
+    """Map ManagedInstances.ServerName -> last sysjobhistory.instance_id collected"""
+    cursor.execute("SELECT ServerName, LastInstanceID FROM CollectionWatermarks")
+    return {svr_name: last_id for svr_name, last_id in cursor.fetchall()}
+
+def _save_watermark(cursor, svr_name, source_server, last_id):
+    """Advance an instance's high-water mark (same transaction as the publish)"""
+    cursor.execute("""
+        MERGE CollectionWatermarks AS t
+        USING (SELECT ? AS ServerName, ? AS SourceServerName, ? AS LastInstanceID) AS s
+            ON t.ServerName = s.ServerName
+        WHEN MATCHED THEN UPDATE SET
+            SourceServerName = ISNULL(s.SourceServerName, t.SourceServerName),
+            LastInstanceID = s.LastInstanceID,
+            LastCollectedAt = GETDATE()
+        WHEN NOT MATCHED THEN
+            INSERT (ServerName, SourceServerName, LastInstanceID, LastCollectedAt)
+            VALUES (s.ServerName, s.SourceServerName, s.LastInstanceID, GETDATE());
+    """, (svr_name, source_server, last_id))
+
+def _clear_instance_history(cursor, svr_name, rollups_kept_before=None):
+    """Drop an instance's collected rows and rollups ahead of a full resync
+
+    Rollups for days before rollups_kept_before stay: retention has purged
+    (or will purge) their raw rows, so a resync could not rebuild them.
+    """
+    for table, bucket_col in (('JobLogs', None), ('JobRollupHourly', 'HourStart'), ('JobRollupDaily', 'RunDate')):
+        params = (svr_name, svr_name)
+        kept = ""
+        if bucket_col and rollups_kept_before:
+            kept = f"AND {bucket_col} >= ?"
+            params += (rollups_kept_before,)
+        cursor.execute(f"""
+            DELETE FROM {table}
+            WHERE ServerName IN (
+                SELECT SourceServerName FROM CollectionWatermarks WHERE ServerName = ?
+                UNION SELECT HostName FROM ManagedInstances WHERE ServerName = ?
+            ) {kept}
+        """, params)
+
+def get_instance_health(cursor):
+    """Map ManagedInstances.ServerName -> circuit breaker state from InstanceHealth"""
+    cursor.execute("""
+        SELECT ServerName, BreakerState, ConsecutiveFailures, NextRetryAt, ConnectLatencyMs
+        FROM InstanceHealth
+    """)
+    return {
+        svr_name: {'state': state, 'failures': failures, 'next_retry': next_retry, 'latency_ms': latency_ms}
+        for svr_name, state, failures, next_retry, latency_ms in cursor.fetchall()
+    }
+
+def _breaker_allows(health, now):
+    """Closed breakers always pass; an open one lets a single half-open probe through once due"""
+    if not health or health['state'] == BREAKER_CLOSED:
+        return True
+    return health['next_retry'] is None or health['next_retry'] <= now
+
+def _adaptive_connect_timeout(health, ceiling):
+    """Connect timeout scaled from the instance's observed login latency"""
+    if not health or not health['latency_ms']:
+        return ceiling
+    scaled = health['latency_ms'] / 1000 * COLLECTOR_CONFIG['latency_timeout_multiplier']
+    return min(max(math.ceil(scaled), COLLECTOR_CONFIG['min_connect_timeout']), ceiling)
+
+def _record_health(cursor, svr_name, health, error, connect_seconds):
+    """Update an instance's breaker after an attempt (error is None on success)
+
+    Consecutive failures past the threshold, or a failed half-open probe, open
+    the breaker with a cooldown that doubles per failure; any success closes it.
+    Connect latency is kept as a moving average for the adaptive timeout.
+    """
+    now = datetime.now()
+    failures = 0 if error is None else (health['failures'] if health else 0) + 1
+    state, next_retry = BREAKER_CLOSED, None
+    threshold = COLLECTOR_CONFIG['breaker_failure_threshold']
+    was_probe = health is not None and health['state'] != BREAKER_CLOSED
+    if error is not None and (failures >= threshold or was_probe):
+        cooldown = COLLECTOR_CONFIG['breaker_cooldown_seconds'] * 2 ** max(failures - threshold, 0)
+        state = BREAKER_OPEN
+        next_retry = now + timedelta(seconds=min(cooldown, COLLECTOR_CONFIG['retry_max_seconds']))
+
+    latency_ms = None
+    if connect_seconds is not None:
+        latency_ms = connect_seconds * 1000
+        if health and health['latency_ms']:
+            latency_ms = 0.7 * health['latency_ms'] + 0.3 * latency_ms
+
+    cursor.execute("""
+        MERGE InstanceHealth AS t
+        USING (SELECT ? AS ServerName, ? AS BreakerState, ? AS ConsecutiveFailures,
+                      ? AS LastError, ? AS NextRetryAt, ? AS ConnectLatencyMs) AS s
+            ON t.ServerName = s.ServerName
+        WHEN MATCHED THEN UPDATE SET
+            BreakerState = s.BreakerState,
+            ConsecutiveFailures = s.ConsecutiveFailures,
+            LastError = ISNULL(s.LastError, t.LastError),
+            LastFailureAt = CASE WHEN s.LastError IS NULL THEN t.LastFailureAt ELSE GETDATE() END,
+            LastSuccessAt = CASE WHEN s.LastError IS NULL THEN GETDATE() ELSE t.LastSuccessAt END,
+            NextRetryAt = s.NextRetryAt,
+            ConnectLatencyMs = ISNULL(s.ConnectLatencyMs, t.ConnectLatencyMs)
+        WHEN NOT MATCHED THEN
+            INSERT (ServerName, BreakerState, ConsecutiveFailures, LastError,
+                    LastFailureAt, LastSuccessAt, NextRetryAt, ConnectLatencyMs)
+            VALUES (s.ServerName, s.BreakerState, s.ConsecutiveFailures, s.LastError,
+                    CASE WHEN s.LastError IS NULL THEN NULL ELSE GETDATE() END,
+                    CASE WHEN s.LastError IS NULL THEN GETDATE() ELSE NULL END,
+                    s.NextRetryAt, s.ConnectLatencyMs);
+    """, (svr_name, state, failures, error, next_retry, latency_ms))
+
+# ============================================
+# Collector leases (sharding across processes / hosts)
+# ============================================
+
+def collector_id():
+    """Lease owner name for this process"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _lease_seconds():
+    # A run is bounded by total_timeout, so a live owner's lease never lapses mid-run
+    return COLLECTOR_CONFIG['total_timeout'] + COLLECTOR_CONFIG['lease_grace_seconds']
+
+def _claim_leases(cursor, owner, limit, servers=None, due_only=True, leased_before=None):
+    """Lease up to limit free active instances to owner; returns their ServerNames (caller commits)
+
+    UPDLOCK + READPAST: concurrent claimers skip rows another is claiming
+    instead of waiting on them. due_only honours NextDueAt; leased_before
+    excludes instances already leased since then (so one pass never takes
+    an instance twice).
+    """
+    cursor.execute("""
+        INSERT INTO CollectionLeases (ServerName)
+        SELECT mi.ServerName FROM ManagedInstances mi
+        WHERE mi.IsDeleted = 0
+          AND NOT EXISTS (SELECT 1 FROM CollectionLeases l WHERE l.ServerName = mi.ServerName)
+    """)
+    conditions, params = [], [limit]
+    if servers is not None:
+        conditions.append(f"AND l.ServerName IN ({', '.join('?' for _ in servers)})")
+        params += list(servers)
+    if due_only:
+        conditions.append("AND (l.NextDueAt IS NULL OR l.NextDueAt <= GETDATE())")
+    if leased_before is not None:
+        conditions.append("AND (l.LeasedAt IS NULL OR l.LeasedAt < ?)")
+        params.append(leased_before)
+    cursor.execute(f"""
+        WITH Free AS (
+            SELECT TOP (?) l.ServerName, l.Owner, l.LeasedAt, l.LeaseExpiresAt
+            FROM CollectionLeases l WITH (UPDLOCK, READPAST, ROWLOCK)
+            INNER JOIN ManagedInstances mi ON mi.ServerName = l.ServerName
+            WHERE mi.IsActive = 1
+              AND (l.LeaseExpiresAt IS NULL OR l.LeaseExpiresAt < GETDATE())
+              {' '.join(conditions)}
+            ORDER BY l.NextDueAt
+        )
+        UPDATE Free SET Owner = ?, LeasedAt = GETDATE(), LeaseExpiresAt = DATEADD(second, ?, GETDATE())
+        OUTPUT inserted.ServerName
+    """, params + [owner, _lease_seconds()])
+    return [row[0] for row in cursor.fetchall()]
+
+def _fence_leases(cursor, owner, servers):
+    """Of servers, the ones whose lease owner still holds; their rows stay locked until the caller commits"""
+    cursor.execute(f"""
+        UPDATE CollectionLeases SET LeaseExpiresAt = DATEADD(second, ?, GETDATE())
+        OUTPUT inserted.ServerName
+        WHERE Owner = ? AND ServerName IN ({', '.join('?' for _ in servers)})
+    """, [_lease_seconds(), owner, *servers])
+    return {row[0] for row in cursor.fetchall()}
+
+def _release_leases(cursor, owner, servers):
+    """Hand leases back and schedule each instance's next collection one interval out"""
+    cursor.execute(f"""
+        UPDATE l SET Owner = NULL, LeaseExpiresAt = NULL,
+               NextDueAt = DATEADD(minute, ISNULL(mi.CollectionIntervalMinutes, ?), GETDATE())
+        FROM CollectionLeases l
+        INNER JOIN ManagedInstances mi ON mi.ServerName = l.ServerName
+        WHERE l.Owner = ? AND l.ServerName IN ({', '.join('?' for _ in servers)})
+    """, [COLLECTOR_CONFIG['default_interval_minutes'], owner, *servers])
+
+def merge_collection_results(runs, parallel=False):
+    """One collection_results summary for several runs
+
+    parallel runs (shards) overlap in time, so elapsed is the longest and
+    throughput adds up; sequential runs (batches within a shard) add elapsed.
+    """
+    merged = {
+        'success': [], 'failed': [], 'total_jobs_collected': 0, 'timings': {},
+        'failed_servers': [], 'skipped': [], 'attempted_servers': [],
+        'publish_seconds': 0.0, 'write_seconds': 0.0, 'elapsed_seconds': 0.0, 'rows_per_sec': 0
+    }
+    for results in runs:
+        for key in ('success', 'failed', 'failed_servers', 'skipped', 'attempted_servers'):
+            merged[key] += results[key]
+        merged['timings'].update(results['timings'])
+        merged['total_jobs_collected'] += results['total_jobs_collected']
+        merged['publish_seconds'] = round(merged['publish_seconds'] + results['publish_seconds'], 3)
+        merged['write_seconds'] = round(merged['write_seconds'] + results['write_seconds'], 3)
+        if parallel:
+            merged['elapsed_seconds'] = max(merged['elapsed_seconds'], results['elapsed_seconds'])
+            merged['rows_per_sec'] += results['rows_per_sec']
+        else:
+            merged['elapsed_seconds'] = round(merged['elapsed_seconds'] + results['elapsed_seconds'], 3)
+    if not parallel and merged['write_seconds']:
+        merged['rows_per_sec'] = round(merged['total_jobs_collected'] / merged['write_seconds'])
+    return merged
+
+def _central_now():
+    with central_connection() as conn:
+        return conn.cursor().execute("SELECT GETDATE()").fetchone()[0]
+
+def collect_leased(owner, servers=None, full_resync=False, due_only=True, leased_before=None):
+    """Claim and collect lease_batch_size instances at a time until none are left for owner
+
+    Instances leased at or after leased_before (default: now) are left
+    alone, so each is collected at most once per call; shards of one run
+    share their parent's. Returns the merged collection_results of the batches.
+    """
+    if leased_before is None:
+        leased_before = _central_now()
+    runs = []
+    while True:
+        with central_connection() as conn:
+            claimed = _claim_leases(conn.cursor(), owner, COLLECTOR_CONFIG['lease_batch_size'],
+                                    servers, due_only, leased_before)
+            conn.commit()
+        if not claimed:
+            break
+        runs.append(run_collection(servers=claimed, full_resync=full_resync, lease_owner=owner))
+    return merge_collection_results(runs)
+
+def _init_shard():
+    """ProcessPoolExecutor initializer: spawned shards start without the parent's logging setup"""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+def _collect_shard(servers, full_resync, leased_before):
+    """ProcessPoolExecutor entry point for one shard of collect_sharded
+
+    Returns (collection_results, metrics snapshot); the parent merges the
+    metrics into its own export since shards never write one.
+    """
+    results = collect_leased(collector_id(), servers, full_resync, due_only=False,
+                             leased_before=leased_before)
+    metrics = metrics_snapshot()
+    reset_metrics()  # a pool process may serve another shard; don't report these twice
+    return results, metrics
+
+def collect_sharded(servers=None, full_resync=False, processes=None):
+    """Collect every active instance (or just servers) once, split across processes by lease
+
+    Shards keep claiming small batches until none are left, so faster shards
+    take more. Instances held by another collector (a daemon elsewhere) are
+    listed under 'skipped'. Returns one collection_results for all shards.
+    """
+    processes = processes or COLLECTOR_CONFIG['shard_processes']
+    # One cut-off for every shard: a shard starting after a sibling released
+    # an instance must not take it again
+    leased_before = _central_now()
+    if processes == 1:
+        shard_results = [collect_leased(collector_id(), servers, full_resync, due_only=False,
+                                        leased_before=leased_before)]
+    else:
+        # spawn, not fork: a forked shard would inherit this process's pooled ODBC
+        # connections (opened by _ensure_schema) and use them alongside its siblings
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_shard) as executor:
+            shards = list(executor.map(_collect_shard, [servers] * processes, [full_resync] * processes,
+                                       [leased_before] * processes))
+        shard_results = [results for results, _ in shards]
+        for _, metrics in shards:
+            merge_metrics(metrics)
+    results = merge_collection_results(shard_results, parallel=True)
+
+    with central_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT mi.ServerName, mi.FriendlyName, l.Owner
+            FROM ManagedInstances mi
+            LEFT JOIN CollectionLeases l ON l.ServerName = mi.ServerName
+            WHERE mi.IsActive = 1
+        """)
+        attempted = set(results['attempted_servers'])
+        for svr_name, friendly_name, owner in cursor.fetchall():
+            if svr_name not in attempted and (servers is None or svr_name in servers):
+                results['skipped'].append(f"{friendly_name or svr_name} (leased by {owner or 'another collector'})")
+    return results
+
+def run_collection(servers=None, full_resync=False, max_workers=None,
+                   instance_timeout=None, total_timeout=None, chunk_size=None,
+                   lookback_days=None, lease_owner=None):
+    """Enhanced collection with error handling and performance metrics
+
+    Collection is incremental: each instance only returns sysjobhistory rows
+    past its watermark, which are appended to JobLogs. With full_resync the
+    selected instances' rows are replaced from scratch. Only history from the
+    last lookback_days is pulled (0 = everything msdb has).
+
+    Remote instances are streamed in parallel by a bounded thread pool
+    (fetch -> transform on the pool threads, chunk_size rows at a time); all
+    writes happen on this thread over the single central connection. Chunks
+    land in JobLogs_Staging under this run's RunID, and every instance that
+    finished is published to JobLogs in one transaction at the end, so
+    dashboards (reading under READ_COMMITTED_SNAPSHOT) only ever see whole runs.
+
+    Instances whose circuit breaker is open are skipped (listed in 'skipped')
+    until their retry time, when one half-open probe is allowed through.
+
+    With lease_owner (sharded collectors; see collect_leased) an instance is
+    only published while that owner still holds its lease, and every lease
+    is released, with its next due time set, when the run ends.
+    """
+    max_workers = max_workers or COLLECTOR_CONFIG['max_workers']
+    instance_timeout = instance_timeout or COLLECTOR_CONFIG['instance_timeout']
+    total_timeout = total_timeout or COLLECTOR_CONFIG['total_timeout']
+    chunk_size = chunk_size or COLLECTOR_CONFIG['fetch_chunk_size']
+    lookback_days = COLLECTOR_CONFIG['lookback_days'] if lookback_days is None else lookback_days
+    connect_timeout = min(COLLECTOR_CONFIG['connect_timeout'], instance_timeout)
+    batch_size = COLLECTOR_CONFIG['insert_batch_size']
+    run_id = str(uuid.uuid4())
+
+    pool = get_pool()
+    central_conn = pool.acquire()
+    try:
+        cursor = central_conn.cursor()
+        cursor.fast_executemany = True
+
+        cursor.execute("SELECT ServerName, FriendlyName FROM ManagedInstances WHERE IsActive = 1")
+        instances = cursor.fetchall()
+        if servers is not None:
+            instances = [row for row in instances if row[0] in servers]
+        watermarks = {} if full_resync else get_watermarks(cursor)
+        health = get_instance_health(cursor)
+        # Leftovers from runs that died before publishing
+        cursor.execute("DELETE FROM JobLogs_Staging WHERE StagedAt < DATEADD(day, -1, GETDATE())")
+        central_conn.commit()
+    except Exception:
+        pool.release(central_conn)
+        raise
+
     with open('sql/pull_jobs.sql', 'r', encoding='utf-8') as f:
         job_query = f.read().strip()
-    
+
     collection_results = {
         'success': [],
         'failed': [],
-        'total_jobs_collected': 0
+        'total_jobs_collected': 0,
+        'timings': {},
+        'failed_servers': [],
+        'skipped': [],
+        'attempted_servers': [svr_name for svr_name, _ in instances]
     }
-    
+    errors = {}
+
+    def fail(svr_name, error_msg):
+        increment('collector_failures_total', instance=svr_name)
+        collection_results['failed'].append(error_msg)
+        collection_results['failed_servers'].append(svr_name)
+        errors[svr_name] = error_msg
+
+    now = datetime.now()
+    allowed = []
     for svr_name, friendly_name in instances:
-        try:
-            remote_str = (
-                f"DRIVER={DB_CONFIG['driver']};"
-                f"SERVER={svr_name};"
-                f"DATABASE=msdb;"
-                f"Trusted_Connection=yes;"
+        inst_health = health.get(svr_name)
+        if not _breaker_allows(inst_health, now):
+            collection_results['skipped'].append(
+                f"{friendly_name or svr_name} (circuit open until {inst_health['next_retry']:%H:%M})"
             )
-            
-            with pyodbc.connect(remote_str, timeout=10) as remote_conn:
-                data = remote_conn.cursor().execute(job_query).fetchall()
-
-                jobs_inserted = 0
-                for row in data:
-                    duration_seconds = parse_sql_duration(row[5])
-                    
-                    cursor.execute("""
-                        INSERT INTO JobLogs 
-                        (ServerName, JobName, Status, LastRun, ErrorMessage, 
-                         DurationSeconds, CPUTimeMS, StepCount) 
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        row[0], row[1], row[2], row[3], row[4],
-                        duration_seconds, row[6], row[7]
-                    ))
-                    jobs_inserted += 1
-                
+            continue
+        if inst_health and inst_health['state'] == BREAKER_OPEN:
+            cursor.execute("UPDATE InstanceHealth SET BreakerState = ? WHERE ServerName = ?",
+                           (BREAKER_HALF_OPEN, svr_name))
+        allowed.append((svr_name, friendly_name))
+    instances = allowed
+    central_conn.commit()
+
+    state = {
+        svr_name: {
+            'label': friendly_name or svr_name,
+            'rows': 0,
+            'last_id': watermarks.get(svr_name, 0),
+            'source_server': None,
+            'write_seconds': 0.0,
+            'connect_seconds': None
+        }
+        for svr_name, friendly_name in instances
+    }
+    pending = set(state)
+    completed = {}
+
+    run_started = time.perf_counter()
+    deadline = run_started + total_timeout
+    total_write_seconds = 0.0
+    out_queue = queue.Queue(maxsize=COLLECTOR_CONFIG['queue_max_chunks'])
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(instances) or 1)),
+                                  thread_name_prefix="collector")
+    for svr_name in state:
+        executor.submit(_fetch_instance, run_id, svr_name, job_query, watermarks.get(svr_name, 0),
+                        lookback_days, chunk_size, out_queue, stop,
+                        _adaptive_connect_timeout(health.get(svr_name), connect_timeout),
+                        instance_timeout)
+
+    broken = False
+    try:
+        try:
+            while pending:
+                kind, svr_name, payload = out_queue.get(timeout=max(0, deadline - time.perf_counter()))
+                if svr_name not in pending:
+                    continue  # instance already failed; drop its remaining chunks
+                inst = state[svr_name]
+
+                if kind == 'error':
+                    pending.discard(svr_name)
+                    fail(svr_name, _describe_error(inst['label'], payload))
+                    if not _discard_instance(central_conn, cursor, run_id, svr_name):
+                        broken = True
+                        break
+                    continue
+
+                try:
+                    if kind == 'rows':
+                        write_started = time.perf_counter()
+                        inst['rows'] += _stage_job_logs(central_conn, cursor, payload, batch_size)
+                        central_conn.commit()
+                        write_seconds = time.perf_counter() - write_started
+                        observe('collector_phase_seconds', write_seconds, phase='stage', instance=svr_name)
+                        inst['write_seconds'] += write_seconds
+                        total_write_seconds += write_seconds
+                        params = payload[0]
+                        inst['last_id'] = max(inst['last_id'],
+                                              max(row[_HISTORY_ID_COL] for row in params))
+                        inst['source_server'] = params[0][_SOURCE_SERVER_COL]
+                    else:
+                        fetch_seconds, inst['connect_seconds'] = payload
+                        increment('collector_rows_total', inst['rows'], instance=svr_name)
+                        pending.discard(svr_name)
+                        completed[svr_name] = (inst['source_server'], inst['last_id'])
+                        collection_results['timings'][inst['label']] = {
+                            'connect_seconds': round(inst['connect_seconds'], 3),
+                            'fetch_seconds': round(fetch_seconds, 3),
+                            'write_seconds': round(inst['write_seconds'], 3),
+                            'rows': inst['rows'],
+                            'rows_per_sec': (round(inst['rows'] / inst['write_seconds'])
+                                             if inst['write_seconds'] else 0)
+                        }
+
+                except Exception as e:
+                    pending.discard(svr_name)
+                    fail(svr_name, _describe_error(inst['label'], e))
+                    if not _discard_instance(central_conn, cursor, run_id, svr_name):
+                        broken = True
+                        break
+
+        except queue.Empty:
+            for svr_name in pending:
+                _discard_staged(cursor, run_id, svr_name)
+                fail(svr_name, f"Timed out on {state[svr_name]['label']}: collection exceeded {total_timeout}s")
+            central_conn.commit()
+        finally:
+            # Release blocked readers and don't wait on stragglers; their query timeout bounds them
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        if broken:
+            # Nothing more can be written this run; the leases expire on their own
+            for svr_name in list(pending) + list(completed):
+                fail(svr_name, f"Central connection lost while collecting {state[svr_name]['label']}")
+            collection_results['publish_seconds'] = 0.0
+        else:
+            publish_started = time.perf_counter()
+            try:
+                if lease_owner and completed:
+                    # Fence: a lease that lapsed and was taken over must not be published twice
+                    held = _fence_leases(cursor, lease_owner, list(completed))
+                    for svr_name in [svr for svr in completed if svr not in held]:
+                        del completed[svr_name]
+                        _discard_staged(cursor, run_id, svr_name)
+                        fail(svr_name, f"Lease lost on {state[svr_name]['label']}: another collector took it over")
+                published = _publish(cursor, run_id, completed, full_resync)
                 central_conn.commit()
-                collection_results['success'].append(friendly_name or svr_name)
-                collection_results['total_jobs_collected'] += jobs_inserted
-                
-        except pyodbc.Error as e:
-            error_msg = f"Database error on {friendly_name or svr_name}: {str(e)}"
-            collection_results['failed'].append(error_msg)
-            
-        except Exception as e:
-            error_msg = f"Error reaching {friendly_name or svr_name}: {str(e)}"
-            collection_results['failed'].append(error_msg)
-    
-    central_conn.close()
+                collection_results['success'].extend(state[svr]['label'] for svr in completed)
+                collection_results['total_jobs_collected'] = published
+            except Exception as e:
+                central_conn.rollback()
+                for svr_name in completed:
+                    fail(svr_name, f"Publish failed for {state[svr_name]['label']}: {str(e)}")
+                _discard_staged(cursor, run_id)
+                central_conn.commit()
+            collection_results['publish_seconds'] = round(time.perf_counter() - publish_started, 3)
+            observe('collector_publish_seconds', time.perf_counter() - publish_started)
+
+            try:
+                for svr_name, inst in state.items():
+                    _record_health(cursor, svr_name, health.get(svr_name),
+                                   errors.get(svr_name), inst['connect_seconds'])
+                if state:
+                    bump_generations(cursor, HEALTH)
+                central_conn.commit()
+            except pyodbc.Error:
+                central_conn.rollback()
+
+            if lease_owner and collection_results['attempted_servers']:
+                try:
+                    _release_leases(cursor, lease_owner, collection_results['attempted_servers'])
+                    central_conn.commit()
+                except pyodbc.Error:
+                    central_conn.rollback()  # the leases expire on their own
+        total_write_seconds += collection_results['publish_seconds']
+    finally:
+        pool.release(central_conn, broken=broken)
+
+    collection_results['write_seconds'] = round(total_write_seconds, 3)
+    collection_results['elapsed_seconds'] = round(time.perf_counter() - run_started, 3)
+    observe('collector_run_seconds', time.perf_counter() - run_started)
+    collection_results['rows_per_sec'] = (
+        round(collection_results['total_jobs_collected'] / total_write_seconds)
+        if total_write_seconds else 0
+    )
     return collection_results
 
+def resync_instance(svr_name):
+    """Rebuild a single instance's history from scratch"""
+    return collect_sharded(servers=[svr_name], full_resync=True, processes=1)
+
+def queue_collection(svr_name=None, full_resync=False):
+    """Ask the collector daemon for a run (all active instances when svr_name is None)"""
+    with central_connection() as conn:
+        conn.cursor().execute(
+            "INSERT INTO CollectionRequests (ServerName, FullResync) VALUES (?, ?)",
+            (svr_name, 1 if full_resync else 0)
+        )
+        conn.commit()
+
+def get_pending_requests():
+    """Number of queued collection requests the daemon hasn't finished yet"""
+    try:
+        with central_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM CollectionRequests WHERE CompletedAt IS NULL")
+            return cursor.fetchone()[0]
+    except:
+        return 0
+
 def get_collection_status():
     """Get the last collection timestamp"""
     try:
-        conn = pyodbc.connect(
-            f"DRIVER={DB_CONFIG['driver']};"
-            f"SERVER={DB_CONFIG['server']};"
-            f"DATABASE={DB_CONFIG['database']};"
-            f"Trusted_Connection=yes;"
-        )
-        cursor = conn.cursor()
-        cursor.execute("SELECT MAX(CapturedAt) FROM JobLogs")
-        last_capture = cursor.fetchone()[0]
-        conn.close()
-        return last_capture
+        with central_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT MAX(LastCollectedAt) FROM CollectionWatermarks")
+            return cursor.fetchone()[0]
     except:
-        return None
\ No newline at end of file
+        return None
+
+# ============================================
+# Collector daemon (python -m worker --daemon)
+# ============================================
+
+def _claim_requests(cursor):
+    """Mark queued requests as started and return them oldest first"""
+    cursor.execute("""
+        UPDATE CollectionRequests SET StartedAt = GETDATE()
+        OUTPUT inserted.RequestID, inserted.ServerName, inserted.FullResync
+        WHERE StartedAt IS NULL
+    """)
+    return sorted(cursor.fetchall(), key=lambda row: row[0])
+
+def _complete_request(cursor, request_id, results):
+    """Record a request's outcome for the sidebar"""
+    cursor.execute(
+        "UPDATE CollectionRequests SET CompletedAt = GETDATE(), ResultSummary = ? WHERE RequestID = ?",
+        (f"{results['total_jobs_collected']} rows, {len(results['failed'])} failed", request_id)
+    )
+
+def _is_leased(cursor, svr_name):
+    cursor.execute("SELECT 1 FROM CollectionLeases WHERE ServerName = ? AND LeaseExpiresAt > GETDATE()", svr_name)
+    return cursor.fetchone() is not None
+
+def _log_results(results):
+    for err in results['failed']:
+        log.warning(err)
+    for skipped in results['skipped']:
+        log.info("Skipped %s", skipped)
+
+def _daemon_tick(owner):
+    """One scheduler pass: serve queued requests, then collect whatever is due and unleased
+
+    Schedules live in CollectionLeases.NextDueAt, so any number of daemons
+    share them; failing instances are throttled by their circuit breaker
+    (InstanceHealth), so manual and scheduled runs share one backoff.
+    """
+    with central_connection() as conn:
+        cursor = conn.cursor()
+        requests = _claim_requests(cursor)
+        conn.commit()
+
+        for request_id, svr_name, full_resync in requests:
+            log.info("Serving request %s (%s%s)", request_id, svr_name or "all instances",
+                     ", full resync" if full_resync else "")
+            results = collect_leased(owner, servers=[svr_name] if svr_name else None,
+                                     full_resync=bool(full_resync), due_only=False)
+            if svr_name and not results['attempted_servers'] and _is_leased(cursor, svr_name):
+                # Another collector is on it right now; leave the request for a later tick
+                cursor.execute("UPDATE CollectionRequests SET StartedAt = NULL WHERE RequestID = ?", request_id)
+            else:
+                _complete_request(cursor, request_id, results)
+            conn.commit()
+            _log_results(results)
+
+    results = collect_leased(owner)
+    if results['attempted_servers']:
+        log.info("Collected %s rows from %s instance(s), %s failed in %.1fs",
+                 results['total_jobs_collected'], len(results['attempted_servers']),
+                 len(results['failed']), results['elapsed_seconds'])
+        _log_results(results)
+
+def _ensure_schema():
+    """Bring the central schema up to date before collecting"""
+    with central_connection() as conn:
+        applied = apply_migrations(conn)
+        rcsi_on = read_committed_snapshot_enabled(conn.cursor())
+    if applied:
+        log.info("Applied schema migrations: %s", ", ".join(applied))
+    if not rcsi_on:
+        log.warning(RCSI_OFF_MESSAGE)
+
+def run_daemon(poll_seconds=None):
+    """Run collections on each instance's schedule until interrupted
+
+    Any number of daemons, on any hosts, can run at once: each takes
+    instances through CollectionLeases. JobLogs retention runs every
+    RETENTION_CONFIG['check_minutes'], by whichever daemon gets there first;
+    deleted instances are purged a poll interval's worth at a time each tick.
+    """
+    poll_seconds = poll_seconds or COLLECTOR_CONFIG['poll_seconds']
+    owner = collector_id()
+    _ensure_schema()
+    log.info("Collector daemon %s started (poll every %ss)", owner, poll_seconds)
+    retention_due = 0.0
+    try:
+        while True:
+            try:
+                _daemon_tick(owner)
+            except Exception as e:
+                log.exception("Collector tick failed: %s", e)
+            if time.monotonic() >= retention_due:
+                retention_due = time.monotonic() + RETENTION_CONFIG['check_minutes'] * 60
+                try:
+                    log_summary(enforce_retention())
+                except Exception as e:
+                    log.exception("Retention failed: %s", e)
+            try:
+                purge_deleted_instances(max_seconds=poll_seconds)
+            except Exception as e:
+                log.exception("Instance purge failed: %s", e)
+            record_pool_gauges()
+            export()
+            time.sleep(poll_seconds)
+    except KeyboardInterrupt:
+        log.info("Collector daemon stopped")
+    finally:
+        remove_export()
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SQL Server Agent job history collector")
+    parser.add_argument("--daemon", action="store_true", help="run collections on a schedule")
+    parser.add_argument("--server", help="collect a single managed instance")
+    parser.add_argument("--full-resync", action="store_true", help="reload history from scratch")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="collector processes to split a one-off run between")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.daemon:
+        set_process(f"collector-{os.getpid()}")  # one export file per daemon, even with several on a host
+        return run_daemon()
+
+    set_process("collector")  # one-off runs overwrite a single file rather than leave one per pid
+
+    _ensure_schema()
+
+    results = collect_sharded(servers=[args.server] if args.server else None,
+                              full_resync=args.full_resync, processes=args.processes)
+    log.info("Collected %s rows in %.1fs (%s rows/sec)", results['total_jobs_collected'],
+             results['elapsed_seconds'], results['rows_per_sec'])
+    _log_results(results)
+    record_pool_gauges()
+    export(force=True)
+    return 1 if results['failed'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())